@@ -1,13 +1,21 @@
 import streamlit as st
-import pandas as pd
 import folium
-from folium.plugins import MarkerCluster
-import json
-import geopandas as gpd
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
+import pandas as pd
+from contextlib import nullcontext
 from streamlit_folium import st_folium
-import os
+from shared.classify import SCHEMES, DEFAULT_SCHEME
+from shared.dataset import dataset_version, load_dataset, load_shard
+from shared.regions import default_regions, combined_bounds, combine_shards
+from shared.normalize import METRICS, DEFAULT_METRIC
+from shared.road_network import MODES, ISOCHRONE_MINUTES, ISOCHRONE_COLORS, clients_within
+from shared.facility_location import MAX_NEW_SITES, COVERAGE_MILES, propose_sites
+from shared.hexgrid import RESOLUTIONS, RESOLUTION_LABELS, DEFAULT_RESOLUTION, build_hex_layer, combine_levels
+from shared.clustering import MAX_CLUSTER_ZOOM, build_clusters, visible_clusters
+from shared.zcta_index import ZctaIndex
+from shared.search import search_pantries
+from shared.map_layers import view_for_bounds, build_base_map, add_pantry_clusters, add_zip_layer, add_image_overlay, add_isochrone_layer, add_proposed_sites
+from shared.webgl_layers import BACKENDS, DEFAULT_BACKEND, build_plotly_figure, build_deck
+from shared.profiling import env_enabled, is_enabled, profile_run, span
 
 # Force light mode and set page config with expanded sidebar
 st.set_page_config(
@@ -17,6 +25,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Hidden performance panel: add ?debug=1 to the URL (or set SPCA_PROFILE=1)
+show_debug_panel = 'debug' in st.query_params
+
 # Main app code
 st.markdown(
     """
@@ -72,160 +83,424 @@ st.markdown("""
 
 # Load data
 @st.cache_data
-def load_data():
+def load_data(version):
+    """Prebuilt dataset for this version of the source files (built on first use)."""
     try:
-        # Load pantry locations
-        pantry_df = pd.read_csv('map_data/geocoded_pantry_locations.csv')
-        
-        # Filter out NaN values in latitude/longitude
-        pantry_df = pantry_df.dropna(subset=['latitude', 'longitude'])
-        
-        # Additional validation: ensure coordinates are valid numbers and within reasonable bounds
-        pantry_df = pantry_df[
-            (pantry_df['latitude'].between(40, 45)) &  # Erie County is roughly 42-43°N
-            (pantry_df['longitude'].between(-80, -78))  # Erie County is roughly -79°W
-        ]
-        
-        # Load survey data for ZIP boundaries
-        with open('map_data/erie_survey_zips.geojson', 'r') as f:
-            survey_data = json.load(f)
-        
-        # Load PantryMap data for client counts
-        pantry_map = pd.read_csv('map_data/PantryMap.csv')
-        
-        # Clean ZIP codes
-        def clean_zip(zipcode):
-            try:
-                return str(int(float(zipcode))).zfill(5)
-            except:
-                return None
-        
-        pantry_map['Postal Code'] = pantry_map['Postal Code'].apply(clean_zip)
-        zip_counts = pantry_map['Postal Code'].value_counts().reset_index()
-        zip_counts.columns = ['ZCTA5CE10', 'client_count']
-        
-        return pantry_df, survey_data, zip_counts
+        return load_dataset(version)
     except Exception as e:
         st.error(f"❌ Error loading data: {e}")
-        return None, None, None
+        return None
 
-pantry_df, survey_data, zip_counts = load_data()
+@st.cache_data
+def get_hex_layer(version, scheme, resolution, regions):
+    """Classified hexagon layer for one grid resolution over the selected regions, from their shards' rollups."""
+    dataset = load_data(version)
+    level = combine_levels([load_shard(dataset, key)['hex_grid'][resolution] for key in regions])
+    return build_hex_layer(level, scheme, dataset['hex_breaks'][scheme][resolution])
 
-if pantry_df is not None and survey_data is not None and zip_counts is not None:
-    # Create map
-    m = folium.Map(
-        location=[42.8864, -78.8784], 
-        zoom_start=9,
-        tiles='CartoDB positron'
-    )
-    
-    # Add pantry markers with clustering
-    marker_cluster = MarkerCluster().add_to(m)
-    
-    # Build detailed hover text for each pantry
-    pantry_df['hover_text'] = (
-        '<b>' + pantry_df['name'].astype(str) + '</b><br>' +
-        pantry_df['address'].astype(str) + '<br>' +
-        'Phone: ' + pantry_df['phone'].astype(str) + '<br>' +
-        'Hours: ' + pantry_df['hours'].astype(str)
+@st.cache_data
+def get_region_layers(version, scheme, regions):
+    """ZIP layer (zip_layer, metrics, styles, legends) and pantries for the selected regions, read from their shards."""
+    dataset = load_data(version)
+    return combine_shards([load_shard(dataset, key) for key in regions], scheme)
+
+@st.cache_data
+def get_pantry_clusters(version, regions):
+    """Pantry clusters at every zoom level for the selected regions; rows match get_region_layers()' pantries."""
+    # Pantries don't depend on the classification scheme
+    _, pantry_df = get_region_layers(version, DEFAULT_SCHEME, regions)
+    return build_clusters(pantry_df['latitude'], pantry_df['longitude'])
+
+@st.cache_resource
+def get_zcta_index(version):
+    """Point-to-ZIP index over every region's ZIP polygons, built once per version and shared by every session."""
+    dataset = load_data(version)
+    # One index for all regions; callers keep only the ZIPs of the regions they show
+    (zip_layer, _, _, _), _ = combine_shards([load_shard(dataset, key) for key in dataset['regions']], DEFAULT_SCHEME)
+    return ZctaIndex(zip_layer)
+
+def current_zoom(map_bounds):
+    """Zoom the folium map last reported, or its initial zoom before it has reported any."""
+    zoom = (st.session_state.get('spca_map') or {}).get('zoom')
+    return view_for_bounds(map_bounds)[1] if zoom is None else zoom
+
+def results_view(found):
+    """Bounds and (center, zoom) framing the found pantries; one pantry is shown close enough to leave its cluster."""
+    bounds = [[found['latitude'].min() - SEARCH_MARGIN_DEGREES, found['longitude'].min() - SEARCH_MARGIN_DEGREES],
+              [found['latitude'].max() + SEARCH_MARGIN_DEGREES, found['longitude'].max() + SEARCH_MARGIN_DEGREES]]
+    center, zoom = view_for_bounds(bounds)
+    return bounds, center, (MAX_CLUSTER_ZOOM + 1 if len(found) == 1 else int(zoom))
+
+@st.cache_data
+def get_proposed_sites(version, k, regions):
+    """New pantry sites that most shorten trips for the selected regions' clients, with before/after access metrics."""
+    dataset = load_data(version)
+    names = [dataset['regions'][key]['name'] for key in regions]
+    zip_centroids = dataset['zip_centroids']
+    # Pantries just across a region's edge still serve its clients, so all of them count
+    return propose_sites(zip_centroids[zip_centroids['region'].isin(names)], dataset['pantries'], k)
+
+AREA_VIEWS = {'zip': 'ZIP code areas', 'hex': 'Hexagon grid'}
+# Map changes that rerun the app: the zoom (for its pantry clusters) and clicks (to identify a ZIP).
+# Panning doesn't, since a rerun re-sends the density layers with the pantries
+MAP_EVENTS = ['zoom', 'last_clicked']
+# Room left around search results when the map zooms to them
+SEARCH_MARGIN_DEGREES = 0.01
+OVERLAYS = {'none': 'None', 'demand': 'Client demand', 'gap': 'Service gaps'}
+
+with st.sidebar:
+    scheme = st.selectbox(
+        "Client density classes",
+        options=list(SCHEMES),
+        index=list(SCHEMES).index(DEFAULT_SCHEME),
+        format_func=SCHEMES.get
     )
-    
-    for idx, row in pantry_df.iterrows():
-        try:
-            lat = float(row['latitude'])
-            lon = float(row['longitude'])
+
+# Stages are recorded for ?debug=1 or SPCA_PROFILE=1; the run is closed even when st.rerun() cuts it short
+with profile_run() if show_debug_panel or env_enabled() else nullcontext([]) as profile:
+    version = dataset_version()
+    with span('load_data'):
+        dataset = load_data(version)
+
+    if dataset is not None:
+        manifest = dataset['regions']
+        regions = st.sidebar.multiselect(
+            "Regions",
+            options=list(manifest),
+            default=default_regions(manifest),
+            format_func=lambda key: manifest[key]['name'],
+            help="Only the selected regions' areas and pantries are loaded and drawn."
+        )
+        # Nothing selected would leave an empty map; show the busiest regions instead
+        regions = tuple(regions or default_regions(manifest))
+        with span('load_regions'):
+            (zip_layer, metrics, styles, legends), pantry_df = get_region_layers(version, scheme, regions)
+        map_bounds = combined_bounds(manifest, regions)
+        
+        # Pantry search over the prebuilt index; the map zooms to what it finds
+        query = st.sidebar.text_input(
+            "Find a pantry",
+            placeholder="Name, street or town",
+            help="Matches the start of words and forgives small typos."
+        )
+        search_bounds, search_center, search_zoom = None, None, None
+        if query.strip():
+            with span('search_pantries'):
+                rows, match_count = search_pantries(dataset['search_index'], query)
+            found = dataset['pantries'].iloc[rows]
+            shown = found[found['region'].isin([manifest[key]['name'] for key in regions])]
+            if not match_count:
+                st.sidebar.caption(f"No pantry matches “{query.strip()}”.")
+            else:
+                st.sidebar.markdown("\n".join(
+                    f"- **{row['name']}**  \n{row['address']}" for _, row in found.iterrows()
+                ))
+                if match_count > len(found):
+                    st.sidebar.caption(f"Best {len(found)} of {match_count} matches; add words to narrow them down.")
+                if len(shown) < len(found):
+                    st.sidebar.caption(f"{len(found) - len(shown)} of these are in regions not selected above.")
+            if len(shown):
+                search_bounds, search_center, search_zoom = results_view(shown)
+        zip_layer_bytes = sum(manifest[key]['zip_layer_bytes'] for key in regions)
+        
+        area_view = st.sidebar.radio(
+            "Areas",
+            options=list(AREA_VIEWS),
+            format_func=AREA_VIEWS.get,
+            help="Hexagons are equal-sized, so they compare areas without the bias of irregular ZIP shapes."
+        )
+        if area_view == 'hex':
+            resolution = st.sidebar.select_slider(
+                "Hexagon size",
+                options=RESOLUTIONS,
+                value=DEFAULT_RESOLUTION,
+                format_func=RESOLUTION_LABELS.get
+            )
+            area_layer, area_styles, legends = get_hex_layer(version, scheme, resolution, regions)
+            metric = 'client_count'
+            area_fields = {'id_field': 'hex_id', 'id_label': 'Hexagon'}
+            extra_tooltip = [('pantry_count', 'Food Pantries')]
+        else:
+            metric = st.sidebar.selectbox(
+                "Density metric",
+                options=metrics,
+                index=metrics.index(DEFAULT_METRIC),
+                format_func=lambda name: METRICS[name][0]
+            )
+            area_layer, area_styles = zip_layer, styles
+            area_fields = {}
+            extra_tooltip = []
+        legend = legends[metric]
+        backend = st.sidebar.radio(
+            "Map renderer",
+            options=list(BACKENDS),
+            index=list(BACKENDS).index(DEFAULT_BACKEND),
+            format_func=BACKENDS.get,
+            help="The WebGL renderers draw on the GPU and stay smooth with many more pantries and ZIP areas."
+        )
+        progressive = st.sidebar.checkbox(
+            "Show pantries first, then load areas",
+            value=True,
+            disabled=backend != 'folium',
+            help="Draws the base map and pantries straight away and adds the density layer once it is ready."
+        )
+        overlay_surfaces = {'none': None, 'demand': dataset['demand_surface'], 'gap': dataset['gap_analysis']}
+        overlay_name = st.sidebar.radio(
+            "Heat layer",
+            options=[name for name, surface in overlay_surfaces.items() if name == 'none' or surface is not None],
+            format_func=OVERLAYS.get,
+            help="Client demand smooths client counts around each ZIP code's center. "
+                 "Service gaps weights that demand by the distance to the nearest pantry."
+        )
+        overlay = overlay_surfaces[overlay_name]
+        travel = dataset['travel']
+        travel_mode = st.sidebar.selectbox(
+            "Travel time to nearest pantry",
+            options=['none'] + list(MODES),
+            format_func=lambda mode: MODES.get(mode, 'None'),
+            disabled=travel is None,
+            help="Areas within each travel time of a pantry along the road network. "
+                 "Needs map_data/road_graph.npz (see build_road_graph.py)."
+        )
+        isochrones = travel['isochrones'][travel_mode] if travel is not None and travel_mode != 'none' else None
+        new_sites = st.sidebar.slider(
+            "Propose new pantry sites",
+            min_value=0,
+            max_value=MAX_NEW_SITES,
+            value=0,
+            help="Suggests locations that most reduce the average straight-line distance from SPCA clients to a pantry."
+        )
+        with span('propose_sites'):
+            proposal = get_proposed_sites(version, new_sites, regions) if new_sites else None
+        sites = proposal['sites'] if proposal is not None else None
+        
+        if backend == 'folium':
+            # Create map
+            m = build_base_map(map_bounds)
             
-            # Double-check coordinates are valid
-            if pd.isna(lat) or pd.isna(lon) or not (40 <= lat <= 45) or not (-80 <= lon <= -78):
-                continue
+            # Only the selected regions' pantry clusters at the current zoom are sent, so
+            # panning needs no rerun; zooming reruns the app and swaps in the new zoom's clusters
+            with span('pantry_markers'):
+                zoom = current_zoom(map_bounds)
+                if search_bounds is not None and st.session_state.get('map_search') != query:
+                    # The map is about to jump to new results; send the clusters at their zoom
+                    zoom = search_zoom
+                st.session_state['map_search'] = query
+                level, visible = visible_clusters(get_pantry_clusters(version, regions), zoom, map_bounds)
+                pantry_layer = folium.FeatureGroup(name='Food pantries')
+                add_pantry_clusters(pantry_layer, pantry_df, level, visible)
             
-            # Add marker to cluster with original working tooltip
-            folium.Marker(
-                location=[lat, lon],
-                popup=folium.Popup(row['hover_text'], max_width=300),
-                tooltip=folium.Tooltip(row['hover_text'], sticky=True),
-                icon=folium.Icon(color='green', icon='shopping-cart', prefix='fa')
-            ).add_to(marker_cluster)
+            # On a session's first run, show the light base map right away and build the
+            # heavier layers only in a second pass; later runs draw everything in one go
+            layers_loaded = st.session_state.get('map_layers_loaded')
+            if progressive and not layers_loaded:
+                with span('st_folium_base'):
+                    st_folium(m, key='spca_map', feature_group_to_add=[pantry_layer], returned_objects=MAP_EVENTS,
+                              center=search_center, zoom=search_zoom, use_container_width=True, height=600)
+                st.session_state['map_layers_loaded'] = 'pending'
+                st.rerun()
             
-        except (ValueError, TypeError):
-            continue
-    
-    # Create choropleth with ZIP code boundaries
-    try:
-        # Create GeoDataFrame from survey data
-        gdf = gpd.GeoDataFrame.from_features(survey_data['features'])
-        gdf['ZCTA5CE10'] = gdf['ZCTA5CE10'].astype(str)
+            # The density layers go in a second group; streamlit-folium swaps both in
+            # on the existing map without re-rendering it
+            layers = folium.FeatureGroup(name='Client density')
+            with st.spinner("Loading client density layer...") if layers_loaded == 'pending' else nullcontext():
+                # Create choropleth with ZIP code boundaries
+                try:
+                    with span('zip_layer'):
+                        add_zip_layer(layers, area_layer, area_styles, metric, extra_tooltip=extra_tooltip, **area_fields)
+                except Exception as e:
+                    st.error(f"❌ Choropleth failed: {e}")
+                
+                if overlay is not None:
+                    add_image_overlay(layers, overlay, OVERLAYS[overlay_name])
+                
+                if isochrones is not None:
+                    add_isochrone_layer(layers, isochrones)
+                
+                if sites is not None:
+                    add_proposed_sites(layers, sites)
+            
+            st.session_state['map_layers_loaded'] = True
+            
+            # Display map with proper sizing
+            with span('st_folium') as stage:
+                if is_enabled():
+                    stage.set_bytes(len(m.get_root().render().encode('utf-8')))
+                map_state = st_folium(m, key='spca_map', feature_group_to_add=[pantry_layer, layers], returned_objects=MAP_EVENTS,
+                                      center=search_center, zoom=search_zoom, use_container_width=True, height=600)
+            
+            # Clicking the map names the ZIP code area under the pointer
+            clicked = (map_state or {}).get('last_clicked')
+            if clicked:
+                zcta = get_zcta_index(version).lookup(clicked['lat'], clicked['lng'])
+                properties = next((f['properties'] for f in zip_layer['features'] if f['properties']['ZCTA5CE10'] == zcta), None)
+                if properties is None:
+                    st.caption(f"📍 {clicked['lat']:.4f}, {clicked['lng']:.4f} is outside the selected regions' ZIP code areas.")
+                else:
+                    figures = [f"**ZIP {zcta}**"]
+                    for name in metrics:
+                        value = properties[name]
+                        figures.append(f"{METRICS[name][0]}: " + ('n/a' if pd.isna(value) else f"{value:,.0f}" if name == 'client_count' else f"{value:,.1f}"))
+                    figures.append(f"Food pantries: {int((pantry_df['zip'] == zcta).sum())}")
+                    st.info("📍 " + " · ".join(figures))
+        elif backend == 'plotly':
+            with span('plotly_chart'):
+                st.plotly_chart(build_plotly_figure(area_layer, area_styles, pantry_df, metric, overlay, isochrones=isochrones, sites=sites, bounds=search_bounds or map_bounds, **area_fields), use_container_width=True)
+        else:
+            with span('pydeck_chart'):
+                st.pydeck_chart(build_deck(area_layer, area_styles, pantry_df, metric, overlay, isochrones=isochrones, sites=sites, bounds=search_bounds or map_bounds, **area_fields), use_container_width=True, height=600)
         
-        # Merge with client count data
-        gdf = gdf.merge(zip_counts, on='ZCTA5CE10', how='left')
-        gdf['client_count'] = gdf['client_count'].fillna(0)
+        # Add legend
+        st.markdown("---")
+        col1, col2 = st.columns([2, 1])
         
-        # Add individual GeoJson polygons instead of Choropleth
-        def style_function(feature):
-            client_count = feature['properties']['client_count']
-            if client_count > 100:
-                return {'fillColor': '#d73027', 'color': '#000000', 'weight': 2, 'fillOpacity': 0.8}
-            elif client_count > 50:
-                return {'fillColor': '#f46d43', 'color': '#000000', 'weight': 2, 'fillOpacity': 0.7}
-            elif client_count > 20:
-                return {'fillColor': '#fdae61', 'color': '#000000', 'weight': 2, 'fillOpacity': 0.6}
-            elif client_count > 5:
-                return {'fillColor': '#fee08b', 'color': '#000000', 'weight': 2, 'fillOpacity': 0.5}
-            elif client_count > 0:
-                return {'fillColor': '#ffffcc', 'color': '#000000', 'weight': 2, 'fillOpacity': 0.4}
+        with col1:
+            st.subheader("Map Legend")
+            if backend == 'folium':
+                st.markdown("""
+                **🛒 Food Pantry Locations** - Green shopping cart icons; green bubbles count the pantries in an area until you zoom in
+                """)
             else:
-                return {'fillColor': '#ffffff', 'color': '#666666', 'weight': 2, 'fillOpacity': 0.1}
+                st.markdown("""
+                **🛒 Food Pantry Locations** - Green dots (hover for details)
+                """)
+            
+            if overlay_name == 'demand':
+                st.markdown("""
+                **🔥 Client Demand** - Heat shading of SPCA clients, smoothed over about 3 km around each ZIP code's center
+                """)
+            elif overlay_name == 'gap':
+                st.markdown("""
+                **🚩 Service Gaps** - Client demand multiplied by the distance to the nearest pantry; darker orange marks clients far from food
+                """)
+            
+            if sites is not None:
+                st.markdown("""
+                **⭐ Proposed Pantry Sites** - Purple markers where a new pantry would most shorten client trips
+                """)
+            
+            if isochrones is not None:
+                st.markdown(
+                    f"**🚗 {MODES[travel_mode]} Time to Nearest Pantry** - "
+                    + ", ".join(
+                        f"<span style='color:{color}'>■</span> within {minutes} min"
+                        for minutes, color in zip(ISOCHRONE_MINUTES[travel_mode], ISOCHRONE_COLORS)
+                    ),
+                    unsafe_allow_html=True
+                )
+            
+            if area_view == 'hex':
+                st.markdown("**SPCA Client Density by Hexagon:**")
+                st.markdown("Each hexagon totals the SPCA clients of the ZIP codes centered inside it:")
+            else:
+                st.markdown("**SPCA Client Density by ZIP Code (Choropleth):**")
+                st.markdown("The colored areas show ZIP code boundaries with SPCA client density:")
+            if legend:
+                st.markdown(
+                    "<br>".join(
+                        f"<span style='display:inline-block; width:1em; height:1em; background-color:{color}; "
+                        f"border:1px solid #666; margin-right:0.5em; vertical-align:middle;'></span>{label}"
+                        for color, label in legend
+                    ),
+                    unsafe_allow_html=True
+                )
         
-        folium.GeoJson(
-            gdf.__geo_interface__,
-            style_function=style_function,
-            tooltip=folium.GeoJsonTooltip(
-                fields=['ZCTA5CE10', 'client_count'],
-                aliases=['ZIP Code', 'SPCA Clients'],
-                localize=True,
-                sticky=False,
-                labels=True
-            )
-        ).add_to(m)
+        with col2:
+            st.subheader("Data Summary")
+            st.write(f"**🍽️ Pantry Locations:** {len(pantry_df)}")
+            listings = int(pantry_df['listings'].sum())
+            if listings > len(pantry_df):
+                st.caption(f"Merged from {listings} listings; duplicates and programs sharing an address are combined.")
+            st.write(f"**🗺️ Survey Zip Codes:** {sum(manifest[key]['zip_count'] for key in regions)}")
+            
+            # Calculate total clients
+            total_clients = sum(manifest[key]['client_count'] for key in regions)
+            st.write(f"**👥 Total SPCA Clients:** {total_clients:,}")
+            validation = dataset['validation']
+            recovered = int(validation.loc[validation['reason'] == 'zip_crosswalked', 'rows'].sum())
+            if recovered:
+                st.caption(f"Includes {recovered:,} clients with PO box or unique ZIPs, placed in the ZIP code area around them.")
+            if len(regions) < len(manifest):
+                st.caption(f"In {len(regions)} of {len(manifest)} regions; {dataset['zip_feature_count']} ZIP codes in all.")
+            if travel is not None:
+                for mode in MODES:
+                    minutes = ISOCHRONE_MINUTES[mode][1]
+                    st.write(f"**⏱️ Clients within {minutes} min {MODES[mode].lower()}:** {clients_within(travel['zip_times'], mode, minutes):.0%}")
+            if zip_layer_bytes:
+                st.caption(f"ZIP layer payload: {zip_layer_bytes / 1024:,.0f} KB")
         
-    except Exception as e:
-        st.error(f"❌ Choropleth failed: {e}")
-    
-    # Display map with proper sizing
-    st_folium(m, use_container_width=True, height=600)
-    
-    # Add legend
-    st.markdown("---")
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        st.subheader("Map Legend")
-        st.markdown("""
-        **🛒 Food Pantry Locations** - Green shopping cart icons (clustered when zoomed out)
-        """)
+        if not validation.empty:
+            dropped = int(validation.loc[validation['severity'] == 'error', 'rows'].sum())
+            with st.expander(f"Data quality: {dropped} source rows left off the map"):
+                st.caption(
+                    "Errors are left off the map; warnings stay on it but are worth checking; notes record automatic fixes. "
+                    "map_data/cache/validation_report.csv lists each pantry record, and each distinct client ZIP value with its row count. "
+                    "Records are numbered from 1 after the header; a pantry's hours can span several lines of the file."
+                )
+                st.dataframe(validation, hide_index=True, use_container_width=True)
         
-        st.markdown("**SPCA Client Density by ZIP Code (Choropleth):**")
-        st.markdown("""
-        The colored areas show ZIP code boundaries with SPCA client density:
-        - **Dark Red** = High client density
-        - **Light Red** = Medium client density  
-        - **Very Light Red** = Low client density
-        - **White** = No clients
-        """)
-    
-    with col2:
-        st.subheader("Data Summary")
-        st.write(f"**🍽️ Pantry Locations:** {len(pantry_df)}")
-        st.write(f"**🗺️ Survey Zip Codes:** {len(survey_data['features'])}")
+        if proposal is not None:
+            st.subheader("Proposed Pantry Sites")
+            before, after = proposal['before'], proposal['after']
+            columns = st.columns(1 + len(COVERAGE_MILES))
+            columns[0].metric(
+                "Average client distance to a pantry",
+                f"{after['mean_miles']:.2f} mi",
+                f"{after['mean_miles'] - before['mean_miles']:+.2f} mi",
+                delta_color='inverse'
+            )
+            for column, limit in zip(columns[1:], COVERAGE_MILES):
+                share, previous = after[f'share_within_{limit}_miles'], before[f'share_within_{limit}_miles']
+                column.metric(f"Clients within {limit} miles", f"{share:.0%}", f"{(share - previous) * 100:+.1f} pts")
+            st.dataframe(
+                proposal['sites'].rename(columns={
+                    'site': 'Site', 'latitude': 'Latitude', 'longitude': 'Longitude',
+                    'nearest_zip': 'Nearest ZIP', 'clients_served': 'SPCA Clients Served',
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
         
-        # Calculate total clients
-        total_clients = sum(
-            feature['properties'].get('client_count', 0) 
-            for feature in survey_data['features']
+        if travel is not None:
+            with st.expander("Travel time to the nearest pantry by ZIP code"):
+                st.dataframe(
+                    travel['zip_times'].sort_values('client_count', ascending=False).rename(columns={
+                        'ZCTA5CE10': 'ZIP Code', 'client_count': 'SPCA Clients',
+                        'drive_minutes': 'Drive (min)', 'walk_minutes': 'Walk (min)',
+                    }),
+                    hide_index=True,
+                    use_container_width=True
+                )
+        
+        if overlay_name == 'gap':
+            st.subheader("Top Service Gaps")
+            st.caption("Places with the most SPCA client demand times distance to the nearest pantry, at least 5 km apart.")
+            st.dataframe(
+                dataset['gap_analysis']['hotspots'].rename(columns={
+                    'rank': 'Rank', 'nearest_zip': 'Nearest ZIP', 'gap_score': 'Gap score',
+                    'clients_per_sq_mile': 'Clients / sq mi', 'miles_to_pantry': 'Miles to pantry',
+                    'nearest_pantry': 'Nearest pantry', 'latitude': 'Latitude', 'longitude': 'Longitude',
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+    else:
+        st.error("Failed to load data. Please check your data files.")
+
+if show_debug_panel:
+    with st.expander("Performance (debug)", expanded=True):
+        st.caption(
+            "Stages inside cached functions only appear on a cache miss. "
+            "Memory figures come from tracemalloc and cover Python allocations only."
         )
-        st.write(f"**👥 Total SPCA Clients:** {total_clients:,}")
-else:
-    st.error("Failed to load data. Please check your data files.")
+        if profile:
+            profile_df = pd.DataFrame(profile)
+            profile_df['stage'] = [' ' * depth + name for depth, name in zip(profile_df['depth'], profile_df['name'])]
+            for column in ['allocated_bytes', 'peak_bytes', 'payload_bytes']:
+                if column in profile_df:
+                    profile_df[column.replace('_bytes', '_kb')] = (profile_df[column] / 1024).round(1)
+            columns = ['stage', 'seconds'] + [c for c in ['allocated_kb', 'peak_kb', 'payload_kb'] if c in profile_df]
+            st.dataframe(profile_df[columns], hide_index=True, use_container_width=True)
 
 # --- SIDEBAR: Adoption/Support Links ---
 with st.sidebar:
@@ -0,0 +1,102 @@
+"""Import-time profile of the app's startup imports.
+
+Runs `python -X importtime` in a fresh interpreter for each target and turns
+the output into a table of the slowest modules, so cold-start regressions
+(e.g. a heavy module creeping back onto the import path) are easy to spot:
+
+    python benchmarks/import_profile.py
+    python benchmarks/import_profile.py --target geopandas --top 30 --output imports.json
+"""
+import os
+import sys
+import ast
+import json
+import argparse
+import subprocess
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APP_PATH = os.path.join(PROJECT_ROOT, 'app.py')
+
+def app_imports(path=APP_PATH):
+    """One import statement for every module app.py imports at top level, read from its source.
+
+    Deferred imports inside functions are left out, as they are at startup.
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        modules.extend(name for name in names if name not in modules)
+    return "import " + ", ".join(modules)
+
+# Constants
+# The imports app.py performs before any data is touched, read from app.py itself so the list keeps up with it
+APP_IMPORTS = app_imports()
+DEFAULT_TARGETS = {
+    'app': APP_IMPORTS,
+    'geopandas': "import geopandas",
+}
+DEFAULT_TOP = 20
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` lines into dicts of self/cumulative microseconds per module."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+        })
+    return rows
+
+def profile(code):
+    """Import-time rows for running `code` in a fresh interpreter."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return parse_importtime(completed.stderr)
+
+def summarize(rows, top=DEFAULT_TOP):
+    """Total import time and the `top` modules by cumulative time."""
+    # Top-level imports have depth 0; their cumulative times add up to the total
+    total_us = sum(row['cumulative_us'] for row in rows if row['depth'] == 0)
+    slowest = sorted(rows, key=lambda row: row['cumulative_us'], reverse=True)[:top]
+    return {'total_ms': round(total_us / 1000, 1), 'modules': len(rows), 'slowest': slowest}
+
+def print_table(name, summary):
+    """Print one target's summary as a fixed-width table."""
+    print(f"\n{name}: {summary['total_ms']:,.1f} ms across {summary['modules']} modules")
+    print(f"  {'module':<48}{'cumulative ms':>15}{'self ms':>10}")
+    for row in summary['slowest']:
+        print(f"  {row['module']:<48}{row['cumulative_us'] / 1000:>15,.1f}{row['self_us'] / 1000:>10,.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile import time of the app's startup imports.")
+    parser.add_argument('--target', action='append', help="Module to profile instead of the defaults")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP)
+    parser.add_argument('--output', help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    targets = {name: f"import {name}" for name in args.target} if args.target else DEFAULT_TARGETS
+    results = {}
+    for name, code in targets.items():
+        results[name] = summarize(profile(code), args.top)
+        print_table(name, results[name])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
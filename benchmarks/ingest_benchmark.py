@@ -0,0 +1,103 @@
+"""Memory and time of client export ingestion, eager versus chunked.
+
+For each synthetic scale, counts clients per ZIP both ways in a fresh
+interpreter: `eager` reads the whole export with pd.read_csv() before
+validating and counting (the old path), `stream` is stream_client_counts().
+The chunked path's peak memory should stay flat as the export grows:
+
+    python benchmarks/ingest_benchmark.py --scales erie wny statewide
+    python benchmarks/ingest_benchmark.py --scales statewide --chunk-rows 100000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.run_benchmarks import DATA_DIR, peak_rss_mb
+
+# Constants
+DEFAULT_SCALES = ['erie', 'wny', 'statewide']
+MODES = ['eager', 'stream']
+
+def ingest(mode, path, zip_codes, chunk_rows):
+    """Clients per ZIP from the export at `path`, the eager or the chunked way."""
+    import pandas as pd
+    from shared.dataset import stream_client_counts
+    from shared.validation import validate_clients
+
+    if mode == 'eager':
+        # The whole-file read the app used before streaming, kept here as the baseline
+        client_zips, _ = validate_clients(pd.read_csv(path), zip_codes)
+        return client_zips.value_counts().rename_axis('ZCTA5CE10').rename('client_count').reset_index()
+    zip_counts, _ = stream_client_counts(zip_codes, path=path, chunk_rows=chunk_rows)
+    return zip_counts
+
+def run_mode(scale, mode, chunk_rows, seed=0):
+    """Time one ingestion and measure how far it pushed peak RSS above the imports."""
+    from benchmarks.synthetic_data import SCALES, generate_scale
+    from shared.dataset import CLIENT_CHUNK_ROWS, load_zip_boundaries
+
+    paths = generate_scale(scale, DATA_DIR, seed)
+    survey_data = load_zip_boundaries(paths['zip_boundaries'])
+    zip_codes = [str(feature['properties']['ZCTA5CE10']) for feature in survey_data['features']]
+    # Peak RSS only ever grows, so this subprocess measures a single run
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    zip_counts = ingest(mode, paths['clients'], zip_codes, chunk_rows or CLIENT_CHUNK_ROWS)
+    seconds = time.perf_counter() - start
+    rss_after = peak_rss_mb()
+    return {
+        'clients': SCALES[scale][0],
+        'file_mb': round(os.path.getsize(paths['clients']) / 1024 / 1024, 1),
+        'clients_counted': int(zip_counts['client_count'].sum()),
+        'seconds': round(seconds, 3),
+        'peak_rss_mb': round(rss_after, 1) if rss_after else None,
+        'ingest_rss_mb': round(rss_after - rss_before, 1) if rss_after and rss_before else None,
+    }
+
+def run_in_subprocess(scale, mode, chunk_rows, seed):
+    """Run one scale and mode in a fresh interpreter so its memory peak is its own."""
+    command = [sys.executable, os.path.abspath(__file__), '--worker', scale, mode, '--seed', str(seed)]
+    if chunk_rows:
+        command += ['--chunk-rows', str(chunk_rows)]
+    completed = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Ingest benchmark for {scale}/{mode} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    from benchmarks.synthetic_data import SCALES
+
+    parser = argparse.ArgumentParser(description="Compare eager and chunked client export ingestion.")
+    parser.add_argument('--scales', nargs='+', default=DEFAULT_SCALES, choices=list(SCALES))
+    parser.add_argument('--chunk-rows', type=int, help="Rows per chunk (default: shared.dataset.CLIENT_CHUNK_ROWS)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Also write the results to this JSON file")
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_mode(args.worker[0], args.worker[1], args.chunk_rows, args.seed)))
+        sys.exit(0)
+
+    results = {}
+    print(f"{'scale':<12}{'mode':<8}{'clients':>12}{'file MB':>10}{'seconds':>10}{'ingest MB':>11}{'peak MB':>10}")
+    for scale in args.scales:
+        results[scale] = {}
+        for mode in MODES:
+            result = run_in_subprocess(scale, mode, args.chunk_rows, args.seed)
+            results[scale][mode] = result
+            print(f"{scale:<12}{mode:<8}{result['clients']:>12,}{result['file_mb']:>10}{result['seconds']:>10}"
+                  f"{result['ingest_rss_mb']:>11}{result['peak_rss_mb']:>10}")
+        if results[scale]['eager']['clients_counted'] != results[scale]['stream']['clients_counted']:
+            sys.exit(f"{scale}: eager and chunked ingestion counted different totals")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
@@ -0,0 +1,328 @@
+"""Concurrent-session load test of the Streamlit app.
+
+Starts the app with `streamlit run` on a free local port and drives N
+headless websocket clients at once, each acting like a staff member's
+browser tab: open the page, then change classes, add a heat layer, switch to
+hexagons, change renderer and propose sites, waiting for each rerun to
+finish. Every session count gets a fresh server; rerun latency percentiles,
+throughput and the server's memory are written as JSON and can be compared
+against an earlier run:
+
+    python benchmarks/load_test.py --sessions 1 2 4 8
+    python benchmarks/load_test.py --compare benchmarks/results/load-baseline.json --fail-on-regression
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import platform
+import argparse
+import subprocess
+import urllib.request
+from datetime import datetime
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from tornado.httpclient import HTTPRequest
+from tornado.websocket import websocket_connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from benchmarks.run_benchmarks import RESULTS_DIR, REGRESSION_THRESHOLD, git_commit
+from shared.classify import SCHEMES
+from shared.webgl_layers import BACKENDS
+
+# Constants
+APP_PATH = os.path.join(PROJECT_ROOT, 'app.py')
+HOST = '127.0.0.1'
+DEFAULT_SESSIONS = [1, 2, 4, 8]
+DEFAULT_ITERATIONS = 2
+SERVER_START_TIMEOUT = 60
+# Generous: a cold first rerun may build the whole dataset
+RERUN_TIMEOUT = 300
+PERCENTILES = [50, 95, 99]
+# One simulated visit: (step name, widget label, option as shown, or a number); None opens the page
+SCENARIO = [
+    ('open', None, None),
+    ('change classes', "Client density classes", SCHEMES['jenks']),
+    ('demand heat layer', "Heat layer", 'Client demand'),
+    ('hexagon view', "Areas", 'Hexagon grid'),
+    ('zip view', "Areas", 'ZIP code areas'),
+    ('plotly renderer', "Map renderer", BACKENDS['plotly']),
+    ('propose sites', "Propose new pantry sites", 3),
+    ('folium renderer', "Map renderer", BACKENDS['folium']),
+]
+
+def free_port():
+    """A TCP port nothing is listening on right now."""
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+def start_server(port):
+    """`streamlit run app.py` in the background; returns the process once it answers health checks."""
+    command = [
+        sys.executable, '-m', 'streamlit', 'run', APP_PATH,
+        '--server.headless', 'true', '--server.address', HOST, '--server.port', str(port),
+        '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false',
+    ]
+    server = subprocess.Popen(command, cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Streamlit exited on startup:\n{server.stderr.read()}")
+        try:
+            with urllib.request.urlopen(f'http://{HOST}:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.25)
+    server.kill()
+    raise RuntimeError(f"Streamlit didn't answer on port {port} within {SERVER_START_TIMEOUT}s")
+
+def process_rss_mb(pid):
+    """Resident set size of a process in MB (Linux only; None elsewhere)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def widget_state(widget, value):
+    """WidgetState the browser would send after setting `widget` (an element proto) to `value`."""
+    kind = widget.WhichOneof('type')
+    proto = getattr(widget, kind)
+    state = WidgetState(id=proto.id)
+    if kind == 'radio':
+        state.int_value = list(proto.options).index(value)
+    elif kind == 'selectbox':
+        if value not in proto.options:
+            raise ValueError(f"{value!r} isn't an option of {proto.label!r}")
+        state.string_value = value
+    elif kind == 'multiselect':
+        state.string_array_value.data[:] = value
+    elif kind == 'checkbox':
+        state.bool_value = value
+    elif kind == 'slider':
+        state.double_array_value.data[:] = [value]
+    else:
+        raise ValueError(f"Can't set a {kind} widget")
+    return state
+
+class Session:
+    """One headless browser tab: a websocket to the app and the widgets it last rendered."""
+
+    def __init__(self, url):
+        self.url = url
+        self.connection = None
+        self.widgets = {}
+        # Every widget value this tab has set, sent with each rerun the way the browser does
+        self.states = {}
+
+    async def connect(self):
+        request = HTTPRequest(self.url, connect_timeout=SERVER_START_TIMEOUT)
+        self.connection = await websocket_connect(request, subprotocols=['streamlit'], max_message_size=1 << 30)
+
+    async def rerun(self, label=None, value=None):
+        """Set a widget (or nothing, for the first load) and wait for the script to finish; returns error messages."""
+        if label is not None:
+            if label not in self.widgets:
+                raise LookupError(f"No widget labelled {label!r} on the page")
+            state = widget_state(self.widgets[label], value)
+            self.states[state.id] = state
+        message = BackMsg()
+        message.rerun_script.widget_states.widgets.extend(self.states.values())
+        await self.connection.write_message(message.SerializeToString(), binary=True)
+
+        errors = []
+        while True:
+            payload = await asyncio.wait_for(self.connection.read_message(), RERUN_TIMEOUT)
+            if payload is None:
+                raise ConnectionError("The server closed the connection")
+            forward = ForwardMsg()
+            forward.ParseFromString(payload)
+            kind = forward.WhichOneof('type')
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_kind = element.WhichOneof('type')
+                if element_kind == 'exception':
+                    errors.append(element.exception.message)
+                elif element_kind == 'alert' and element.alert.format == Alert.ERROR:
+                    errors.append(element.alert.body)
+                elif element_kind in ('radio', 'selectbox', 'multiselect', 'checkbox', 'slider'):
+                    self.widgets[getattr(element, element_kind).label] = element
+            elif kind == 'script_finished' and forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return errors
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+async def run_visit(url, session_id, iterations, latencies, errors):
+    """One simulated user: a fresh tab per pass through the scenario, timing each rerun.
+
+    Returns the last tab still connected, so the server's memory can be read
+    while every session is alive.
+    """
+    session = None
+    for _ in range(iterations):
+        if session is not None:
+            session.close()
+        session = Session(url)
+        try:
+            await session.connect()
+        except Exception as e:
+            errors.append(f"session {session_id}, connect: {e!r}")
+            return session
+        for step, label, value in SCENARIO:
+            start = time.perf_counter()
+            try:
+                step_errors = await session.rerun(label, value)
+            except Exception as e:
+                errors.append(f"session {session_id}, {step}: {e!r}")
+                return session
+            latencies.append((step, time.perf_counter() - start))
+            if step_errors:
+                errors.extend(f"session {session_id}, {step}: {message}" for message in step_errors)
+                return session
+    return session
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+async def drive_sessions(url, sessions, iterations, warm, server_pid):
+    """Warm the server if asked, then run every session at once; returns the timings and memory readings."""
+    if warm:
+        # A running server has already loaded the dataset once; start from there
+        warmup = Session(url)
+        await warmup.connect()
+        await warmup.rerun()
+        warmup.close()
+        await asyncio.sleep(1)
+    rss_before = process_rss_mb(server_pid)
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    connected = await asyncio.gather(*[run_visit(url, n, iterations, latencies, errors) for n in range(sessions)])
+    elapsed = time.perf_counter() - start
+    rss_after = process_rss_mb(server_pid)
+    for session in connected:
+        if session is not None:
+            session.close()
+    return latencies, errors, elapsed, rss_before, rss_after
+
+def run_sessions(sessions, iterations=DEFAULT_ITERATIONS, warm=True):
+    """Load-test one session count against a fresh server; returns latency percentiles, throughput and memory."""
+    port = free_port()
+    server = start_server(port)
+    try:
+        rss_start = process_rss_mb(server.pid)
+        latencies, errors, elapsed, rss_before, rss_after = asyncio.run(
+            drive_sessions(f'ws://{HOST}:{port}/_stcore/stream', sessions, iterations, warm, server.pid)
+        )
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    seconds = [latency for _, latency in latencies]
+    by_step = {}
+    for step, latency in latencies:
+        by_step.setdefault(step, []).append(latency)
+    return {
+        'params': {'sessions': sessions, 'iterations': iterations, 'warm': warm, 'steps': len(SCENARIO)},
+        'reruns': len(seconds),
+        'errors': errors,
+        'latency_s': {f'p{q}': round(percentile(seconds, q), 4) for q in PERCENTILES} if seconds else {},
+        'step_p50_s': {step: round(percentile(values, 50), 4) for step, values in by_step.items()},
+        'throughput_reruns_per_s': round(len(seconds) / elapsed, 2) if elapsed else None,
+        'wall_s': round(elapsed, 2),
+        # Memory of the server process, which is what grows with every connected session
+        'rss_mb': {
+            'start': round(rss_start, 1) if rss_start else None,
+            'warm': round(rss_before, 1) if rss_before else None,
+            'end': round(rss_after, 1) if rss_after else None,
+            'per_session': round((rss_after - rss_before) / sessions, 1) if rss_after and rss_before else None,
+        },
+    }
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print latency, throughput and memory ratios against a baseline; return the regressed (sessions, metric) pairs."""
+    regressions = []
+    for sessions, result in current['sessions'].items():
+        base = baseline['sessions'].get(sessions)
+        if base is None:
+            continue
+        print(f"\n{sessions} sessions")
+        print(f"  {'metric':<24}{'baseline':>12}{'current':>12}{'ratio':>8}")
+        rows = [(f"{name} (s)", base['latency_s'].get(name), value, False) for name, value in result['latency_s'].items()]
+        # Lower throughput is the regression here
+        rows.append(('throughput (reruns/s)', base['throughput_reruns_per_s'], result['throughput_reruns_per_s'], True))
+        rows.append(('rss per session (MB)', base['rss_mb'].get('per_session'), result['rss_mb'].get('per_session'), False))
+        rows.append(('server rss (MB)', base['rss_mb'].get('end'), result['rss_mb'].get('end'), False))
+        for name, old, new, higher_is_better in rows:
+            if not old or new is None or old <= 0:
+                continue
+            ratio = new / old
+            worse = ratio < 1 / threshold if higher_is_better else ratio > threshold
+            flag = '  <-- regression' if worse else ''
+            print(f"  {name:<24}{old:>12,.4g}{new:>12,.4g}{ratio:>8.2f}{flag}")
+            if worse:
+                regressions.append((sessions, name))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the SPCA map app with concurrent sessions.")
+    parser.add_argument('--sessions', nargs='+', type=int, default=DEFAULT_SESSIONS)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="Scenario passes per session")
+    parser.add_argument('--cold', action='store_true', help="Don't warm the caches before timing")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'sessions': {},
+    }
+    failed = False
+    for sessions in args.sessions:
+        print(f"Running {sessions} concurrent session(s)...")
+        result = run_sessions(sessions, args.iterations, not args.cold)
+        results['sessions'][str(sessions)] = result
+        latency = result['latency_s']
+        print(f"  p50 {latency.get('p50', 0):.2f}s  p95 {latency.get('p95', 0):.2f}s  p99 {latency.get('p99', 0):.2f}s  "
+              f"{result['throughput_reruns_per_s']} reruns/s  {result['rss_mb']['per_session']} MB/session")
+        for error in result['errors']:
+            print(f"  error: {error}")
+        failed = failed or bool(result['errors'])
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(f"{len(regressions)} regression(s) over {args.threshold}x")
+    if failed:
+        sys.exit("Some sessions failed; see the errors above")
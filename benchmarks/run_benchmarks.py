@@ -0,0 +1,247 @@
+"""Benchmark the map data pipeline at several synthetic data scales.
+
+Each scale runs in its own subprocess so peak RSS is measured per scale.
+Results are written as JSON and can be compared against an earlier run:
+
+    python benchmarks/run_benchmarks.py --scales erie wny
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+# Constants
+DATA_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', '.data')
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'results')
+DEFAULT_SCALES = ['erie', 'wny']
+DEFAULT_REPEAT = 3
+# A stage this much slower (or bigger) than the baseline counts as a regression
+REGRESSION_THRESHOLD = 1.25
+# Stages faster than this are too noisy to flag
+MIN_FLAGGED_SECONDS = 0.05
+# Random points placed in ZIPs at once by the bulk lookup stage
+LOOKUP_POINTS = 100_000
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def timed(stages, name, fn, *args, **kwargs):
+    """Run fn, recording its wall time in seconds under `name`."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    stages[name] = round(time.perf_counter() - start, 4)
+    return result
+
+def run_pipeline(paths, stages):
+    """Run every pipeline stage once, timing each into `stages`; return the outputs."""
+    import numpy as np
+    from shared.dataset import (
+        load_pantries, load_zip_boundaries, stream_client_counts, build_zip_frame, build_zip_centroids,
+        classify_column
+    )
+    from shared.validation import validate_pantries
+    from shared.dedup import dedupe_pantries
+    from shared.gap_analysis import build_gap_analysis
+    from shared.facility_location import propose_sites
+    from shared.classify import DEFAULT_SCHEME, DEFAULT_CLASSES
+    from shared.normalize import METRICS, add_rate_columns
+    from shared.geojson_utils import emit_geojson, feature_bounds
+    from shared.regions import zip_regions, region_bounds
+    from shared.zcta_index import ZctaIndex
+    from shared.clustering import build_clusters, visible_clusters
+    from shared.map_layers import view_for_bounds, build_base_map, add_pantry_clusters, add_zip_layer
+
+    # load_data
+    pantry_df = timed(stages, 'load_pantries', load_pantries, paths['pantries'])
+    survey_data = timed(stages, 'load_zip_boundaries', load_zip_boundaries, paths['zip_boundaries'])
+
+    # Validation and cleanup
+    zip_codes = [str(feature['properties']['ZCTA5CE10']) for feature in survey_data['features']]
+    boxes = list(region_bounds(survey_data, zip_regions(zip_codes)).values())
+    zcta_index = timed(stages, 'zcta_index', ZctaIndex, survey_data)
+    pantry_df, _ = timed(stages, 'validate_pantries', validate_pantries, pantry_df, zcta_index, boxes)
+    (south, west), (north, east) = feature_bounds(survey_data['features'])
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(south, north, LOOKUP_POINTS), rng.uniform(west, east, LOOKUP_POINTS)
+    timed(stages, 'zcta_lookup_100k', zcta_index.lookup_many, lats, lons)
+    # Reading, validating and counting clients is one streaming pass
+    zip_counts, _ = timed(stages, 'stream_client_counts', stream_client_counts, zip_codes, path=paths['clients'])
+    pantry_df = timed(stages, 'dedupe_pantries', dedupe_pantries, pantry_df)
+
+    # Choropleth build
+    gdf = timed(stages, 'build_zip_frame', build_zip_frame, survey_data, zip_counts)
+    metrics = timed(stages, 'add_rate_columns', add_rate_columns, gdf)
+
+    def classify_all():
+        return {
+            metric: classify_column(gdf, metric, DEFAULT_SCHEME, DEFAULT_CLASSES, class_column=f'{metric}_class',
+                                    integer=METRICS[metric][2] is None)
+            for metric in metrics
+        }
+    classified = timed(stages, 'classify', classify_all)
+    styles = {metric: pair[0] for metric, pair in classified.items()}
+    keep = ['ZCTA5CE10'] + metrics + [f'{metric}_class' for metric in metrics]
+    zip_layer = timed(stages, 'emit_geojson', emit_geojson, gdf.__geo_interface__, keep=keep)
+
+    # Gap analysis and site proposals over the whole area
+    zip_centroids = timed(stages, 'build_zip_centroids', build_zip_centroids, survey_data, zip_counts)
+    timed(stages, 'gap_analysis', build_gap_analysis, zip_centroids, pantry_df)
+    timed(stages, 'propose_sites', propose_sites, zip_centroids, pantry_df, 5)
+
+    # Map construction and serialization
+    bounds = feature_bounds(zip_layer['features'])
+    m = timed(stages, 'build_base_map', build_base_map, bounds)
+    clusters = timed(stages, 'build_clusters', build_clusters, pantry_df['latitude'], pantry_df['longitude'])
+    # The markers of the map's opening view, as the app sends them
+    level, visible = visible_clusters(clusters, view_for_bounds(bounds)[1], bounds)
+    timed(stages, 'add_pantry_markers', add_pantry_clusters, m, pantry_df, level, visible)
+    timed(stages, 'add_zip_layer', add_zip_layer, m, zip_layer, styles)
+    html = timed(stages, 'render_html', lambda: m.get_root().render())
+    return {
+        'pantry_df': pantry_df,
+        'survey_data': survey_data,
+        'zip_counts': zip_counts,
+        'metrics': metrics,
+        'zip_layer': zip_layer,
+        'html': html,
+    }
+
+def run_scale(scale, seed=0, repeat=DEFAULT_REPEAT):
+    """Benchmark one synthetic data set, keeping the median time of each stage."""
+    from benchmarks.synthetic_data import SCALES, generate_scale
+    from shared.normalize import METRICS
+    from shared.geojson_utils import geojson_size
+
+    paths = generate_scale(scale, DATA_DIR, seed)
+    rss_before = peak_rss_mb()
+    runs = []
+    for _ in range(repeat):
+        stages = {}
+        outputs = run_pipeline(paths, stages)
+        stages['total'] = sum(stages.values())
+        runs.append(stages)
+    median = {name: round(sorted(run[name] for run in runs)[len(runs) // 2], 4) for name in runs[0]}
+
+    clients, pantries, copies = SCALES[scale]
+    return {
+        'params': {'clients': clients, 'pantries': pantries, 'zcta_copies': copies, 'seed': seed, 'repeat': repeat},
+        'rows': {
+            'pantries_kept': len(outputs['pantry_df']),
+            'zip_features': len(outputs['survey_data']['features']),
+            'zip_codes_counted': len(outputs['zip_counts']),
+            'metrics': [METRICS[m][0] for m in outputs['metrics']],
+        },
+        'stages': median,
+        'bytes': {
+            'input_total': sum(os.path.getsize(p) for p in paths.values()),
+            'zip_layer': geojson_size(outputs['zip_layer']),
+            'html': len(outputs['html'].encode('utf-8')),
+        },
+        'peak_rss_mb': {
+            'after_generate': round(rss_before, 1) if rss_before else None,
+            'peak': round(peak_rss_mb(), 1) if rss_before else None,
+        },
+    }
+
+def run_in_subprocess(scale, seed, repeat):
+    """Benchmark one scale in a fresh interpreter so its memory peak is isolated."""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', scale, '--seed', str(seed), '--repeat', str(repeat)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark for scale '{scale}' failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_commit():
+    """Current commit hash, if this is a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print stage-by-stage ratios against a baseline; return the regressed (scale, metric) pairs."""
+    regressions = []
+    for scale, result in current['scales'].items():
+        if scale not in baseline['scales']:
+            continue
+        base = baseline['scales'][scale]
+        print(f"\n{scale}")
+        print(f"  {'metric':<24}{'baseline':>12}{'current':>12}{'ratio':>8}")
+        rows = [
+            (f"{name} (s)", base['stages'].get(name), value)
+            for name, value in result['stages'].items()
+            if max(value, base['stages'].get(name) or 0) >= MIN_FLAGGED_SECONDS
+        ]
+        rows += [(f"{name} (bytes)", base['bytes'].get(name), value) for name, value in result['bytes'].items()]
+        rows.append(('peak_rss (MB)', base['peak_rss_mb'].get('peak'), result['peak_rss_mb'].get('peak')))
+        for name, old, new in rows:
+            if not old or new is None:
+                continue
+            ratio = new / old
+            flag = '  <-- regression' if ratio > threshold else ''
+            print(f"  {name:<24}{old:>12,.4g}{new:>12,.4g}{ratio:>8.2f}{flag}")
+            if flag:
+                regressions.append((scale, name))
+    return regressions
+
+if __name__ == "__main__":
+    from benchmarks.synthetic_data import SCALES
+
+    parser = argparse.ArgumentParser(description="Benchmark the SPCA map data pipeline.")
+    parser.add_argument('--scales', nargs='+', default=DEFAULT_SCALES, choices=list(SCALES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Runs per scale; the median is kept")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scale(args.worker, args.seed, args.repeat)))
+        sys.exit(0)
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scales': {},
+    }
+    for scale in args.scales:
+        print(f"Running {scale}...")
+        results['scales'][scale] = run_in_subprocess(scale, args.seed, args.repeat)
+        stages = results['scales'][scale]['stages']
+        print(f"  total {stages['total']:.2f}s, peak RSS {results['scales'][scale]['peak_rss_mb']['peak']} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
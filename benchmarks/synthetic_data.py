@@ -0,0 +1,158 @@
+"""Synthetic scale-up of the map_data inputs for benchmarking.
+
+Generates a PantryMap-style client export, a geocoded pantry list and a ZCTA
+FeatureCollection at a chosen size, using the real Erie County files as the
+template so value distributions and polygon complexity stay realistic.
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from shared.dataset import CLIENTS_PATH, PANTRY_PATH, ZIP_BOUNDARIES_PATH
+
+# Constants
+# name -> (client rows, pantries, copies of the Erie ZCTA set)
+SCALES = {
+    'erie': (10_000, 240, 1),
+    'wny': (100_000, 2_000, 8),
+    'statewide': (1_000_000, 10_000, 20),
+    'max': (10_000_000, 50_000, 20),
+}
+# Grid step between copies of the Erie polygons, in degrees
+TILE_STEP = (1.0, 0.8)
+# Share of client rows with a ZIP outside the polygon set, and with no ZIP at all
+UNMATCHED_SHARE = 0.01
+MISSING_SHARE = 0.001
+CHUNK_ROWS = 1_000_000
+
+def template_path(name):
+    """Absolute path of a real input file used as the template."""
+    return os.path.join(PROJECT_ROOT, name)
+
+def shift_coordinates(coords, dx, dy):
+    """Translate nested GeoJSON coordinates by (dx, dy)."""
+    if isinstance(coords[0], (int, float)):
+        return [round(coords[0] + dx, 6), round(coords[1] + dy, 6)]
+    return [shift_coordinates(c, dx, dy) for c in coords]
+
+def tile_offsets(copies):
+    """(dx, dy) shift of every copy of the county, laid out on a square-ish grid."""
+    columns = int(np.ceil(np.sqrt(copies)))
+    return [((copy % columns) * TILE_STEP[0], (copy // columns) * TILE_STEP[1]) for copy in range(copies)]
+
+def make_zip_boundaries(copies):
+    """Tile the Erie ZCTA polygons `copies` times, giving each copy fresh ZIP codes."""
+    with open(template_path(ZIP_BOUNDARIES_PATH), 'r') as f:
+        template = json.load(f)
+
+    features = []
+    next_zip = 10000
+    for copy, (dx, dy) in enumerate(tile_offsets(copies)):
+        for feature in template['features']:
+            properties = dict(feature['properties'])
+            if copy > 0:
+                properties['ZCTA5CE10'] = properties['GEOID10'] = str(next_zip)
+                next_zip += 1
+            features.append({
+                'type': 'Feature',
+                'properties': properties,
+                'geometry': {
+                    'type': feature['geometry']['type'],
+                    'coordinates': shift_coordinates(feature['geometry']['coordinates'], dx, dy),
+                },
+            })
+    return {'type': 'FeatureCollection', 'name': template.get('name'), 'features': features}
+
+def write_clients(path, rows, zip_codes, rng):
+    """Write a PantryMap.csv-shaped export with `rows` clients spread over `zip_codes`."""
+    real = pd.read_csv(template_path(CLIENTS_PATH))
+    weights = real['Postal Code'].value_counts(normalize=True).to_numpy()
+    # Reuse the real skew of clients across ZIPs, cycled over the synthetic ZIPs
+    weights = np.resize(weights, len(zip_codes))
+    weights = weights / weights.sum()
+    dates = pd.to_datetime(real['Association Creation Date'], format='%m/%d/%y', errors='coerce').dropna()
+    date_strings = (
+        dates.dt.month.astype(str) + '/' + dates.dt.day.astype(str) + '/' + dates.dt.strftime('%y')
+    ).to_numpy()
+
+    zip_values = np.asarray(zip_codes, dtype=float)
+    written = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        f.write('Person ID,Association Creation Date,Postal Code\n')
+        while written < rows:
+            n = min(CHUNK_ROWS, rows - written)
+            postal = zip_values[rng.choice(len(zip_values), size=n, p=weights)]
+            roll = rng.random(n)
+            postal[roll < UNMATCHED_SHARE] = 99999
+            postal[roll < MISSING_SHARE] = np.nan
+            chunk = pd.DataFrame({
+                'Person ID': [f"P{i:010d}" for i in range(written, written + n)],
+                'Association Creation Date': date_strings[rng.integers(0, len(date_strings), n)],
+                'Postal Code': postal,
+            })
+            chunk.to_csv(f, header=False, index=False)
+            written += n
+
+def write_pantries(path, count, copies, rng):
+    """Write a geocoded pantry list with `count` rows jittered around real pantries on each copy."""
+    real = pd.read_csv(template_path(PANTRY_PATH))
+    real = real.dropna(subset=['latitude', 'longitude'])
+    rows = real.iloc[rng.integers(0, len(real), count)].reset_index(drop=True)
+
+    offsets = np.array(tile_offsets(copies))[rng.integers(0, copies, count)]
+    rows['longitude'] = rows['longitude'] + offsets[:, 0] + rng.normal(0, 0.01, count)
+    rows['latitude'] = rows['latitude'] + offsets[:, 1] + rng.normal(0, 0.01, count)
+    rows['name'] = rows['name'] + ' #' + pd.Series(np.arange(count)).astype(str)
+    rows.to_csv(path, index=False)
+
+def data_paths(out_dir):
+    """Paths of the synthetic files inside `out_dir`, named like their map_data originals."""
+    return {
+        'clients': os.path.join(out_dir, os.path.basename(CLIENTS_PATH)),
+        'pantries': os.path.join(out_dir, os.path.basename(PANTRY_PATH)),
+        'zip_boundaries': os.path.join(out_dir, os.path.basename(ZIP_BOUNDARIES_PATH)),
+    }
+
+def generate(out_dir, clients, pantries, copies, seed=0):
+    """Write a full synthetic map_data set to `out_dir`; return the file paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = data_paths(out_dir)
+
+    zip_boundaries = make_zip_boundaries(copies)
+    with open(paths['zip_boundaries'], 'w') as f:
+        json.dump(zip_boundaries, f)
+
+    zip_codes = [int(f['properties']['ZCTA5CE10']) for f in zip_boundaries['features']]
+    write_clients(paths['clients'], clients, zip_codes, rng)
+    write_pantries(paths['pantries'], pantries, copies, rng)
+    return paths
+
+def generate_scale(scale, data_dir, seed=0):
+    """Generate (or reuse) the synthetic data set for a named scale."""
+    clients, pantries, copies = SCALES[scale]
+    out_dir = os.path.join(data_dir, f"{scale}-{clients}-{pantries}-{copies}-{seed}")
+    marker = os.path.join(out_dir, '.complete')
+    if not os.path.exists(marker):
+        generate(out_dir, clients, pantries, copies, seed)
+        open(marker, 'w').close()
+    return data_paths(out_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic map_data inputs.")
+    parser.add_argument('out_dir')
+    parser.add_argument('--clients', type=int, default=SCALES['erie'][0])
+    parser.add_argument('--pantries', type=int, default=SCALES['erie'][1])
+    parser.add_argument('--copies', type=int, default=SCALES['erie'][2], help="Copies of the Erie ZCTA set")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate(args.out_dir, args.clients, args.pantries, args.copies, args.seed)
+    for name, path in paths.items():
+        print(f"{name}: {path} ({os.path.getsize(path):,} bytes)")
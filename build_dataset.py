@@ -0,0 +1,12 @@
+from shared.dataset import build_dataset, save_dataset
+
+# Prebuild the map dataset so the app's first run loads a pickle instead of
+# parsing the source files (and importing geopandas). Run after updating map_data/.
+dataset = build_dataset()
+path = save_dataset(dataset)
+
+print(f"Dataset version {dataset['version']}")
+print(f"  Pantries: {len(dataset['pantries'])}")
+print(f"  ZIP code areas: {dataset['zip_feature_count']} in {len(dataset['regions'])} regions")
+print(f"  ZIP layer payload: {dataset['zip_layer_bytes'] / 1024:,.0f} KB")
+print(f"Saved to {path}")
@@ -0,0 +1,16 @@
+import sys
+from shared.road_network import ROAD_GRAPH_PATH, read_osm, save_road_graph
+
+# Convert an OSM XML extract covering the service area (e.g. exported from
+# openstreetmap.org or cut from a Geofabrik download with osmium) into the
+# compact road graph the travel-time layer reads:
+#     python build_road_graph.py erie_county.osm [map_data/road_graph.npz]
+if len(sys.argv) < 2:
+    sys.exit("Usage: python build_road_graph.py <extract.osm[.gz]> [output.npz]")
+
+output = sys.argv[2] if len(sys.argv) > 2 else ROAD_GRAPH_PATH
+graph = read_osm(sys.argv[1])
+save_road_graph(graph, output)
+
+print(f"Road graph: {len(graph['node_lat']):,} nodes, {len(graph['edge_from']):,} edges")
+print(f"Saved to {output}")
@@ -0,0 +1,41 @@
+import time
+import argparse
+from shared.classify import SCHEMES, DEFAULT_SCHEME
+from shared.normalize import METRICS, DEFAULT_METRIC
+from shared.dataset import dataset_version
+from shared.static_maps import STATIC_MAP_DIR, FORMATS, available_metrics, check_metric, render_static_maps
+
+# Printable maps of pantries and client density, one per ZIP code area and one
+# per region, for outreach handouts. Only maps whose data changed are redrawn:
+#     python render_static_maps.py
+#     python render_static_maps.py --zips 14201 14207 --regions zip-142xx --formats pdf
+parser = argparse.ArgumentParser(description="Render static PNG/PDF maps per ZIP code and region")
+parser.add_argument('--output', default=STATIC_MAP_DIR, help=f"Output directory (default: {STATIC_MAP_DIR})")
+parser.add_argument('--zips', nargs='*', help="ZIP codes to render (default: all); pass none for regions only")
+parser.add_argument('--regions', nargs='*', help="Region keys to render (default: all); pass none for ZIPs only")
+parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS)
+parser.add_argument('--scheme', choices=list(SCHEMES), default=DEFAULT_SCHEME)
+parser.add_argument('--metric', choices=list(METRICS), default=DEFAULT_METRIC)
+parser.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+parser.add_argument('--force', action='store_true', help="Redraw every map even if unchanged")
+args = parser.parse_args()
+
+# Rate metrics are only in datasets that have their denominators; report a missing one as a usage error
+try:
+    check_metric(args.metric, available_metrics(dataset_version()))
+except ValueError as e:
+    parser.error(str(e))
+
+start = time.perf_counter()
+rendered, skipped = render_static_maps(
+    args.output,
+    zips=set(args.zips) if args.zips is not None else None,
+    regions=set(args.regions) if args.regions is not None else None,
+    formats=args.formats,
+    scheme=args.scheme,
+    metric=args.metric,
+    workers=args.workers,
+    force=args.force,
+)
+print(f"Rendered {len(rendered)} maps, {len(skipped)} unchanged, in {time.perf_counter() - start:.1f}s")
+print(f"Saved to {args.output}/")
@@ -0,0 +1,16 @@
+import sys
+from shared.api import API_HOST, API_PORT, make_server
+
+# Read-only JSON API over the same dataset the app renders, for other SPCA tools:
+#     python serve_api.py [port] [host]
+# Responses are built once per dataset version and carry ETags, so clients that
+# send If-None-Match get a 304 without anything being recomputed.
+port = int(sys.argv[1]) if len(sys.argv) > 1 else API_PORT
+host = sys.argv[2] if len(sys.argv) > 2 else API_HOST
+
+server = make_server(host, port)
+print(f"Serving the map API on http://{host}:{port}/ (Ctrl+C to stop)")
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    server.server_close()
@@ -0,0 +1,55 @@
+import argparse
+from shared.tile_cache import (
+    TILE_CACHE_PATH, TILE_HOST, TILE_PORT, MAX_CACHE_MB, DEFAULT_SEED_ZOOMS, TileCache, seed_tiles, make_tile_server
+)
+
+# Local basemap tiles for offline use (e.g. kiosk laptops at outreach events).
+# Seed the cache while online, or from a folder of z/x/y.png tiles:
+#     python serve_tiles.py seed --source "https://a.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png"
+#     python serve_tiles.py seed --source "tiles/{z}/{x}/{y}.png" --zooms 8-13
+# then serve it and point the app at it:
+#     python serve_tiles.py serve
+#     SPCA_TILE_URL="http://127.0.0.1:8503/tiles/{z}/{x}/{y}.png" streamlit run app.py
+def zoom_range(text):
+    """'8-14' or '10' -> list of zoom levels."""
+    first, _, last = text.partition('-')
+    return list(range(int(first), int(last or first) + 1))
+
+def default_bounds():
+    """Bounds around the regions the app shows by default (the service area)."""
+    from shared.dataset import load_dataset
+    from shared.regions import default_regions, combined_bounds
+
+    manifest = load_dataset()['regions']
+    return combined_bounds(manifest, default_regions(manifest))
+
+parser = argparse.ArgumentParser(description="Seed or serve the local basemap tile cache")
+parser.add_argument('--cache', default=TILE_CACHE_PATH, help=f"MBTiles file (default: {TILE_CACHE_PATH})")
+parser.add_argument('--max-mb', type=float, default=MAX_CACHE_MB, help="Evict least recently used tiles past this size")
+commands = parser.add_subparsers(dest='command', required=True)
+seed = commands.add_parser('seed', help="Copy the tiles over an area into the cache")
+seed.add_argument('--source', required=True, help="Tile URL or file path template with {z}, {x} and {y}")
+seed.add_argument('--zooms', type=zoom_range, default=DEFAULT_SEED_ZOOMS, help="Zoom levels, e.g. 8-14")
+seed.add_argument('--bounds', type=lambda text: [float(v) for v in text.split(',')],
+                  help="south,west,north,east (default: the app's default regions)")
+serve = commands.add_parser('serve', help="Serve cached tiles over HTTP")
+serve.add_argument('--port', type=int, default=TILE_PORT)
+serve.add_argument('--host', default=TILE_HOST)
+serve.add_argument('--upstream', help="Tile URL template to fetch misses from (default: $SPCA_TILE_UPSTREAM, else offline)")
+args = parser.parse_args()
+
+cache = TileCache(args.cache, int(args.max_mb * 1024 * 1024))
+if args.command == 'seed':
+    bounds = [args.bounds[:2], args.bounds[2:]] if args.bounds else default_bounds()
+    counts = seed_tiles(cache, bounds, args.zooms, args.source,
+                        progress=lambda done, total: print(f"  {done:,} / {total:,} tiles"))
+    print(f"Seeded {counts['added']:,} tiles ({counts['present']:,} already cached, {counts['missing']:,} unavailable)")
+    print(f"Cache: {cache.stats()}")
+else:
+    server = make_tile_server(cache, args.host, args.port, args.upstream)
+    print(f"Serving tiles from {args.cache} on http://{args.host}:{args.port}/tiles/{{z}}/{{x}}/{{y}}.png (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+        cache.flush()
@@ -0,0 +1,346 @@
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs, urlencode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from shared.classify import SCHEMES, DEFAULT_SCHEME
+from shared.normalize import DEFAULT_METRIC
+from shared.dataset import dataset_version, load_dataset, load_shard
+from shared.regions import combine_shards
+from shared.clustering import build_clusters, visible_clusters
+
+try:
+    import brotli
+except ImportError:
+    # Optional; without it clients that accept br get gzip instead
+    brotli = None
+
+# Constants
+API_HOST = '127.0.0.1'
+API_PORT = 8502
+NEAREST_DEFAULT = 5
+NEAREST_MAX = 50
+# /nearest answers depend on the query, so only the most recent ones are kept
+MAX_CACHED_RESPONSES = 512
+# Smaller bodies aren't worth compressing
+COMPRESS_MIN_BYTES = 512
+# Fixed responses are compressed once per dataset version, so they get the slowest, smallest settings;
+# query-dependent ones are compressed while the client waits (brotli 11 takes ~2 s on the ZIP GeoJSON)
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+LIVE_GZIP_LEVEL = 6
+LIVE_BROTLI_QUALITY = 5
+# Clients may keep responses but must revalidate, which costs them a 304 at most
+CACHE_CONTROL = 'public, no-cache'
+# Preferred first when a client accepts several
+ENCODINGS = ['br', 'gzip', 'identity']
+EARTH_RADIUS_MILES = 3958.8
+ENDPOINTS = {
+    '/zips': 'Client count, region and center point per ZIP code',
+    '/pantries': 'Every pantry after validation and de-duplication',
+    '/nearest': 'Pantries nearest a point: ?lat=&lon=[&limit=]',
+    '/clusters': 'Pantry clusters and single pantries in a map view: ?zoom=&bbox=west,south,east,north',
+    '/zips.geojson': 'ZIP boundaries with fill styles: [?scheme=][&metric=][&region=key,key]',
+}
+
+logger = logging.getLogger('spca.api')
+
+class ApiError(Exception):
+    """A request the API can't answer, with the HTTP status to send."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def json_bytes(payload):
+    """Compact UTF-8 JSON; numpy scalars become plain numbers, and NaN (not valid JSON) is refused."""
+    return json.dumps(payload, separators=(',', ':'), allow_nan=False, default=lambda value: value.item()).encode('utf-8')
+
+def json_records(df):
+    """DataFrame rows as JSON-ready dicts, with missing values (NaN) as None."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def encode_body(body, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+    """{encoding: bytes} for every encoding worth offering, compressed once up front."""
+    bodies = {'identity': body}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        # mtime=0 keeps the gzip bytes identical across rebuilds of the same body
+        bodies['gzip'] = gzip.compress(body, gzip_level, mtime=0)
+        if brotli is not None:
+            bodies['br'] = brotli.compress(body, quality=brotli_quality)
+    return bodies
+
+def accepted_encodings(header):
+    """Encodings the Accept-Encoding header allows, in our order of preference."""
+    weights = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    default = weights.get('*', 0.0)
+    allowed = [name for name in ENCODINGS if weights.get(name, default) > 0]
+    # identity is acceptable unless explicitly refused
+    if 'identity' not in allowed and weights.get('identity', 1.0 if '*' not in weights else default) > 0:
+        allowed.append('identity')
+    return allowed
+
+def entity_tag(version, key, encoding='identity'):
+    """Strong ETag for one representation of a response; the body never has to be built to get it."""
+    digest = hashlib.sha1(f"{version}:{key}".encode()).hexdigest()[:16]
+    return f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+
+def matching_tags(header):
+    """Opaque tags listed in If-None-Match (weak prefixes dropped, as the weak comparison allows)."""
+    tags = set()
+    for tag in (header or '').split(','):
+        tag = tag.strip()
+        tags.add(tag[2:] if tag.startswith('W/') else tag)
+    tags.discard('')
+    return tags
+
+def single_value(params, name, default=None):
+    """Last value of a query parameter, or `default` when absent or blank."""
+    values = params.get(name)
+    return values[-1].strip() if values and values[-1].strip() else default
+
+def nearest_pantries(pantry_df, lat, lon, limit):
+    """The `limit` pantries closest to a point, with great-circle miles."""
+    lats = np.radians(pantry_df['latitude'].to_numpy(dtype=float))
+    lons = np.radians(pantry_df['longitude'].to_numpy(dtype=float))
+    lat, lon = np.radians(lat), np.radians(lon)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    miles = 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+    order = np.argsort(miles, kind='stable')[:limit]
+    nearest = pantry_records(pantry_df.iloc[order])
+    for record, distance in zip(nearest, miles[order]):
+        record['miles'] = round(float(distance), 2)
+    return nearest
+
+def pantry_records(pantry_df):
+    """Pantry rows as JSON-ready dicts."""
+    columns = [c for c in ['name', 'address', 'phone', 'hours', 'latitude', 'longitude', 'listings', 'zip', 'region'] if c in pantry_df]
+    # A pantry outside every ZIP code area has no 'zip'
+    return json_records(pantry_df[columns])
+
+def styled_geojson(zip_layer, styles, metric):
+    """ZIP FeatureCollection with each feature's fill style for `metric` in its properties."""
+    metric_styles = styles[metric]
+    features = []
+    for feature in zip_layer['features']:
+        properties = dict(feature['properties'])
+        properties.update(metric_styles[properties[f'{metric}_class']])
+        features.append({'type': 'Feature', 'properties': properties, 'geometry': feature['geometry']})
+    return {'type': 'FeatureCollection', 'features': features}
+
+class ApiState:
+    """The dataset behind the API and every response built from it, for one dataset version."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        # A version that failed to load isn't retried until the files change again
+        self.failed_version = None
+        self.dataset = None
+        self.metrics = []
+        self.clusters = None
+        # Responses to the parameterless endpoints live as long as the version;
+        # query-dependent ones are kept least-recently-used first
+        self.fixed = {}
+        self.recent = OrderedDict()
+
+    def refresh(self):
+        """Reload when the source files changed; a stat of each file per request, nothing more.
+
+        If the reload fails, the error is logged and the previous version keeps
+        being served; with no previous version (at startup) it is raised.
+        """
+        version = dataset_version()
+        with self.lock:
+            if version in (self.version, self.failed_version):
+                return
+            try:
+                self.load(version)
+            except Exception:
+                if self.dataset is None:
+                    raise
+                self.failed_version = version
+                logger.exception("Reloading the dataset failed; still serving version %s", self.version)
+
+    def load(self, version):
+        """Load a dataset version and build its fixed responses; state only changes once all of it succeeded."""
+        dataset = load_dataset(version)
+        first = next(iter(dataset['regions']))
+        metrics = load_shard(dataset, first)['zip_layers'][DEFAULT_SCHEME][1]
+        clusters = build_clusters(dataset['pantries']['latitude'], dataset['pantries']['longitude'])
+        previous = (self.dataset, self.version, self.metrics, self.clusters)
+        self.dataset, self.version, self.metrics, self.clusters = dataset, version, metrics, clusters
+        try:
+            # The fixed endpoints are ready before anyone asks
+            fixed = {}
+            for path in ['/', '/zips', '/pantries', '/zips.geojson']:
+                key, build = self.resolve(path, {})
+                fixed[key] = encode_body(json_bytes(build()))
+        except Exception:
+            self.dataset, self.version, self.metrics, self.clusters = previous
+            raise
+        finally:
+            self.recent.clear()
+        self.fixed = fixed
+        self.failed_version = None
+
+    def resolve(self, path, params):
+        """(cache key, builder) for a request; validates the query without building anything."""
+        if path == '/':
+            return path, lambda: {'version': self.version, 'endpoints': ENDPOINTS, 'regions': {
+                key: entry['name'] for key, entry in self.dataset['regions'].items()}}
+        if path == '/zips':
+            return path, lambda: json_records(self.dataset['zip_centroids'].rename(columns={'ZCTA5CE10': 'zip'}))
+        if path == '/pantries':
+            return path, lambda: pantry_records(self.dataset['pantries'])
+        if path == '/nearest':
+            try:
+                lat, lon = float(single_value(params, 'lat')), float(single_value(params, 'lon'))
+                limit = int(single_value(params, 'limit', NEAREST_DEFAULT))
+            except (TypeError, ValueError):
+                raise ApiError(400, "lat and lon are required numbers; limit must be an integer")
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ApiError(400, "lat/lon out of range")
+            # ~1 m precision; nearby repeats of the same query share one response
+            lat, lon, limit = round(lat, 5), round(lon, 5), max(1, min(limit, NEAREST_MAX))
+            key = f"{path}?{urlencode({'lat': lat, 'lon': lon, 'limit': limit})}"
+            return key, lambda: nearest_pantries(self.dataset['pantries'], lat, lon, limit)
+        if path == '/clusters':
+            try:
+                zoom = float(single_value(params, 'zoom'))
+                west, south, east, north = [float(value) for value in single_value(params, 'bbox', '').split(',')]
+            except (TypeError, ValueError):
+                raise ApiError(400, "zoom is a required number; bbox is west,south,east,north")
+            # Range checks also turn away nan and inf, which float() accepts
+            if not (0 <= zoom <= 22 and -180 <= west < east <= 180 and -90 <= south < north <= 90):
+                raise ApiError(400, "zoom or bbox out of range")
+            zoom = int(zoom)
+            # ~10 m precision is plenty for a view; near-identical views share one response
+            bbox = ','.join(f'{value:.4f}' for value in [west, south, east, north])
+            key = f"{path}?{urlencode({'zoom': zoom, 'bbox': bbox})}"
+            return key, lambda: self.cluster_records(zoom, [[south, west], [north, east]])
+        if path == '/zips.geojson':
+            scheme = single_value(params, 'scheme', DEFAULT_SCHEME)
+            metric = single_value(params, 'metric', DEFAULT_METRIC)
+            manifest = self.dataset['regions']
+            regions = sorted(set(single_value(params, 'region', ','.join(manifest)).split(',')) - {''})
+            if scheme not in SCHEMES:
+                raise ApiError(400, f"scheme must be one of: {', '.join(SCHEMES)}")
+            if metric not in self.metrics:
+                raise ApiError(400, f"metric must be one of: {', '.join(self.metrics)}")
+            unknown = [key for key in regions if key not in manifest]
+            if unknown or not regions:
+                raise ApiError(400, f"unknown region(s): {', '.join(unknown)}")
+            query = {'scheme': scheme, 'metric': metric}
+            if len(regions) < len(manifest):
+                query['region'] = ','.join(regions)
+            key = f"{path}?{urlencode(query)}"
+
+            def build():
+                (zip_layer, _, styles, _), _ = combine_shards([load_shard(self.dataset, r) for r in regions], scheme)
+                return styled_geojson(zip_layer, styles, metric)
+            return key, build
+        raise ApiError(404, "no such endpoint; see / for the list")
+
+    def cluster_records(self, zoom, bounds):
+        """Clusters and single pantries in view at `zoom`, as JSON-ready dicts."""
+        level, rows = visible_clusters(self.clusters, zoom, bounds, padding=0)
+        pantries = self.dataset['pantries']
+        records = []
+        for lat, lon, count, point in zip(level['lat'][rows], level['lon'][rows], level['count'][rows], level['point'][rows]):
+            if point >= 0:
+                records.append(dict(pantry_records(pantries.iloc[[point]])[0], count=1))
+            else:
+                records.append({'latitude': round(float(lat), 5), 'longitude': round(float(lon), 5), 'count': int(count)})
+        return records
+
+    def body(self, key, build):
+        """{encoding: bytes} for a response, built and compressed on first use only."""
+        with self.lock:
+            if key in self.fixed:
+                return self.fixed[key]
+            if key in self.recent:
+                self.recent.move_to_end(key)
+                return self.recent[key]
+        bodies = encode_body(json_bytes(build()), LIVE_GZIP_LEVEL, LIVE_BROTLI_QUALITY)
+        with self.lock:
+            self.recent[key] = bodies
+            while len(self.recent) > MAX_CACHED_RESPONSES:
+                self.recent.popitem(last=False)
+        return bodies
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """GET/HEAD handler: 304 straight from the ETag, otherwise a precompressed body."""
+
+    state = None
+    server_version = 'SPCAMapAPI/1.0'
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body):
+        split = urlsplit(self.path)
+        try:
+            self.state.refresh()
+            key, build = self.state.resolve(split.path.rstrip('/') or '/', parse_qs(split.query))
+        except ApiError as e:
+            return self.send_payload(e.status, {'identity': json_bytes({'error': str(e)})}, 'identity', None, send_body)
+
+        encodings = accepted_encodings(self.headers.get('Accept-Encoding'))
+        if not encodings:
+            return self.send_payload(406, {'identity': json_bytes({'error': 'no acceptable encoding'})}, 'identity', None, send_body)
+        # Any representation's tag proves the client already has this version of the response
+        known = matching_tags(self.headers.get('If-None-Match'))
+        tags = {encoding: entity_tag(self.state.version, key, encoding) for encoding in ENCODINGS}
+        matched = sorted(known & set(tags.values()))
+        if matched or '*' in known:
+            return self.send_payload(304, None, None, matched[0] if matched else tags['identity'], send_body)
+
+        bodies = self.state.body(key, build)
+        encoding = next(name for name in encodings + ['identity'] if name in bodies)
+        self.send_payload(200, bodies, encoding, tags[encoding], send_body)
+
+    def send_payload(self, status, bodies, encoding, etag, send_body):
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', CACHE_CONTROL)
+            self.send_header('Vary', 'Accept-Encoding')
+        if bodies is None:
+            self.end_headers()
+            return
+        body = bodies[encoding]
+        self.send_header('Content-Type', 'application/geo+json' if 'geojson' in self.path else 'application/json')
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+def make_server(host=API_HOST, port=API_PORT):
+    """Threaded HTTP server for the API, with the dataset loaded and fixed responses built."""
+    state = ApiState()
+    state.refresh()
+    handler = type('BoundApiHandler', (ApiHandler,), {'state': state})
+    return ThreadingHTTPServer((host, port), handler)
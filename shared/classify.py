@@ -0,0 +1,147 @@
+import numpy as np
+
+# Constants
+SCHEMES = {
+    'quantile': 'Quantile',
+    'jenks': 'Natural breaks (Jenks)',
+    'equal_interval': 'Equal interval',
+}
+DEFAULT_SCHEME = 'quantile'
+DEFAULT_CLASSES = 5
+
+# Light to dark, same palette the map has always used
+CLASS_COLORS = ['#ffffcc', '#fee08b', '#fdae61', '#f46d43', '#d73027']
+CLASS_OPACITY = [0.4, 0.5, 0.6, 0.7, 0.8]
+NO_CLIENTS_STYLE = {'fillColor': '#ffffff', 'color': '#666666', 'weight': 2, 'fillOpacity': 0.1}
+# A rate without a usable denominator (no population or households on record)
+NO_DATA_STYLE = {'fillColor': '#bdbdbd', 'color': '#666666', 'weight': 2, 'fillOpacity': 0.4}
+NO_CLIENTS_CLASS = -1
+NO_DATA_CLASS = -2
+
+# Jenks is quadratic in the number of values, so large inputs are sampled first
+JENKS_MAX_VALUES = 2000
+
+def quantile_breaks(values, k=DEFAULT_CLASSES):
+    """Upper class bounds splitting the values into k equal-count classes."""
+    values = np.asarray(values, dtype=float)
+    breaks = np.quantile(values, np.linspace(0, 1, k + 1)[1:])
+    return np.unique(breaks)
+
+def equal_interval_breaks(values, k=DEFAULT_CLASSES):
+    """Upper class bounds splitting the value range into k equal-width classes."""
+    values = np.asarray(values, dtype=float)
+    low, high = values.min(), values.max()
+    if low == high:
+        return np.array([high])
+    return np.linspace(low, high, k + 1)[1:]
+
+def jenks_breaks(values, k=DEFAULT_CLASSES):
+    """Upper class bounds from Fisher-Jenks natural breaks (minimum within-class variance)."""
+    values = np.sort(np.asarray(values, dtype=float))
+    if len(values) > JENKS_MAX_VALUES:
+        values = np.quantile(values, np.linspace(0, 1, JENKS_MAX_VALUES))
+    n = len(values)
+    k = min(k, len(np.unique(values)))
+    if k <= 1:
+        return np.array([values[-1]])
+
+    # Sum of squared deviations for every (start, end) slice via prefix sums
+    csum = np.concatenate([[0.0], np.cumsum(values)])
+    csum2 = np.concatenate([[0.0], np.cumsum(values ** 2)])
+    start = np.arange(n)[:, None]
+    end = np.arange(1, n + 1)[None, :]
+    count = np.maximum(end - start, 1)
+    total = csum[end] - csum[start]
+    ssd = csum2[end] - csum2[start] - total ** 2 / count
+    ssd = np.where(end > start, ssd, np.inf)
+
+    # cost[j, e] = best cost of splitting values[:e] into j + 1 classes
+    cost = np.full((k, n + 1), np.inf)
+    split = np.zeros((k, n + 1), dtype=int)
+    cost[0, 1:] = ssd[0]
+    for j in range(1, k):
+        candidates = cost[j - 1][:n, None] + ssd
+        split[j] = np.concatenate([[0], np.argmin(candidates, axis=0)])
+        cost[j, 1:] = np.min(candidates, axis=0)
+
+    # Walk the split table back to recover the class bounds
+    breaks = []
+    e = n
+    for j in range(k - 1, -1, -1):
+        breaks.append(values[e - 1])
+        e = split[j, e]
+    return np.unique(breaks)
+
+BREAK_FUNCTIONS = {
+    'quantile': quantile_breaks,
+    'jenks': jenks_breaks,
+    'equal_interval': equal_interval_breaks,
+}
+
+def compute_breaks(values, scheme=DEFAULT_SCHEME, k=DEFAULT_CLASSES, integer=False):
+    """Class upper bounds for the positive values under the given scheme.
+
+    With `integer` (counts), bounds are rounded up to whole numbers so every
+    class describes values that can actually occur.
+    """
+    if scheme not in BREAK_FUNCTIONS:
+        raise ValueError(f"Unknown classification scheme: {scheme}")
+    values = np.asarray(values, dtype=float)
+    values = values[values > 0]
+    if len(values) == 0:
+        return np.array([])
+    breaks = BREAK_FUNCTIONS[scheme](values, k)
+    return np.unique(np.ceil(breaks)) if integer else breaks
+
+def assign_classes(values, breaks):
+    """Class index per value; 0 is the lightest class, -1 marks zero and -2 missing (NaN) values."""
+    values = np.asarray(values, dtype=float)
+    classes = np.searchsorted(breaks, values, side='left')
+    classes = np.minimum(classes, max(len(breaks) - 1, 0))
+    classes = np.where(values > 0, classes, NO_CLIENTS_CLASS)
+    return np.where(np.isnan(values), NO_DATA_CLASS, classes).astype(int)
+
+def class_styles(breaks):
+    """Folium style dict for every class id, keyed by class id."""
+    n = len(breaks)
+    # Spread the palette when there are fewer classes than colours
+    palette = np.linspace(0, len(CLASS_COLORS) - 1, n).round().astype(int) if n else []
+    styles = {NO_DATA_CLASS: NO_DATA_STYLE, NO_CLIENTS_CLASS: NO_CLIENTS_STYLE}
+    for class_id, idx in enumerate(palette):
+        styles[class_id] = {
+            'fillColor': CLASS_COLORS[idx],
+            'color': '#000000',
+            'weight': 2,
+            'fillOpacity': CLASS_OPACITY[idx],
+        }
+    return styles
+
+def format_value(value):
+    """Short label for a break value."""
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}"
+
+def legend_entries(breaks, styles, unit='', integer=False, missing=False):
+    """(colour, label) pairs describing each class, lightest first.
+
+    With `integer` breaks a class starts one above the previous bound, so
+    "1 – 2", "3 – 7" rather than overlapping "2 – 7". `missing` adds a
+    "No data" entry for values that couldn't be computed.
+    """
+    entries = []
+    lower = 0
+    for class_id, upper in enumerate(breaks):
+        start = lower + 1 if integer else lower
+        if class_id == 0:
+            label = f"up to {format_value(upper)}"
+        elif integer and start == upper:
+            label = format_value(upper)
+        else:
+            label = f"{format_value(start)} – {format_value(upper)}"
+        entries.append((styles[class_id]['fillColor'], f"{label}{unit}"))
+        lower = upper
+    entries.append((NO_CLIENTS_STYLE['fillColor'], 'No clients'))
+    if missing:
+        entries.append((NO_DATA_STYLE['fillColor'], 'No data'))
+    return entries
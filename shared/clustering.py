@@ -0,0 +1,76 @@
+import math
+import numpy as np
+
+# Constants
+# Clusters are about this many screen pixels across, as with Leaflet.markercluster
+CLUSTER_RADIUS_PX = 60
+TILE_SIZE = 256
+MIN_ZOOM = 0
+# From one zoom past this, every pantry is drawn on its own
+MAX_CLUSTER_ZOOM = 15
+# Share of the viewport added on each side, so short pans already have their markers
+VIEWPORT_PADDING = 0.25
+
+def mercator_xy(lats, lons):
+    """Web Mercator position of each point, in [0, 1] across and down the world map."""
+    lats = np.clip(np.asarray(lats, dtype=float), -85.0511, 85.0511)
+    x = np.asarray(lons, dtype=float) / 360 + 0.5
+    y = 0.5 - np.log(np.tan(np.pi / 4 + np.radians(lats) / 2)) / (2 * np.pi)
+    return x, y
+
+def merge_level(x, y, count, point, cell):
+    """One zoom coarser: everything in the same `cell`-sized grid square becomes one count-weighted cluster."""
+    keys = np.floor(x / cell).astype(np.int64) * (int(1 / cell) + 2) + np.floor(y / cell).astype(np.int64)
+    _, parent = np.unique(keys, return_inverse=True)
+    counts = np.bincount(parent, weights=count)
+    merged_x = np.bincount(parent, weights=x * count) / counts
+    merged_y = np.bincount(parent, weights=y * count) / counts
+    # A cluster of one is still that pantry
+    merged_point = np.full(len(counts), -1, dtype=np.int32)
+    alone = counts[parent] == 1
+    merged_point[parent[alone]] = point[alone]
+    return merged_x, merged_y, counts.astype(np.int32), merged_point
+
+def build_clusters(lats, lons):
+    """Pantry clusters for every zoom level, each level merged from the one below it.
+
+    Returns {zoom: level}; a level holds float32 x, y (Mercator), lat, lon, the
+    int32 pantry count and the int32 pantry row of single points (-1 for
+    clusters), sorted by x so a viewport is two binary searches away. Zooms past
+    MAX_CLUSTER_ZOOM are the pantries themselves.
+    """
+    x, y = mercator_xy(lats, lons)
+    count = np.ones(len(x), dtype=np.int32)
+    point = np.arange(len(x), dtype=np.int32)
+    levels = {}
+    for zoom in range(MAX_CLUSTER_ZOOM + 1, MIN_ZOOM - 1, -1):
+        if zoom <= MAX_CLUSTER_ZOOM:
+            x, y, count, point = merge_level(x, y, count, point, CLUSTER_RADIUS_PX / (TILE_SIZE * 2 ** zoom))
+        order = np.argsort(x, kind='stable')
+        lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y[order]))))
+        levels[zoom] = {
+            'x': x[order].astype(np.float32),
+            'y': y[order].astype(np.float32),
+            'lat': lat.astype(np.float32),
+            'lon': ((x[order] - 0.5) * 360).astype(np.float32),
+            'count': count[order],
+            'point': point[order],
+        }
+    return levels
+
+def cluster_level(levels, zoom):
+    """The level drawn at a (possibly fractional) map zoom."""
+    return levels[max(MIN_ZOOM, min(MAX_CLUSTER_ZOOM + 1, math.floor(zoom)))]
+
+def visible_clusters(levels, zoom, bounds, padding=VIEWPORT_PADDING):
+    """Row positions of the clusters and single pantries inside [[south, west], [north, east]] at `zoom`.
+
+    Returns (level, rows); index the level's arrays with rows.
+    """
+    level = cluster_level(levels, zoom)
+    (south, west), (north, east) = bounds
+    (x_min, x_max), (y_max, y_min) = mercator_xy([south, north], [west, east])
+    pad_x, pad_y = (x_max - x_min) * padding, (y_max - y_min) * padding
+    start, stop = np.searchsorted(level['x'], [x_min - pad_x, x_max + pad_x])
+    inside = (level['y'][start:stop] >= y_min - pad_y) & (level['y'][start:stop] <= y_max + pad_y)
+    return level, start + np.flatnonzero(inside)
@@ -0,0 +1,295 @@
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import pandas as pd
+from shared.classify import compute_breaks, assign_classes, class_styles, legend_entries, SCHEMES, DEFAULT_SCHEME, DEFAULT_CLASSES
+from shared.normalize import DENOMINATORS_PATH, METRICS, add_rate_columns, load_denominators
+from shared.geojson_utils import emit_geojson, geojson_size, DEFAULT_PRECISION
+from shared.profiling import span, is_enabled
+from shared.demand_surface import build_demand_surface
+from shared.gap_analysis import build_gap_analysis
+from shared.hexgrid import build_hex_grid, hex_breaks
+from shared.dedup import dedupe_pantries
+from shared.validation import CLIENT_ZIP_COLUMN, REPORT_COLUMNS, validate_pantries, validate_clients, check_columns, group_rejections, write_report
+from shared.road_network import ROAD_GRAPH_PATH, build_travel_times
+from shared.zip_crosswalk import CROSSWALK_PATH, load_crosswalk
+from shared.zcta_index import ZctaIndex
+from shared.search import build_search_index
+from shared.regions import REGIONS_PATH, load_region_crosswalk, zip_regions, region_bounds, pantry_regions, build_shards
+
+# Constants
+DATA_DIR = 'map_data'
+PANTRY_PATH = os.path.join(DATA_DIR, 'geocoded_pantry_locations.csv')
+ZIP_BOUNDARIES_PATH = os.path.join(DATA_DIR, 'erie_survey_zips.geojson')
+CLIENTS_PATH = os.path.join(DATA_DIR, 'PantryMap.csv')
+# Rows of the client export held in memory at once; peak memory follows this, not the file size
+CLIENT_CHUNK_ROWS = 250_000
+SOURCE_PATHS = [PANTRY_PATH, ZIP_BOUNDARIES_PATH, CLIENTS_PATH, DENOMINATORS_PATH, ROAD_GRAPH_PATH, REGIONS_PATH, CROSSWALK_PATH]
+# Prebuilt datasets, one pickle per dataset version
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
+# Bump whenever build_dataset() output changes so stale prebuilt datasets are ignored
+DATASET_FORMAT = 16
+
+def dataset_version(paths=SOURCE_PATHS):
+    """Short fingerprint of the source files; changes whenever any of them changes."""
+    digest = hashlib.sha1(f"format:{DATASET_FORMAT}".encode())
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        else:
+            digest.update(f"{path}:missing".encode())
+    return digest.hexdigest()[:12]
+
+def load_pantries(path=PANTRY_PATH):
+    """Load the geocoded pantry listings as written by geocode_pantries.py; see validate_pantries()."""
+    with span('read_pantries_csv'):
+        return pd.read_csv(path)
+
+def load_zip_boundaries(path=ZIP_BOUNDARIES_PATH):
+    """Load the ZIP code (ZCTA) boundary FeatureCollection."""
+    with span('read_zip_geojson') as s:
+        s.set_bytes(os.path.getsize(path))
+        with open(path, 'r') as f:
+            return json.load(f)
+
+def stream_client_counts(zip_codes, crosswalk=None, path=CLIENTS_PATH, chunk_rows=CLIENT_CHUNK_ROWS):
+    """Clients per ZIP code and the client report lines, read from the export in chunks.
+
+    Only the ZIP column is parsed, as a categorical (a few hundred distinct
+    strings shared by every row); each chunk is validated and counted, then
+    dropped, and the partial counts and grouped report lines are merged. Memory
+    stays at one chunk plus the per-ZIP totals and one report line per distinct
+    bad value, however long the export grows.
+    """
+    check_columns(pd.read_csv(path, nrows=0), [CLIENT_ZIP_COLUMN], 'client export')
+    counts = pd.Series(dtype='int64')
+    reports = []
+    with span('stream_clients_csv') as s:
+        s.set_bytes(os.path.getsize(path))
+        reader = pd.read_csv(path, usecols=[CLIENT_ZIP_COLUMN], dtype={CLIENT_ZIP_COLUMN: 'category'}, chunksize=chunk_rows)
+        for chunk in reader:
+            # Chunks keep their row labels, so report lines still point at records in the file
+            client_zips, chunk_report = validate_clients(chunk, zip_codes, crosswalk)
+            counts = counts.add(client_zips.value_counts(), fill_value=0)
+            # Fold each chunk's lines into the running ones so they never pile up
+            reports = [group_rejections(pd.concat(reports + [chunk_report], ignore_index=True))]
+    zip_counts = counts.astype('int64').sort_values(ascending=False, kind='stable').rename_axis('ZCTA5CE10')
+    return zip_counts.rename('client_count').reset_index(), reports[0] if reports else pd.DataFrame(columns=REPORT_COLUMNS)
+
+def build_zip_frame(survey_data, zip_counts):
+    """GeoDataFrame of ZIP polygons joined to their client counts."""
+    # geopandas is slow to import and only needed when (re)building the dataset
+    import geopandas as gpd
+
+    with span('geodataframe_from_features'):
+        gdf = gpd.GeoDataFrame.from_features(survey_data['features'])
+        gdf['ZCTA5CE10'] = gdf['ZCTA5CE10'].astype(str)
+
+    # Merge with client count data
+    with span('merge_client_counts'):
+        gdf = gdf.merge(zip_counts, on='ZCTA5CE10', how='left')
+        gdf['client_count'] = gdf['client_count'].fillna(0).astype(int)
+    return gdf
+
+def build_zip_centroids(survey_data, zip_counts):
+    """ZIP internal points (INTPTLAT10/INTPTLON10) with their client counts."""
+    properties = [feature['properties'] for feature in survey_data['features']]
+    centroids = pd.DataFrame({
+        'ZCTA5CE10': [str(p['ZCTA5CE10']) for p in properties],
+        'latitude': pd.to_numeric([p.get('INTPTLAT10') for p in properties], errors='coerce'),
+        'longitude': pd.to_numeric([p.get('INTPTLON10') for p in properties], errors='coerce'),
+    }).dropna(subset=['latitude', 'longitude'])
+    centroids = centroids.merge(zip_counts, on='ZCTA5CE10', how='left')
+    centroids['client_count'] = centroids['client_count'].fillna(0).astype(int)
+    return centroids.reset_index(drop=True)
+
+def classify_column(gdf, column, scheme, k, unit='', class_column='class_id', integer=False):
+    """Add `class_column` for `column` and return (styles, legend) for the classes."""
+    values = gdf[column].to_numpy(dtype=float)
+    breaks = compute_breaks(values, scheme, k, integer)
+    gdf[class_column] = assign_classes(values, breaks)
+    styles = class_styles(breaks)
+    return styles, legend_entries(breaks, styles, unit, integer, missing=bool(gdf[column].isna().any()))
+
+def build_zip_layers(survey_data, zip_counts, schemes=SCHEMES, denominators=None, precision=DEFAULT_PRECISION):
+    """Classified, emit-ready ZIP layers with every density metric, one per scheme.
+
+    Returns {scheme: (zip_layer, metrics, styles, legends)}; styles and legends are keyed
+    by metric. The layers share their (rounded) geometry objects.
+    """
+    gdf = build_zip_frame(survey_data, zip_counts)
+    with span('add_rate_columns'):
+        metrics = add_rate_columns(gdf, denominators)
+
+    # Classify every metric up front so switching metric is a lookup
+    classified = {}
+    with span('classify_metrics'):
+        for scheme in schemes:
+            styles, legends = {}, {}
+            for metric in metrics:
+                styles[metric], legends[metric] = classify_column(
+                    gdf, metric, scheme, DEFAULT_CLASSES, unit=METRICS[metric][1],
+                    class_column=f'{metric}_{scheme}_class',
+                    # Raw counts are whole numbers; rates are not
+                    integer=METRICS[metric][2] is None
+                )
+            classified[scheme] = (styles, legends)
+
+    # Only ship the properties the map reads, with rounded coordinates
+    with span('emit_geojson') as s:
+        class_columns = [f'{metric}_{scheme}_class' for scheme in schemes for metric in metrics]
+        emitted = emit_geojson(gdf.__geo_interface__, keep=['ZCTA5CE10'] + metrics + class_columns, precision=precision)
+        layers = {}
+        for scheme, (styles, legends) in classified.items():
+            features = []
+            for feature in emitted['features']:
+                properties = feature['properties']
+                scheme_properties = {key: properties[key] for key in ['ZCTA5CE10'] + metrics}
+                for metric in metrics:
+                    scheme_properties[f'{metric}_class'] = properties[f'{metric}_{scheme}_class']
+                features.append({'type': 'Feature', 'properties': scheme_properties, 'geometry': feature['geometry']})
+            zip_layer = {'type': 'FeatureCollection', 'features': features}
+            layers[scheme] = (zip_layer, metrics, styles, legends)
+        if is_enabled():
+            s.set_bytes(geojson_size(zip_layer))
+    return layers
+
+def build_dataset(version=None, precision=DEFAULT_PRECISION):
+    """Everything the app renders, built from the source files in map_data/.
+
+    The ZIP layers are split into per-region shards ('shards'), described by the
+    'regions' manifest; save_dataset() writes each shard to its own file so the
+    app only reads the regions it shows.
+    """
+    survey_data = load_zip_boundaries()
+    zip_codes = [str(feature['properties']['ZCTA5CE10']) for feature in survey_data['features']]
+    zip_region = dict(zip(zip_codes, zip_regions(zip_codes, load_region_crosswalk())))
+    boxes = region_bounds(survey_data, [zip_region[zip_code] for zip_code in zip_codes])
+    with span('zcta_index'):
+        zcta_index = ZctaIndex(survey_data)
+    # Every check runs here, once; rows that reach the map are known good
+    with span('validate'):
+        pantry_listings, pantry_report = validate_pantries(load_pantries(), zcta_index, list(boxes.values()))
+        zip_counts, client_report = stream_client_counts(zip_codes, load_crosswalk())
+        validation = write_report([pantry_report, client_report])
+    with span('dedupe_pantries'):
+        pantry_df = dedupe_pantries(pantry_listings)
+    zip_layers = build_zip_layers(survey_data, zip_counts, list(SCHEMES), load_denominators(), precision)
+    zip_centroids = build_zip_centroids(survey_data, zip_counts)
+    zip_centroids['region'] = zip_centroids['ZCTA5CE10'].map(zip_region)
+    with span('shard_regions'):
+        containing = zcta_index.lookup_many(pantry_df['latitude'], pantry_df['longitude'])
+        pantry_df = pantry_df.assign(zip=containing, region=pantry_regions(pantry_df, zip_centroids, containing))
+        # Hexagons are counted per region so a selection draws only its own clients and pantries
+        hex_grids = {
+            name: build_hex_grid(zip_centroids[zip_centroids['region'] == name], pantry_df[pantry_df['region'] == name])
+            for name in boxes
+        }
+        regions, shards = build_shards(zip_layers, pantry_df, zip_region, boxes, hex_grids)
+    with span('search_index'):
+        search_index = build_search_index(pantry_df)
+    with span('demand_surface'):
+        demand_surface = build_demand_surface(zip_centroids, cache_dir=CACHE_DIR)
+    with span('gap_analysis'):
+        gap_analysis = build_gap_analysis(zip_centroids, pantry_df)
+    with span('travel_times'):
+        travel = build_travel_times(zip_centroids, pantry_df, cache_dir=CACHE_DIR)
+    return {
+        'version': version or dataset_version(),
+        'pantries': pantry_df,
+        'search_index': search_index,
+        'validation': validation,
+        'zip_counts': zip_counts,
+        'zip_feature_count': len(survey_data['features']),
+        'regions': regions,
+        'shards': shards,
+        # Every scheme shares geometry and differs only in class ids, so one size fits all
+        'zip_layer_bytes': geojson_size(zip_layers[DEFAULT_SCHEME][0]),
+        'zip_centroids': zip_centroids,
+        'demand_surface': demand_surface,
+        'gap_analysis': gap_analysis,
+        'travel': travel,
+        'hex_breaks': hex_breaks(build_hex_grid(zip_centroids, pantry_df)),
+    }
+
+def prebuilt_path(version, cache_dir=CACHE_DIR):
+    """Where the prebuilt dataset index for a version is stored."""
+    return os.path.join(cache_dir, f"dataset-{version}.pkl")
+
+def shard_dir(version, cache_dir=CACHE_DIR):
+    """Directory holding one pickle per region shard for a version."""
+    return os.path.join(cache_dir, f"shards-{version}")
+
+def save_dataset(dataset, cache_dir=CACHE_DIR):
+    """Write a built dataset to the cache (index plus one file per region), replacing older versions.
+
+    Older datasets' shards, demand rasters and travel-time caches are removed in the same pass.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    # Shards go first so an index on disk always has its shards next to it
+    directory = shard_dir(dataset['version'], cache_dir)
+    tmp_directory = directory + '.tmp'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    for key, shard in dataset['shards'].items():
+        with open(os.path.join(tmp_directory, f"{key}.pkl"), 'wb') as f:
+            pickle.dump(shard, f, protocol=pickle.HIGHEST_PROTOCOL)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+
+    path = prebuilt_path(dataset['version'], cache_dir)
+    tmp_path = path + '.tmp'
+    index = {key: value for key, value in dataset.items() if key != 'shards'}
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+    # The demand raster and travel times this dataset was built from stay for the next build to reuse
+    keep = {os.path.basename(path), os.path.basename(directory)}
+    if dataset.get('demand_surface') is not None:
+        keep.add(f"demand-{dataset['demand_surface']['fingerprint']}.png")
+    if dataset.get('travel') is not None:
+        keep.add(f"travel-{dataset['travel']['key']}.pkl")
+    for name in os.listdir(cache_dir):
+        if name in keep:
+            continue
+        if name.startswith('shards-'):
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        elif (name.startswith('dataset-') and name.endswith('.pkl') or name.startswith('demand-') and name.endswith('.png')
+              or name.startswith('travel-') and name.endswith('.pkl')):
+            os.remove(os.path.join(cache_dir, name))
+    return path
+
+def load_shard(dataset, key, cache_dir=CACHE_DIR):
+    """One region's shard: {'zip_layers': {scheme: (zip_layer, metrics, styles, legends)}, 'pantries'}."""
+    if 'shards' in dataset:
+        return dataset['shards'][key]
+    path = os.path.join(shard_dir(dataset['version'], cache_dir), f"{key}.pkl")
+    with span('load_shard') as s:
+        s.set_bytes(os.path.getsize(path))
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+def load_dataset(version=None, cache_dir=CACHE_DIR):
+    """Load the prebuilt dataset index for this version, building and caching it on a miss.
+
+    Region shards stay on disk until load_shard() asks for them.
+    """
+    version = version or dataset_version()
+    path = prebuilt_path(version, cache_dir)
+    if os.path.exists(path):
+        with span('load_prebuilt_dataset') as s:
+            s.set_bytes(os.path.getsize(path))
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+
+    dataset = build_dataset(version)
+    try:
+        save_dataset(dataset, cache_dir)
+    except OSError:
+        # A read-only deployment still works, it just rebuilds on every cold start
+        pass
+    return dataset
@@ -0,0 +1,168 @@
+import re
+import difflib
+import numpy as np
+import pandas as pd
+
+# Constants
+# USPS-style abbreviations so "ST." and "STREET" normalize to the same token
+ADDRESS_ABBREVIATIONS = {
+    'STREET': 'ST', 'AVENUE': 'AVE', 'AV': 'AVE', 'ROAD': 'RD', 'DRIVE': 'DR', 'BOULEVARD': 'BLVD',
+    'PLACE': 'PL', 'LANE': 'LN', 'COURT': 'CT', 'PARKWAY': 'PKWY', 'HIGHWAY': 'HWY', 'TERRACE': 'TER',
+    'CIRCLE': 'CIR', 'SQUARE': 'SQ', 'EXPRESSWAY': 'EXPY', 'TURNPIKE': 'TPKE',
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W', 'SAINT': 'ST',
+    'SUITE': 'STE', 'APARTMENT': 'APT', 'ROOM': 'RM',
+}
+# Words that say what kind of place it is rather than which one
+NAME_STOPWORDS = {
+    'THE', 'OF', 'AT', 'AND', 'INC', 'FOOD', 'PANTRY', 'PANTRIES', 'CHURCH', 'PROGRAM', 'MINISTRY', 'MINISTRIES',
+}
+MISSING_VALUES = {'', 'N/A', 'NA', 'NONE', 'NAN'}
+# Location buckets; points within half a cell (~110 m north-south, ~80 m east-west) share one
+LOCATION_CELL_DEGREES = 0.002
+ADDRESS_MATCH_RATIO = 0.9
+NAME_MATCH_RATIO = 0.8
+# Two listings this close with similar names are one pantry even if the addresses differ
+SAME_PLACE_METERS = 60
+
+def normalize_address(address):
+    """Uppercase, punctuation-free address with standard street abbreviations."""
+    words = re.sub(r"[^A-Z0-9 ]", " ", str(address).upper()).split()
+    return ' '.join(ADDRESS_ABBREVIATIONS.get(word, word) for word in words)
+
+def normalize_name(name):
+    """Uppercase name without punctuation or generic words like PANTRY and CHURCH."""
+    words = re.sub(r"[^A-Z0-9 ]", " ", str(name).upper()).split()
+    kept = [word for word in words if word not in NAME_STOPWORDS]
+    return ' '.join(kept or words)
+
+def street_number(normalized_address):
+    """Leading house number of a normalized address, or None."""
+    match = re.match(r"(\d+)", normalized_address)
+    return match.group(1) if match else None
+
+def address_block_key(normalized_address):
+    """(ZIP, street number) from a normalized address, or None when either is missing."""
+    zips = re.findall(r"\b(\d{5})\b", normalized_address)
+    number = street_number(normalized_address)
+    if not zips or number is None:
+        return None
+    return ('address', zips[-1], number)
+
+def location_block_keys(lat, lon, cell=LOCATION_CELL_DEGREES):
+    """Grid cells overlapped by a cell-sized box centred on the point (up to four).
+
+    Two points less than half a cell apart on each axis always share at least the
+    cell holding their midpoint, so no near pair straddles a bucket boundary.
+    """
+    half = cell / 2
+    rows = {int(np.floor((lat - half) / cell)), int(np.floor((lat + half) / cell))}
+    cols = {int(np.floor((lon - half) / cell)), int(np.floor((lon + half) / cell))}
+    return [('location', row, col) for row in rows for col in cols]
+
+def build_blocks(pantry_df, normalized_addresses):
+    """Blocking index: key -> row positions sharing it. Only rows within a block are compared."""
+    blocks = {}
+    for position, address in enumerate(normalized_addresses):
+        key = address_block_key(address)
+        if key is not None:
+            blocks.setdefault(key, []).append(position)
+    for position, (lat, lon) in enumerate(zip(pantry_df['latitude'], pantry_df['longitude'])):
+        for key in location_block_keys(lat, lon):
+            blocks.setdefault(key, []).append(position)
+    return blocks
+
+def meters_between(lat1, lon1, lat2, lon2):
+    """Equirectangular distance in meters, accurate at these short ranges."""
+    dy = (lat2 - lat1) * 110574
+    dx = (lon2 - lon1) * 111320 * np.cos(np.radians((lat1 + lat2) / 2))
+    return float(np.hypot(dx, dy))
+
+def is_same_pantry(a, b):
+    """Whether two pantry listings (dicts of normalized fields) describe the same place."""
+    if a['address'] == b['address']:
+        return True
+    # "118 SCHILLER ST" and "18 SCHILLER ST" read alike but are different buildings
+    numbers_differ = a['number'] is not None and b['number'] is not None and a['number'] != b['number']
+    if not numbers_differ and difflib.SequenceMatcher(None, a['address'], b['address']).ratio() >= ADDRESS_MATCH_RATIO:
+        return True
+    near = meters_between(a['latitude'], a['longitude'], b['latitude'], b['longitude']) <= SAME_PLACE_METERS
+    return near and difflib.SequenceMatcher(None, a['name'], b['name']).ratio() >= NAME_MATCH_RATIO
+
+def find(parents, i):
+    """Union-find root with path halving."""
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+def cluster_duplicates(pantry_df):
+    """Cluster id per row; rows in one cluster are the same pantry."""
+    addresses = [normalize_address(address) for address in pantry_df['address']]
+    records = [
+        {'address': address, 'number': street_number(address), 'name': normalize_name(name), 'latitude': lat, 'longitude': lon}
+        for address, name, lat, lon in zip(
+            addresses, pantry_df['name'], pantry_df['latitude'].to_numpy(dtype=float), pantry_df['longitude'].to_numpy(dtype=float)
+        )
+    ]
+    parents = list(range(len(records)))
+    compared = set()
+    for members in build_blocks(pantry_df, addresses).values():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if (a, b) in compared:
+                    continue
+                compared.add((a, b))
+                root_a, root_b = find(parents, a), find(parents, b)
+                if root_a != root_b and is_same_pantry(records[a], records[b]):
+                    parents[root_b] = root_a
+    return np.array([find(parents, i) for i in range(len(records))])
+
+def merge_values(values, separator):
+    """Distinct non-placeholder values (and lines within them) in first-seen order."""
+    seen = []
+    for value in values:
+        for line in str(value).splitlines():
+            line = line.strip()
+            if line.upper() not in MISSING_VALUES and line not in seen:
+                seen.append(line)
+    return separator.join(seen) if seen else 'N/A'
+
+def canonical_record(group):
+    """One pantry row from a cluster of listings: names, phones and hours merged, position averaged."""
+    # Spellings that differ only in case or spacing are one name; the first one seen is kept
+    names = {}
+    for name in group['name'].astype(str):
+        names.setdefault(' '.join(name.upper().split()), name.strip())
+    return pd.Series({
+        'name': ' / '.join(names.values()),
+        'address': group['address'].iloc[0],
+        'phone': merge_values(group['phone'], ', '),
+        'hours': merge_values(group['hours'], '\n'),
+        'latitude': group['latitude'].mean(),
+        'longitude': group['longitude'].mean(),
+        'listings': len(group),
+    })
+
+def dedupe_pantries(pantry_df):
+    """Canonical pantry records with duplicate listings merged.
+
+    Listings are compared only within blocks (same ZIP and street number, or the
+    same ~100 m location cell), so the work grows with block sizes rather than
+    with every pair of rows. Matching listings are merged into one record whose
+    'listings' column counts the originals.
+    """
+    if pantry_df.empty:
+        return pantry_df.assign(listings=pd.Series(dtype=int))
+    pantry_df = pantry_df.reset_index(drop=True)
+    clusters = cluster_duplicates(pantry_df)
+    counts = pd.Series(clusters).map(pd.Series(clusters).value_counts()).to_numpy()
+    first = ~pd.Series(clusters).duplicated().to_numpy()
+
+    # Each cluster keeps the position of its first listing; only multi-listing clusters need merging
+    result = pantry_df[first].assign(listings=counts[first])
+    multi = counts > 1
+    if multi.any():
+        merged = pantry_df[multi].groupby(clusters[multi]).apply(canonical_record)
+        targets = np.flatnonzero(first & multi)
+        result.loc[targets, merged.columns] = merged.loc[clusters[targets], merged.columns].to_numpy()
+    return result.reset_index(drop=True)
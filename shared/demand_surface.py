@@ -0,0 +1,135 @@
+import io
+import os
+import math
+import base64
+import hashlib
+import numpy as np
+from shared.classify import CLASS_COLORS
+
+# Constants
+BANDWIDTH_KM = 3.0
+# Longest side of the raster in pixels
+RESOLUTION = 512
+# Grid extends this many bandwidths past the outermost centroid
+MARGIN_BANDWIDTHS = 3
+MAX_OPACITY = 0.75
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320
+
+def mercator_y(lat):
+    """Web Mercator y (unitless) for latitudes in degrees."""
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+def inverse_mercator_y(y):
+    """Latitude in degrees for Web Mercator y."""
+    return np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2)
+
+def surface_bounds(lats, lons, bandwidth_km=BANDWIDTH_KM):
+    """[[south, west], [north, east]] covering the points plus a kernel margin."""
+    margin = MARGIN_BANDWIDTHS * bandwidth_km
+    mid_lat = (np.min(lats) + np.max(lats)) / 2
+    dlat = margin / KM_PER_DEGREE_LAT
+    dlon = margin / (KM_PER_DEGREE_LON * math.cos(math.radians(mid_lat)))
+    return [[float(np.min(lats) - dlat), float(np.min(lons) - dlon)],
+            [float(np.max(lats) + dlat), float(np.max(lons) + dlon)]]
+
+def surface_grid(bounds, resolution=RESOLUTION):
+    """Row latitudes (north to south, evenly spaced in Web Mercator), column longitudes,
+    and km per degree of longitude for a raster spanning `bounds`."""
+    (south, west), (north, east) = bounds
+    mid_lat = (south + north) / 2
+    km_per_lon = KM_PER_DEGREE_LON * math.cos(math.radians(mid_lat))
+    width_km = (east - west) * km_per_lon
+    height_km = (north - south) * KM_PER_DEGREE_LAT
+    scale = resolution / max(width_km, height_km)
+    width = max(1, int(round(width_km * scale)))
+    height = max(1, int(round(height_km * scale)))
+
+    grid_lons = np.linspace(west, east, width)
+    grid_lats = inverse_mercator_y(np.linspace(mercator_y(north), mercator_y(south), height))
+    return grid_lats, grid_lons, km_per_lon
+
+def kernel_density(lats, lons, weights, bounds, bandwidth_km=BANDWIDTH_KM, resolution=RESOLUTION):
+    """Weighted Gaussian KDE on a grid spanning `bounds`, rows north to south.
+
+    Rows are evenly spaced in Web Mercator so the raster lines up with map tiles
+    when stretched over `bounds`. The Gaussian kernel is separable, so the whole
+    grid is two small kernel matrices and one matrix product.
+    """
+    grid_lats, grid_lons, km_per_lon = surface_grid(bounds, resolution)
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    dx = (grid_lons[None, :] - lons[:, None]) * km_per_lon
+    dy = (grid_lats[None, :] - lats[:, None]) * KM_PER_DEGREE_LAT
+    kx = np.exp(-0.5 * (dx / bandwidth_km) ** 2)
+    ky = np.exp(-0.5 * (dy / bandwidth_km) ** 2)
+    # density[row, col] = sum_i w_i * ky[i, row] * kx[i, col]
+    return (ky * weights[:, None]).T @ kx
+
+def colorize(density, max_opacity=MAX_OPACITY, colors=CLASS_COLORS):
+    """RGBA uint8 image: `colors` ramped by density, transparent where demand is negligible."""
+    top = np.percentile(density, 99.5) if density.size else 0
+    if top <= 0:
+        return np.zeros(density.shape + (4,), dtype=np.uint8)
+    level = np.clip(density / top, 0, 1)
+
+    palette = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in colors], dtype=float)
+    stops = np.linspace(0, 1, len(palette))
+    rgba = np.empty(density.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(level, stops, palette[:, channel]).round()
+    rgba[..., 3] = (np.sqrt(level) * max_opacity * 255).round()
+    rgba[level < 0.02, 3] = 0
+    return rgba
+
+def encode_png(rgba):
+    """PNG bytes for an RGBA array."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, mode='RGBA').save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+def surface_fingerprint(lats, lons, weights, bandwidth_km=BANDWIDTH_KM, resolution=RESOLUTION):
+    """Hash of everything the raster depends on."""
+    digest = hashlib.sha1()
+    for values in (lats, lons, weights):
+        digest.update(np.ascontiguousarray(values, dtype=float).tobytes())
+    digest.update(f"{bandwidth_km}:{resolution}:{MAX_OPACITY}:{','.join(CLASS_COLORS)}".encode())
+    return digest.hexdigest()[:12]
+
+def build_demand_surface(zip_centroids, cache_dir=None, bandwidth_km=BANDWIDTH_KM, resolution=RESOLUTION):
+    """Demand heat raster from client counts at ZIP centroids, cached on disk by fingerprint.
+
+    Returns {'png': bytes, 'bounds': [[south, west], [north, east]], 'fingerprint': str},
+    or None when there are no clients to show.
+    """
+    centroids = zip_centroids[zip_centroids['client_count'] > 0]
+    if centroids.empty:
+        return None
+    lats = centroids['latitude'].to_numpy(dtype=float)
+    lons = centroids['longitude'].to_numpy(dtype=float)
+    weights = centroids['client_count'].to_numpy(dtype=float)
+
+    bounds = surface_bounds(lats, lons, bandwidth_km)
+    fingerprint = surface_fingerprint(lats, lons, weights, bandwidth_km, resolution)
+    path = os.path.join(cache_dir, f"demand-{fingerprint}.png") if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            png = f.read()
+    else:
+        density = kernel_density(lats, lons, weights, bounds, bandwidth_km, resolution)
+        png = encode_png(colorize(density))
+        if path:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(png)
+            except OSError:
+                pass
+    return {'png': png, 'bounds': bounds, 'fingerprint': fingerprint}
+
+def png_data_uri(png):
+    """Inline data: URI for PNG bytes, usable as an image overlay source."""
+    return 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
@@ -1,9 +1,6 @@
 import os
 import pandas as pd
 import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 import io
 import streamlit as st
 
@@ -13,6 +10,10 @@ FOLDER_NAME = 'SPCAMaps'
 
 def get_drive_service():
     """Initialize and return a Google Drive service."""
+    # The Google API client is heavy; only import it once Drive is actually used
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+
     try:
         # Check if credentials are in session state
         if 'drive_service' not in st.session_state:
@@ -75,6 +76,8 @@ def get_file_id(service, folder_id, file_name):
 
 def download_file(service, file_id):
     """Download a file from Google Drive."""
+    from googleapiclient.http import MediaIoBaseDownload
+
     try:
         request = service.files().get_media(fileId=file_id)
         file = io.BytesIO()
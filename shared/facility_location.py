@@ -0,0 +1,138 @@
+import math
+import numpy as np
+import pandas as pd
+
+# Constants
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320
+KM_PER_MILE = 1.609344
+# Candidate sites sit on a square lattice this fine, near enough to clients to matter
+CANDIDATE_SPACING_KM = 1.0
+CANDIDATE_REACH_KM = 8.0
+# Larger areas get a coarser lattice so the distance matrix stays a few tens of MB
+MAX_CANDIDATES = 4000
+MAX_NEW_SITES = 10
+# Swap passes of the local search; each pass tries every (site, candidate) exchange
+MAX_SWAP_PASSES = 10
+COVERAGE_MILES = [2, 5]
+SITE_COLOR = '#7b3294'
+
+def plane(lats, lons, mid_lat):
+    """Equirectangular km coordinates, good enough for county-scale distances."""
+    km_per_lon = KM_PER_DEGREE_LON * math.cos(math.radians(mid_lat))
+    return np.asarray(lons, dtype=float) * km_per_lon, np.asarray(lats, dtype=float) * KM_PER_DEGREE_LAT
+
+def distance_matrix(ax, ay, bx, by):
+    """Pairwise km distances, shape (len(a), len(b))."""
+    return np.hypot(ax[:, None] - bx[None, :], ay[:, None] - by[None, :])
+
+def candidate_sites(demand_x, demand_y, spacing_km=CANDIDATE_SPACING_KM, reach_km=CANDIDATE_REACH_KM,
+                    max_candidates=MAX_CANDIDATES):
+    """Lattice points within `reach_km` of at least one demand point, at most `max_candidates` of them."""
+    while True:
+        xs = np.arange(demand_x.min() - reach_km, demand_x.max() + reach_km, spacing_km)
+        ys = np.arange(demand_y.min() - reach_km, demand_y.max() + reach_km, spacing_km)
+        # Widen the spacing up front when even the bounding box lattice is far too big
+        if len(xs) * len(ys) > 4 * max_candidates:
+            spacing_km *= math.sqrt(len(xs) * len(ys) / (4 * max_candidates))
+            continue
+        grid_x, grid_y = (axis.ravel() for axis in np.meshgrid(xs, ys))
+        near = np.zeros(len(grid_x), dtype=bool)
+        for x, y in zip(demand_x, demand_y):
+            near |= np.hypot(grid_x - x, grid_y - y) <= reach_km
+        if near.sum() <= max_candidates:
+            return grid_x[near], grid_y[near]
+        spacing_km *= math.sqrt(near.sum() / max_candidates) * 1.01
+
+def greedy_sites(weights, existing, distances, k):
+    """Add k candidates one at a time, each the largest cut in weighted distance."""
+    current = existing.copy()
+    chosen = []
+    for _ in range(k):
+        savings = weights @ np.maximum(current[:, None] - distances, 0)
+        savings[chosen] = -1
+        best = int(np.argmax(savings))
+        if savings[best] <= 0:
+            break
+        chosen.append(best)
+        current = np.minimum(current, distances[:, best])
+    return chosen
+
+def swap_search(weights, existing, distances, chosen, max_passes=MAX_SWAP_PASSES):
+    """Teitz-Bart local search: swap a chosen site for any candidate while that lowers the objective."""
+    chosen = list(chosen)
+
+    def nearest_without(skip):
+        others = [site for i, site in enumerate(chosen) if i != skip]
+        return np.minimum(existing, distances[:, others].min(axis=1)) if others else existing
+
+    objective = weights @ nearest_without(None)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(len(chosen)):
+            base = nearest_without(i)
+            # Objective with site i replaced by each candidate in turn
+            costs = weights @ np.minimum(base[:, None], distances)
+            costs[chosen] = np.inf
+            best = int(np.argmin(costs))
+            if costs[best] < objective - 1e-9:
+                chosen[i] = best
+                objective = costs[best]
+                improved = True
+        if not improved:
+            break
+    return chosen
+
+def coverage_metrics(weights, distances_km):
+    """Client-weighted access summary for per-demand-point nearest distances."""
+    total = weights.sum()
+    miles = distances_km / KM_PER_MILE
+    metrics = {
+        'weighted_miles': float(weights @ miles),
+        'mean_miles': float(weights @ miles / total) if total else 0.0,
+    }
+    for limit in COVERAGE_MILES:
+        metrics[f'share_within_{limit}_miles'] = float(weights[miles <= limit].sum() / total) if total else 0.0
+    return metrics
+
+def propose_sites(zip_centroids, pantry_df, k, spacing_km=CANDIDATE_SPACING_KM):
+    """k new pantry sites minimising client-weighted distance to the nearest pantry (p-median).
+
+    Demand is each ZIP's client count at its centroid; existing pantries stay open.
+    A greedy pass picks sites, then swap search refines them. Returns
+    {'sites': DataFrame, 'before': metrics, 'after': metrics}, or None without clients.
+    """
+    demand = zip_centroids[zip_centroids['client_count'] > 0]
+    if demand.empty or k <= 0:
+        return None
+    mid_lat = float(demand['latitude'].mean())
+    weights = demand['client_count'].to_numpy(dtype=float)
+    demand_x, demand_y = plane(demand['latitude'], demand['longitude'], mid_lat)
+    pantry_x, pantry_y = plane(pantry_df['latitude'], pantry_df['longitude'], mid_lat)
+    site_x, site_y = candidate_sites(demand_x, demand_y, spacing_km)
+    distances = distance_matrix(demand_x, demand_y, site_x, site_y)
+    if len(pantry_df):
+        existing = distance_matrix(demand_x, demand_y, pantry_x, pantry_y).min(axis=1)
+    else:
+        # No pantries yet: anything farther than every candidate keeps the objective finite
+        existing = np.full(len(weights), distances.max() + 1)
+
+    chosen = greedy_sites(weights, existing, distances, k)
+    if chosen:
+        chosen = swap_search(weights, existing, distances, chosen)
+
+    after = np.minimum(existing, distances[:, chosen].min(axis=1)) if chosen else existing
+    # Which pantry or new site each ZIP now uses: index into chosen, or -1 for an existing pantry
+    serving = np.full(len(weights), -1)
+    if chosen:
+        serving = np.where(distances[:, chosen].min(axis=1) < existing, distances[:, chosen].argmin(axis=1), -1)
+    km_per_lon = KM_PER_DEGREE_LON * math.cos(math.radians(mid_lat))
+    zips = demand['ZCTA5CE10'].to_numpy()
+    sites = pd.DataFrame({
+        'site': np.arange(1, len(chosen) + 1),
+        'latitude': (site_y[chosen] / KM_PER_DEGREE_LAT).round(5),
+        'longitude': (site_x[chosen] / km_per_lon).round(5),
+        'nearest_zip': [zips[int(np.argmin(distances[:, c]))] for c in chosen],
+        'clients_served': [int(weights[serving == i].sum()) for i in range(len(chosen))],
+    })
+    return {'sites': sites, 'before': coverage_metrics(weights, existing), 'after': coverage_metrics(weights, after)}
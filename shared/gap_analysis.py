@@ -0,0 +1,104 @@
+import math
+import numpy as np
+import pandas as pd
+from shared.demand_surface import (
+    BANDWIDTH_KM, KM_PER_DEGREE_LAT, surface_bounds, surface_grid, kernel_density, colorize, encode_png
+)
+
+# Constants
+# Coarser than the demand raster: the gap score changes over kilometres, not pixels
+RESOLUTION = 320
+TOP_HOTSPOTS = 10
+# Hot spots closer than this to a higher-ranked one are the same gap, not a new one
+HOTSPOT_SEPARATION_KM = 5.0
+# Pantries compared per step of the distance pass; bounds memory at chunk * cells floats
+DISTANCE_CHUNK = 16
+GAP_COLORS = ['#fff7bc', '#fec44f', '#fe9929', '#d95f0e', '#993404']
+KM_PER_MILE = 1.609344
+SQ_KM_PER_SQ_MILE = KM_PER_MILE ** 2
+
+def nearest_distances(grid_lats, grid_lons, km_per_lon, point_lats, point_lons, chunk=DISTANCE_CHUNK):
+    """Distance (km) from every grid cell to its nearest point, and that point's index.
+
+    Cells form a regular lat/lon lattice, so squared distance splits into a per-row
+    and a per-column term; each chunk of points is one broadcast add and a min.
+    """
+    y_rows = np.asarray(grid_lats, dtype=np.float32) * np.float32(KM_PER_DEGREE_LAT)
+    x_cols = np.asarray(grid_lons, dtype=np.float32) * np.float32(km_per_lon)
+    point_y = np.asarray(point_lats, dtype=np.float32) * np.float32(KM_PER_DEGREE_LAT)
+    point_x = np.asarray(point_lons, dtype=np.float32) * np.float32(km_per_lon)
+
+    best = np.full((len(y_rows), len(x_cols)), np.inf, dtype=np.float32)
+    nearest = np.zeros(best.shape, dtype=np.int32)
+    for start in range(0, len(point_y), chunk):
+        dy2 = (y_rows[None, :] - point_y[start:start + chunk, None]) ** 2
+        dx2 = (x_cols[None, :] - point_x[start:start + chunk, None]) ** 2
+        d2 = dy2[:, :, None] + dx2[:, None, :]
+        chunk_best = d2.min(axis=0)
+        closer = chunk_best < best
+        best[closer] = chunk_best[closer]
+        nearest[closer] = d2.argmin(axis=0)[closer] + start
+    return np.sqrt(best), nearest
+
+def rank_hotspots(score, grid_lats, grid_lons, km_per_lon, top=TOP_HOTSPOTS, separation_km=HOTSPOT_SEPARATION_KM):
+    """(row, col) of the highest-scoring cells, skipping cells near an already chosen one."""
+    order = np.argsort(score, axis=None)[::-1]
+    picked = []
+    for flat in order:
+        row, col = divmod(int(flat), score.shape[1])
+        if score[row, col] <= 0 or len(picked) == top:
+            break
+        y = grid_lats[row] * KM_PER_DEGREE_LAT
+        x = grid_lons[col] * km_per_lon
+        if all(math.hypot(x - px, y - py) >= separation_km for _, _, px, py in picked):
+            picked.append((row, col, x, y))
+    return [(row, col) for row, col, _, _ in picked]
+
+def build_gap_analysis(zip_centroids, pantry_df, bandwidth_km=BANDWIDTH_KM, resolution=RESOLUTION, top=TOP_HOTSPOTS):
+    """Where client demand is high and the nearest pantry is far.
+
+    Each raster cell's score is smoothed client density (clients per sq mile, the
+    same kernel as the demand layer) times the distance to the nearest pantry in
+    miles. Returns {'png', 'bounds', 'hotspots'}, where 'hotspots' is a DataFrame
+    of the top separated cells, or None without clients or pantries.
+    """
+    centroids = zip_centroids[zip_centroids['client_count'] > 0]
+    if centroids.empty or pantry_df.empty:
+        return None
+    lats = centroids['latitude'].to_numpy(dtype=float)
+    lons = centroids['longitude'].to_numpy(dtype=float)
+    weights = centroids['client_count'].to_numpy(dtype=float)
+
+    bounds = surface_bounds(lats, lons, bandwidth_km)
+    grid_lats, grid_lons, km_per_lon = surface_grid(bounds, resolution)
+    # Normalise the unit-height kernel to a density that integrates to the client count
+    density = kernel_density(lats, lons, weights, bounds, bandwidth_km, resolution)
+    density *= SQ_KM_PER_SQ_MILE / (2 * math.pi * bandwidth_km ** 2)
+    distance_km, nearest = nearest_distances(
+        grid_lats, grid_lons, km_per_lon, pantry_df['latitude'], pantry_df['longitude']
+    )
+    distance_miles = distance_km / KM_PER_MILE
+    score = density * distance_miles
+
+    cells = rank_hotspots(score, grid_lats, grid_lons, km_per_lon, top)
+    rows = np.array([row for row, _ in cells], dtype=int)
+    cols = np.array([col for _, col in cells], dtype=int)
+    hotspots = pd.DataFrame({
+        'rank': np.arange(1, len(cells) + 1),
+        'latitude': grid_lats[rows].round(5),
+        'longitude': grid_lons[cols].round(5),
+        'gap_score': score[rows, cols].round(1),
+        'clients_per_sq_mile': density[rows, cols].round(1),
+        'miles_to_pantry': distance_miles[rows, cols].round(2),
+        'nearest_pantry': pantry_df['name'].to_numpy()[nearest[rows, cols]],
+    })
+    # Label each hot spot with the ZIP whose center is closest, the unit staff plan by
+    dy = (hotspots['latitude'].to_numpy()[:, None] - lats[None, :]) * KM_PER_DEGREE_LAT
+    dx = (hotspots['longitude'].to_numpy()[:, None] - lons[None, :]) * km_per_lon
+    hotspots['nearest_zip'] = centroids['ZCTA5CE10'].to_numpy()[np.hypot(dx, dy).argmin(axis=1)]
+
+    return {
+        'png': encode_png(colorize(score, colors=GAP_COLORS)),
+        'bounds': bounds,
+        'hotspots': hotspots,
+    }
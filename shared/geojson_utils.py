@@ -0,0 +1,84 @@
+import json
+import numpy as np
+
+# Constants
+# Only these properties are read by the map's style function and tooltip
+DEFAULT_KEEP_PROPERTIES = ['ZCTA5CE10', 'client_count']
+# 5 decimal places is roughly 1 m at Erie County latitudes
+DEFAULT_PRECISION = 5
+
+def round_ring(ring, precision=DEFAULT_PRECISION, min_positions=4):
+    """Round one linear ring (or line) and drop vertices that collapse onto their neighbour."""
+    coords = np.round(np.asarray(ring, dtype=float).reshape(-1, 2), precision)
+    if len(coords) > 1:
+        keep = np.ones(len(coords), dtype=bool)
+        keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+        # A closed ring needs at least 4 positions, a line 2; fall back to plain rounding
+        if keep.sum() >= min_positions:
+            coords = coords[keep]
+    return coords.tolist()
+
+def round_geometry(geometry, precision=DEFAULT_PRECISION):
+    """Return a copy of a GeoJSON geometry with rounded coordinates.
+
+    Polygon rings and lines also lose vertices that round onto their
+    neighbour; GeometryCollections are rounded member by member.
+    """
+    if geometry is None:
+        return None
+    geom_type = geometry['type']
+    if geom_type == 'GeometryCollection':
+        return {'type': geom_type, 'geometries': [round_geometry(part, precision) for part in geometry['geometries']]}
+    coords = geometry['coordinates']
+    if geom_type == 'Polygon':
+        coords = [round_ring(ring, precision) for ring in coords]
+    elif geom_type == 'MultiPolygon':
+        coords = [[round_ring(ring, precision) for ring in polygon] for polygon in coords]
+    elif geom_type == 'LineString':
+        coords = round_ring(coords, precision, min_positions=2)
+    elif geom_type == 'MultiLineString':
+        coords = [round_ring(line, precision, min_positions=2) for line in coords]
+    elif geom_type in ('Point', 'MultiPoint'):
+        coords = np.round(np.asarray(coords, dtype=float), precision).tolist()
+    else:
+        raise ValueError(f"Unsupported geometry type: {geom_type}")
+    return {'type': geom_type, 'coordinates': coords}
+
+def prune_properties(properties, keep=DEFAULT_KEEP_PROPERTIES):
+    """Keep only the listed properties of a feature, with NaN (not valid JSON) as null."""
+    return {key: None if isinstance(properties[key], float) and np.isnan(properties[key]) else properties[key]
+            for key in keep if key in properties}
+
+def emit_geojson(geojson, keep=DEFAULT_KEEP_PROPERTIES, precision=DEFAULT_PRECISION):
+    """Build the FeatureCollection sent to the browser: pruned properties, rounded coordinates."""
+    features = []
+    for feature in geojson['features']:
+        features.append({
+            'type': 'Feature',
+            'properties': prune_properties(feature.get('properties') or {}, keep),
+            'geometry': round_geometry(feature.get('geometry'), precision),
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+def geojson_size(geojson):
+    """Size in bytes of the compact JSON encoding of a GeoJSON object."""
+    return len(json.dumps(geojson, separators=(',', ':')).encode('utf-8'))
+
+def feature_bounds(features):
+    """[[south, west], [north, east]] around all coordinates of the given features."""
+    lons, lats = [], []
+    for feature in features:
+        geometry = feature.get('geometry')
+        if not geometry:
+            continue
+        coords = geometry['coordinates']
+        if geometry['type'] == 'Point':
+            points = np.asarray([coords], dtype=float)
+        elif geometry['type'] == 'MultiPolygon':
+            points = np.concatenate([np.asarray(ring, dtype=float) for polygon in coords for ring in polygon])
+        else:
+            points = np.concatenate([np.asarray(part, dtype=float).reshape(-1, 2) for part in coords])
+        lons.append(points[:, 0])
+        lats.append(points[:, 1])
+    lons, lats = np.concatenate(lons), np.concatenate(lats)
+    return [[float(lats.min()), float(lons.min())], [float(lats.max()), float(lons.max())]]
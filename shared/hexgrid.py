@@ -0,0 +1,198 @@
+import math
+import numpy as np
+from shared.classify import SCHEMES, compute_breaks, assign_classes, class_styles, legend_entries, DEFAULT_CLASSES
+
+# Constants
+# Hexagons live on a local equirectangular plane (km) around a fixed origin so ids are stable
+ORIGIN = (42.8864, -78.8784)
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320
+# Edge length of the coarsest hexagons; each finer resolution shrinks by sqrt(7) like H3
+BASE_EDGE_KM = 20.0
+APERTURE = 7
+RESOLUTIONS = [0, 1, 2, 3]
+RESOLUTION_LABELS = {0: 'Large (~20 km)', 1: 'Medium (~7.6 km)', 2: 'Small (~2.9 km)', 3: 'Smallest (~1.1 km)'}
+DEFAULT_RESOLUTION = 2
+# Hex ids pack (resolution, q, r) into one int64
+COORD_BITS = 24
+COORD_OFFSET = 1 << (COORD_BITS - 1)
+COORD_MASK = (1 << COORD_BITS) - 1
+
+SQRT3 = math.sqrt(3)
+
+def edge_km(resolution):
+    """Edge length (= circumradius) of hexagons at a resolution."""
+    return BASE_EDGE_KM / math.sqrt(APERTURE) ** resolution
+
+def to_plane(lats, lons):
+    """Project degrees onto the local km plane around ORIGIN."""
+    km_per_lon = KM_PER_DEGREE_LON * math.cos(math.radians(ORIGIN[0]))
+    x = (np.asarray(lons, dtype=float) - ORIGIN[1]) * km_per_lon
+    y = (np.asarray(lats, dtype=float) - ORIGIN[0]) * KM_PER_DEGREE_LAT
+    return x, y
+
+def from_plane(x, y):
+    """Inverse of to_plane, returning (lats, lons)."""
+    km_per_lon = KM_PER_DEGREE_LON * math.cos(math.radians(ORIGIN[0]))
+    return y / KM_PER_DEGREE_LAT + ORIGIN[0], x / km_per_lon + ORIGIN[1]
+
+def plane_to_axial(x, y, resolution):
+    """Axial (q, r) of the pointy-top hexagon containing each plane point."""
+    size = edge_km(resolution)
+    qf = (SQRT3 / 3 * x - y / 3) / size
+    rf = (2 / 3 * y) / size
+    # Cube rounding: round all three coordinates, then fix the one with the largest error
+    sf = -qf - rf
+    q, r, s = np.round(qf), np.round(rf), np.round(sf)
+    dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q = np.where(fix_q, -r - s, q)
+    r = np.where(fix_r, -q - s, r)
+    return q.astype(np.int64), r.astype(np.int64)
+
+def axial_to_plane(q, r, resolution):
+    """Plane coordinates of hexagon centers."""
+    size = edge_km(resolution)
+    x = size * (SQRT3 * q + SQRT3 / 2 * r)
+    y = size * 1.5 * r
+    return x, y
+
+def encode_ids(resolution, q, r):
+    """Pack resolution and axial coordinates into int64 hex ids."""
+    q = (np.asarray(q, dtype=np.int64) + COORD_OFFSET) & COORD_MASK
+    r = (np.asarray(r, dtype=np.int64) + COORD_OFFSET) & COORD_MASK
+    return (np.int64(resolution) << (2 * COORD_BITS)) | (q << COORD_BITS) | r
+
+def decode_ids(ids):
+    """Unpack int64 hex ids into (resolution, q, r) arrays."""
+    ids = np.asarray(ids, dtype=np.int64)
+    resolution = ids >> (2 * COORD_BITS)
+    q = ((ids >> COORD_BITS) & COORD_MASK) - COORD_OFFSET
+    r = (ids & COORD_MASK) - COORD_OFFSET
+    return resolution, q, r
+
+def points_to_ids(lats, lons, resolution):
+    """Hex id containing each point at a resolution."""
+    x, y = to_plane(lats, lons)
+    q, r = plane_to_axial(x, y, resolution)
+    return encode_ids(resolution, q, r)
+
+def hex_centers(ids):
+    """(lats, lons) of hexagon centers."""
+    resolution, q, r = decode_ids(ids)
+    if len(resolution) == 0:
+        return np.array([]), np.array([])
+    x, y = axial_to_plane(q, r, int(resolution[0]))
+    return from_plane(x, y)
+
+def hex_polygons(ids):
+    """Closed [lon, lat] rings for each hexagon, shape (n, 7, 2)."""
+    resolution, q, r = decode_ids(ids)
+    if len(resolution) == 0:
+        return np.zeros((0, 7, 2))
+    size = edge_km(int(resolution[0]))
+    cx, cy = axial_to_plane(q, r, int(resolution[0]))
+    angles = np.radians(30 + 60 * np.arange(7))
+    x = cx[:, None] + size * np.cos(angles)[None, :]
+    y = cy[:, None] + size * np.sin(angles)[None, :]
+    lats, lons = from_plane(x, y)
+    return np.stack([lons, lats], axis=-1)
+
+def aggregate(ids, weights):
+    """Unique ids with summed weights, plus each input's index into the unique ids."""
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    totals = np.bincount(inverse, weights=weights, minlength=len(unique_ids))
+    return unique_ids, totals, inverse
+
+def build_hex_grid(zip_centroids, pantry_df, resolutions=RESOLUTIONS):
+    """Client and pantry counts on a hexagonal grid at every resolution.
+
+    Counts are assigned once at the finest resolution and rolled up, each hexagon
+    into the coarser one containing its center. Returns
+    {resolution: {'ids', 'client_count', 'pantry_count'}} of NumPy arrays.
+    """
+    resolutions = sorted(resolutions)
+    finest = resolutions[-1]
+
+    client_ids = points_to_ids(zip_centroids['latitude'], zip_centroids['longitude'], finest)
+    pantry_ids = points_to_ids(pantry_df['latitude'], pantry_df['longitude'], finest)
+    all_ids = np.concatenate([client_ids, pantry_ids])
+    clients = np.concatenate([zip_centroids['client_count'].to_numpy(dtype=float), np.zeros(len(pantry_ids))])
+    pantries = np.concatenate([np.zeros(len(client_ids)), np.ones(len(pantry_ids))])
+
+    ids, client_count, inverse = aggregate(all_ids, clients)
+    pantry_count = np.bincount(inverse, weights=pantries, minlength=len(ids))
+
+    levels = {}
+    for resolution in reversed(resolutions):
+        level = {
+            'ids': ids,
+            'client_count': client_count.astype(np.int32),
+            'pantry_count': pantry_count.astype(np.int32),
+        }
+        levels[resolution] = level
+        coarser = [res for res in resolutions if res < resolution]
+        if not coarser:
+            break
+        # Roll up: each hexagon's center falls in exactly one coarser hexagon
+        lats, lons = hex_centers(ids)
+        parent_ids = points_to_ids(lats, lons, coarser[-1])
+        ids, client_count, inverse = aggregate(parent_ids, level['client_count'].astype(float))
+        pantry_count = np.bincount(inverse, weights=level['pantry_count'], minlength=len(ids))
+    return levels
+
+def hex_geojson(level, class_ids=None):
+    """FeatureCollection of a level's non-empty hexagons for map rendering."""
+    keep = (level['client_count'] > 0) | (level['pantry_count'] > 0)
+    ids = level['ids'][keep]
+    client_count = level['client_count'][keep].tolist()
+    pantry_count = level['pantry_count'][keep].tolist()
+    classes = np.asarray(class_ids)[keep].tolist() if class_ids is not None else None
+    rings = np.round(hex_polygons(ids), 5).tolist()
+    features = []
+    for i, hex_id in enumerate(ids):
+        properties = {
+            'hex_id': format(int(hex_id), 'x'),
+            'client_count': client_count[i],
+            'pantry_count': pantry_count[i],
+        }
+        if classes is not None:
+            properties['client_count_class'] = classes[i]
+        features.append({'type': 'Feature', 'properties': properties, 'geometry': {'type': 'Polygon', 'coordinates': [rings[i]]}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+def combine_levels(levels):
+    """One resolution's counts summed over several grids (e.g. one per region), for hexagons they share.
+
+    Returns {'ids', 'client_count', 'pantry_count'}, like a level of build_hex_grid().
+    """
+    ids, client_count, inverse = aggregate(
+        np.concatenate([level['ids'] for level in levels]),
+        np.concatenate([level['client_count'] for level in levels]).astype(float)
+    )
+    pantry_count = np.bincount(inverse, weights=np.concatenate([level['pantry_count'] for level in levels]), minlength=len(ids))
+    return {'ids': ids, 'client_count': client_count.astype(np.int32), 'pantry_count': pantry_count.astype(np.int32)}
+
+def hex_breaks(levels, schemes=SCHEMES):
+    """Class breaks of every scheme at every resolution, {scheme: {resolution: breaks}}.
+
+    Computed once over the whole grid so a hexagon's colour doesn't depend on
+    which regions are drawn next to it.
+    """
+    return {
+        scheme: {resolution: compute_breaks(level['client_count'], scheme, DEFAULT_CLASSES, integer=True)
+                 for resolution, level in levels.items()}
+        for scheme in schemes
+    }
+
+def build_hex_layer(level, scheme, breaks=None):
+    """Classified hexagon layer for one resolution: (layer, styles, legends) keyed like the ZIP layer.
+
+    `breaks` (from hex_breaks()) defaults to breaks over this level's own counts.
+    """
+    if breaks is None:
+        breaks = compute_breaks(level['client_count'], scheme, DEFAULT_CLASSES, integer=True)
+    styles = class_styles(breaks)
+    layer = hex_geojson(level, assign_classes(level['client_count'], breaks))
+    return layer, {'client_count': styles}, {'client_count': legend_entries(breaks, styles, ' clients', integer=True)}
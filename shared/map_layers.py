@@ -0,0 +1,169 @@
+import os
+import math
+import folium
+from shared.normalize import METRICS
+from shared.profiling import span, is_enabled
+
+# Constants
+# A local tile cache (see serve_tiles.py) replaces the CartoDB CDN when set, e.g.
+# SPCA_TILE_URL=http://127.0.0.1:8503/tiles/{z}/{x}/{y}.png
+TILE_URL = os.environ.get('SPCA_TILE_URL')
+MAP_TILES = TILE_URL or 'CartoDB positron'
+TILE_ATTRIBUTION = '&copy; OpenStreetMap contributors &copy; CARTO'
+# Roughly how many 256 px tiles the map shows across and down, for picking a zoom
+MAP_TILES_WIDE = 4
+MAP_TILES_HIGH = 2.5
+MAX_ZOOM = 13
+# Cluster bubbles grow with the log of their pantry count, within these sizes (px)
+CLUSTER_MIN_PX = 30
+CLUSTER_MAX_PX = 54
+CLUSTER_COLOR = '#2e7d32'
+
+def view_for_bounds(bounds):
+    """(center [lat, lon], zoom) that fits [[south, west], [north, east]] in the map."""
+    (south, west), (north, east) = bounds
+    center = [(south + north) / 2, (west + east) / 2]
+    # Web Mercator: each zoom level halves the degrees a tile spans
+    lon_zoom = math.log2(360 * MAP_TILES_WIDE / max(east - west, 1e-6))
+    lat_zoom = math.log2(170 * MAP_TILES_HIGH * math.cos(math.radians(center[0])) / max(north - south, 1e-6))
+    return center, max(1, min(MAX_ZOOM, math.floor(min(lon_zoom, lat_zoom) * 2) / 2))
+
+def build_base_map(bounds, tiles=MAP_TILES):
+    """Create the empty folium map everything else is layered onto, framed on `bounds`."""
+    center, zoom = view_for_bounds(bounds)
+    # Named tiles bring their own attribution; a tile URL needs one
+    attribution = TILE_ATTRIBUTION if tiles == TILE_URL else None
+    m = folium.Map(location=center, zoom_start=math.floor(zoom), tiles=tiles, attr=attribution)
+    m.fit_bounds(bounds)
+    return m
+
+def pantry_hover_text(pantry_df):
+    """HTML shown in each pantry's tooltip and popup."""
+    return (
+        '<b>' + pantry_df['name'].astype(str) + '</b><br>' +
+        pantry_df['address'].astype(str) + '<br>' +
+        'Phone: ' + pantry_df['phone'].astype(str) + '<br>' +
+        'Hours: ' + pantry_df['hours'].astype(str)
+    )
+
+def site_hover_text(sites):
+    """HTML hover text for proposed pantry sites."""
+    return (
+        '<b>Proposed site ' + sites['site'].astype(str) + '</b><br>Near ZIP ' + sites['nearest_zip'].astype(str) +
+        '<br>Would serve ' + sites['clients_served'].map('{:,}'.format) + ' SPCA clients'
+    )
+
+def cluster_icon(count):
+    """Round green bubble showing how many pantries a cluster holds."""
+    size = int(min(CLUSTER_MAX_PX, CLUSTER_MIN_PX + 6 * math.log10(count)))
+    html = (
+        f'<div style="width:{size}px;height:{size}px;line-height:{size}px;border-radius:50%;'
+        f'background:{CLUSTER_COLOR};opacity:0.85;color:white;font:bold 12px sans-serif;'
+        f'text-align:center;box-shadow:0 0 0 4px rgba(46,125,50,0.3)">{count:,}</div>'
+    )
+    return folium.DivIcon(html=html, icon_size=(size, size), icon_anchor=(size // 2, size // 2))
+
+def add_pantry_clusters(m, pantry_df, level, rows):
+    """Add the given rows of a cluster level (see clustering.visible_clusters()) as markers on `m`.
+
+    Single pantries get the green shopping-cart marker with their details;
+    clusters get a bubble with their pantry count.
+    """
+    points = level['point'][rows]
+    singles = pantry_df.iloc[points[points >= 0]]
+    # Single pantries sit at their exact coordinates, not the level's float32 copy
+    single_marker = dict(zip(points[points >= 0], zip(singles['latitude'], singles['longitude'], pantry_hover_text(singles))))
+
+    # Rows were validated when the dataset was built, so no per-row checks here
+    for lat, lon, count, point in zip(level['lat'][rows], level['lon'][rows], level['count'][rows], points):
+        if point >= 0:
+            lat, lon, text = single_marker[point]
+            folium.Marker(
+                location=[lat, lon],
+                popup=folium.Popup(text, max_width=300),
+                tooltip=folium.Tooltip(text, sticky=True),
+                icon=folium.Icon(color='green', icon='shopping-cart', prefix='fa')
+            ).add_to(m)
+        else:
+            folium.Marker(
+                location=[float(lat), float(lon)],
+                tooltip=f"{count:,} food pantries - zoom in to see them",
+                icon=cluster_icon(int(count))
+            ).add_to(m)
+    return m
+
+def add_zip_layer(m, zip_layer, styles, metric='client_count', id_field='ZCTA5CE10', id_label='ZIP Code', extra_tooltip=()):
+    """Add the classified area polygons (ZIP codes by default), styled and labelled for `metric`."""
+    metric_styles = styles[metric]
+    class_column = f'{metric}_class'
+
+    # Classes are precomputed, so styling is a lookup
+    def style_function(feature):
+        return metric_styles[feature['properties'][class_column]]
+
+    tooltip_fields = [id_field, 'client_count']
+    tooltip_aliases = [id_label, 'SPCA Clients']
+    if metric != 'client_count':
+        tooltip_fields.append(metric)
+        tooltip_aliases.append(METRICS[metric][0])
+    for field, alias in extra_tooltip:
+        tooltip_fields.append(field)
+        tooltip_aliases.append(alias)
+
+    layer = folium.GeoJson(
+        zip_layer,
+        style_function=style_function,
+        tooltip=folium.GeoJsonTooltip(
+            fields=tooltip_fields,
+            aliases=tooltip_aliases,
+            localize=True,
+            sticky=False,
+            labels=True
+        )
+    ).add_to(m)
+
+    # folium calls style_function for every feature when the map is rendered;
+    # time the same pass separately when profiling so it isn't hidden in serialization
+    if is_enabled():
+        with span('style_function_pass'):
+            for feature in zip_layer['features']:
+                style_function(feature)
+    return layer
+
+def add_image_overlay(m, overlay, name):
+    """Add a prebuilt raster (the demand or gap surface) stretched over its bounds."""
+    from shared.demand_surface import png_data_uri
+
+    return folium.raster_layers.ImageOverlay(
+        image=png_data_uri(overlay['png']),
+        bounds=overlay['bounds'],
+        interactive=False,
+        zindex=1,
+        name=name
+    ).add_to(m)
+
+def add_isochrone_layer(m, isochrones):
+    """Add travel-time bands, each shaded with the colour stored on its feature."""
+    return folium.GeoJson(
+        isochrones,
+        style_function=lambda feature: {
+            'fillColor': feature['properties']['color'],
+            'color': feature['properties']['color'],
+            'weight': 1,
+            'fillOpacity': 0.35,
+        },
+        tooltip=folium.GeoJsonTooltip(fields=['label'], labels=False),
+        name='Travel time'
+    ).add_to(m)
+
+def add_proposed_sites(m, sites_df):
+    """Add a purple star marker for each proposed new pantry site."""
+    group = folium.FeatureGroup(name='Proposed sites').add_to(m)
+    for (_, row), text in zip(sites_df.iterrows(), site_hover_text(sites_df)):
+        folium.Marker(
+            location=[row['latitude'], row['longitude']],
+            popup=folium.Popup(text, max_width=300),
+            tooltip=folium.Tooltip(text, sticky=True),
+            icon=folium.Icon(color='purple', icon='star', prefix='fa')
+        ).add_to(group)
+    return group
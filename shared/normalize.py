@@ -0,0 +1,51 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Constants
+# Optional local table with columns ZCTA5CE10, population, households
+DENOMINATORS_PATH = os.path.join('map_data', 'zcta_denominators.csv')
+SQ_METERS_PER_SQ_MILE = 2589988.11
+
+# metric column -> (label, legend unit, denominator column, scale)
+METRICS = {
+    'client_count': ('Total clients', ' clients', None, 1),
+    'clients_per_1k_population': ('Clients per 1,000 residents', ' per 1,000 residents', 'population', 1000),
+    'clients_per_1k_households': ('Clients per 1,000 households', ' per 1,000 households', 'households', 1000),
+    'clients_per_sq_mile': ('Clients per square mile', ' per sq mi', 'land_sq_miles', 1),
+}
+DEFAULT_METRIC = 'client_count'
+
+def load_denominators(path=DENOMINATORS_PATH):
+    """Load the local population/household table, or None if it isn't present."""
+    if not os.path.exists(path):
+        return None
+    denominators = pd.read_csv(path, dtype={'ZCTA5CE10': str})
+    denominators['ZCTA5CE10'] = denominators['ZCTA5CE10'].str.zfill(5)
+    columns = [c for c in ['population', 'households'] if c in denominators.columns]
+    return denominators[['ZCTA5CE10'] + columns]
+
+def safe_rate(counts, denominator, scale):
+    """counts / denominator * scale, NaN (no data, not zero) where the denominator is missing or zero."""
+    counts = np.asarray(counts, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    valid = np.isfinite(denominator) & (denominator > 0)
+    rate = np.full_like(counts, np.nan)
+    np.divide(counts * scale, denominator, out=rate, where=valid)
+    return rate.round(2)
+
+def add_rate_columns(gdf, denominators=None, count_column='client_count'):
+    """Add every rate metric the available denominators allow; return the metric names."""
+    if 'ALAND10' in gdf.columns:
+        gdf['land_sq_miles'] = pd.to_numeric(gdf['ALAND10'], errors='coerce') / SQ_METERS_PER_SQ_MILE
+    if denominators is not None:
+        gdf_columns = gdf.merge(denominators, on='ZCTA5CE10', how='left')
+        for column in denominators.columns.drop('ZCTA5CE10'):
+            gdf[column] = gdf_columns[column].to_numpy()
+
+    metrics = [count_column]
+    for metric, (_, _, denominator, scale) in METRICS.items():
+        if denominator is not None and denominator in gdf.columns:
+            gdf[metric] = safe_rate(gdf[count_column], gdf[denominator], scale)
+            metrics.append(metric)
+    return metrics
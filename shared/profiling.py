@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# Constants
+# Set SPCA_PROFILE=1 to record spans on every run; SPCA_PROFILE_LOG=<path> appends them as JSON lines
+PROFILE_ENV = 'SPCA_PROFILE'
+PROFILE_LOG_ENV = 'SPCA_PROFILE_LOG'
+
+logger = logging.getLogger('spca.profile')
+
+# Each Streamlit session runs its script in its own thread, so recording state is per thread
+_state = threading.local()
+# tracemalloc is process-wide: one run at a time owns it, and only that run's spans report memory
+_tracing_lock = threading.Lock()
+_tracing_owner = None
+
+class _NoopSpan:
+    """Stand-in returned by span() while profiling is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_bytes(self, nbytes):
+        pass
+
+_NOOP = _NoopSpan()
+
+class _Span:
+    """Times one named stage and tracks its traced-memory allocations and peak."""
+    def __init__(self, name):
+        self.name = name
+        self.nbytes = None
+        self.max_seen = 0
+
+    def set_bytes(self, nbytes):
+        """Record the size of the payload this stage produced."""
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        stack = _state.stack
+        self.depth = len(stack)
+        if _state.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the enclosing span's peak before resetting it for this one
+            if stack:
+                stack[-1].max_seen = max(stack[-1].max_seen, peak)
+            tracemalloc.reset_peak()
+            self.mem_start = current
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = _state.stack
+        stack.pop()
+        record = {'name': self.name, 'depth': self.depth, 'seconds': round(elapsed, 6)}
+        if _state.tracing and hasattr(self, 'mem_start'):
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.max_seen)
+            if stack:
+                stack[-1].max_seen = max(stack[-1].max_seen, peak)
+            record['allocated_bytes'] = current - self.mem_start
+            record['peak_bytes'] = peak - self.mem_start
+        if self.nbytes is not None:
+            record['payload_bytes'] = self.nbytes
+        _state.records.append(record)
+        return False
+
+def env_enabled():
+    """Whether profiling was switched on for the whole process through the environment."""
+    return os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes')
+
+def is_enabled():
+    """Whether spans are being recorded on this thread."""
+    return getattr(_state, 'enabled', False)
+
+def start_tracing():
+    """Start tracemalloc for this thread's run unless another run (or anything else) is tracing already."""
+    global _tracing_owner
+    with _tracing_lock:
+        if _tracing_owner is not None or tracemalloc.is_tracing():
+            return False
+        tracemalloc.start()
+        _tracing_owner = threading.get_ident()
+        return True
+
+def stop_tracing():
+    """Stop tracemalloc if this thread started it."""
+    global _tracing_owner
+    with _tracing_lock:
+        if _tracing_owner == threading.get_ident():
+            tracemalloc.stop()
+            _tracing_owner = None
+
+def start_run(memory=True):
+    """Start recording spans on this thread, tracing allocations if `memory` is set and no other run is."""
+    _state.enabled = True
+    _state.stack = []
+    _state.records = []
+    _state.tracing = memory and start_tracing()
+
+def finish_run():
+    """Stop recording, stop tracemalloc if this run started it, and return the spans in completion order."""
+    if not is_enabled():
+        return []
+    records = _state.records
+    if _state.tracing:
+        stop_tracing()
+    _state.enabled = False
+    _state.tracing = False
+    write_log(records)
+    return records
+
+@contextmanager
+def profile_run(memory=True):
+    """Record spans for the enclosed block and yield the list they are collected in.
+
+    Everything started is stopped on the way out, including when the block
+    raises or a Streamlit rerun interrupts it; memory figures are left out
+    while another session's run is tracing.
+    """
+    start_run(memory)
+    try:
+        yield _state.records
+    finally:
+        finish_run()
+
+def span(name):
+    """Context manager timing a named stage; a shared no-op when profiling is off."""
+    if not getattr(_state, 'enabled', False):
+        return _NOOP
+    return _Span(name)
+
+def write_log(records):
+    """Emit spans as structured log lines, and append them to SPCA_PROFILE_LOG if set."""
+    if not records:
+        return
+    run = {'time': time.time(), 'pid': os.getpid()}
+    lines = [json.dumps({**run, **record}) for record in records]
+    for line in lines:
+        logger.debug(line)
+    log_path = os.environ.get(PROFILE_LOG_ENV)
+    if log_path:
+        with open(log_path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,118 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from shared.geojson_utils import feature_bounds, geojson_size
+
+# Constants
+# Optional crosswalk naming the region (e.g. county) of each ZIP code area
+REGIONS_PATH = os.path.join('map_data', 'zcta_regions.csv')
+# Without a crosswalk, ZIP codes are grouped by their first three digits (the
+# USPS sectional center), which keeps neighbouring areas together
+ZIP_PREFIX_DIGITS = 3
+# Regions selected on first load: those with at least this share of clients, most first
+DEFAULT_REGION_SHARE = 0.01
+MAX_DEFAULT_REGIONS = 8
+# Pantries this far (degrees) outside every region's bounding box are geocoding mistakes
+REGION_MARGIN_DEGREES = 0.25
+
+def load_region_crosswalk(path=REGIONS_PATH):
+    """{ZIP code: region name} from the optional crosswalk CSV, or {}."""
+    if not os.path.exists(path):
+        return {}
+    crosswalk = pd.read_csv(path, dtype=str)
+    return dict(zip(crosswalk['ZCTA5CE10'].str.zfill(5), crosswalk['region'].str.strip()))
+
+def region_key(name):
+    """Filesystem-safe key for a region name."""
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+def zip_regions(zip_codes, crosswalk=None):
+    """Region name for each ZIP code: the crosswalk's, else its three-digit prefix ('ZIP 140xx')."""
+    crosswalk = crosswalk or {}
+    return [
+        crosswalk.get(zip_code) or f"ZIP {zip_code[:ZIP_PREFIX_DIGITS]}{'x' * (5 - ZIP_PREFIX_DIGITS)}"
+        for zip_code in zip_codes
+    ]
+
+def region_bounds(survey_data, regions):
+    """{region name: [[south, west], [north, east]]} of each region's ZIP boundaries."""
+    features = {}
+    for feature, region in zip(survey_data['features'], regions):
+        features.setdefault(region, []).append(feature)
+    return {region: feature_bounds(members) for region, members in features.items()}
+
+def within_bounds(lats, lons, bounds, margin=REGION_MARGIN_DEGREES):
+    """Whether each point lies inside (or within `margin` of) at least one of the boxes."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    inside = np.zeros(len(lats), dtype=bool)
+    for (south, west), (north, east) in bounds:
+        inside |= (lats >= south - margin) & (lats <= north + margin) & (lons >= west - margin) & (lons <= east + margin)
+    return inside
+
+def pantry_regions(pantry_df, zip_centroids, containing_zips):
+    """Region of each pantry: its containing ZIP's, else the region of the nearest ZIP centroid."""
+    region_by_zip = dict(zip(zip_centroids['ZCTA5CE10'], zip_centroids['region']))
+    regions = np.array([region_by_zip.get(z) if isinstance(z, str) else None for z in containing_zips], dtype=object)
+    missing = pd.isna(regions)
+    if missing.any() and len(zip_centroids):
+        dlat = pantry_df['latitude'].to_numpy()[missing, None] - zip_centroids['latitude'].to_numpy()[None, :]
+        dlon = pantry_df['longitude'].to_numpy()[missing, None] - zip_centroids['longitude'].to_numpy()[None, :]
+        nearest = np.argmin(dlat ** 2 + (dlon * np.cos(np.radians(pantry_df['latitude'].to_numpy()[missing, None]))) ** 2, axis=1)
+        regions[missing] = zip_centroids['region'].to_numpy()[nearest]
+    return regions
+
+def build_shards(zip_layers, pantry_df, zip_region, bounds, hex_grids=None):
+    """Split the map data into per-region shards plus a manifest describing them.
+
+    Each shard holds its region's ZIP features for every scheme (class ids and
+    styles stay global so colours mean the same everywhere), its pantries and,
+    from `hex_grids` ({region name: hex grid}), its hexagon counts.
+    The manifest maps region key -> {'name', 'bounds', 'zip_count', 'client_count',
+    'pantry_count', 'zip_layer_bytes'} and is small enough to keep in the index.
+    """
+    manifest, shards = {}, {}
+    for name in sorted(bounds):
+        key = region_key(name)
+        layers = {}
+        for scheme, (zip_layer, metrics, styles, legends) in zip_layers.items():
+            features = [f for f in zip_layer['features'] if zip_region.get(f['properties']['ZCTA5CE10']) == name]
+            layers[scheme] = ({'type': 'FeatureCollection', 'features': features}, metrics, styles, legends)
+        pantries = pantry_df[pantry_df['region'] == name].reset_index(drop=True)
+        # Every scheme shares geometry and differs only in class ids, so one layer stands for all
+        any_layer = next(iter(layers.values()))[0]
+        shards[key] = {'zip_layers': layers, 'pantries': pantries, 'hex_grid': (hex_grids or {}).get(name)}
+        manifest[key] = {
+            'name': name,
+            'bounds': bounds[name],
+            'zip_count': len(any_layer['features']),
+            'client_count': int(sum(f['properties']['client_count'] for f in any_layer['features'])),
+            'pantry_count': len(pantries),
+            'zip_layer_bytes': geojson_size(any_layer),
+        }
+    return manifest, shards
+
+def default_regions(manifest, share=DEFAULT_REGION_SHARE, limit=MAX_DEFAULT_REGIONS):
+    """Region keys shown before the user picks any: the busiest ones, most clients first."""
+    ranked = sorted(manifest, key=lambda key: -manifest[key]['client_count'])
+    total = sum(entry['client_count'] for entry in manifest.values())
+    chosen = [key for key in ranked if total and manifest[key]['client_count'] >= share * total][:limit]
+    return chosen or ranked[:1]
+
+def combined_bounds(manifest, keys):
+    """Bounding box around the selected regions."""
+    boxes = [manifest[key]['bounds'] for key in keys]
+    return [[min(b[0][0] for b in boxes), min(b[0][1] for b in boxes)],
+            [max(b[1][0] for b in boxes), max(b[1][1] for b in boxes)]]
+
+def combine_shards(shards, scheme):
+    """One (zip_layer, metrics, styles, legends) and one pantry frame from several shards."""
+    if not shards:
+        return None, pd.DataFrame()
+    features = []
+    for shard in shards:
+        features.extend(shard['zip_layers'][scheme][0]['features'])
+    _, metrics, styles, legends = shards[0]['zip_layers'][scheme]
+    pantries = pd.concat([shard['pantries'] for shard in shards], ignore_index=True)
+    return ({'type': 'FeatureCollection', 'features': features}, metrics, styles, legends), pantries
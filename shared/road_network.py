@@ -0,0 +1,280 @@
+import os
+import gzip
+import heapq
+import pickle
+import hashlib
+import numpy as np
+from shared.geojson_utils import round_geometry
+
+# Constants
+# Preprocessed road graph (see build_road_graph.py); travel times are skipped without it
+ROAD_GRAPH_PATH = os.path.join('map_data', 'road_graph.npz')
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320
+# Typical driving speeds (km/h) by OSM highway class
+HIGHWAY_SPEEDS_KPH = {
+    'motorway': 100, 'motorway_link': 60, 'trunk': 80, 'trunk_link': 50,
+    'primary': 65, 'primary_link': 45, 'secondary': 55, 'secondary_link': 40,
+    'tertiary': 50, 'tertiary_link': 35, 'unclassified': 45, 'residential': 40,
+    'living_street': 15, 'service': 20, 'road': 40,
+    'footway': 0, 'path': 0, 'pedestrian': 0, 'steps': 0, 'cycleway': 0, 'track': 15,
+}
+WALK_KPH = 4.8
+# Walkers stay off limited-access roads; a highway class with speed 0 is closed to cars
+WALK_EXCLUDED = {'motorway', 'motorway_link', 'trunk', 'trunk_link'}
+# Speed for the straight-line hop between a point and its nearest graph node
+CONNECTOR_KPH = {'drive': 20, 'walk': WALK_KPH}
+MODES = {'drive': 'Drive', 'walk': 'Walk'}
+ISOCHRONE_MINUTES = {'drive': [5, 10, 15], 'walk': [10, 20, 30]}
+# Shortest band first; each mode has at most this many bands
+ISOCHRONE_COLORS = ['#1a9850', '#91cf60', '#d9ef8b']
+# Isochrone polygons are built from square cells this wide around reached nodes
+ISOCHRONE_CELL_KM = 0.2
+# Points snapped per step of the nearest-node search; bounds memory at chunk * nodes floats
+SNAP_CHUNK = 16
+
+def graph_version(path=ROAD_GRAPH_PATH):
+    """Fingerprint of the graph file, or None when there is no graph."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:12]
+
+def load_road_graph(path=ROAD_GRAPH_PATH):
+    """Node coordinates and edge arrays of the preprocessed road graph, or None."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+def way_direction(refs, highway, tags):
+    """(node refs in driving order, whether cars may only drive that way) for one OSM way.
+
+    oneway=-1 means one-way against the drawn direction, so its nodes are
+    reversed; motorways and roundabouts are one-way unless tagged otherwise.
+    """
+    oneway = tags.get('oneway')
+    if oneway == '-1':
+        return refs[::-1], True
+    if oneway in ('yes', 'true', '1'):
+        return refs, True
+    if oneway in ('no', 'false', '0'):
+        return refs, False
+    implied = highway in ('motorway', 'motorway_link') or tags.get('junction') in ('roundabout', 'circular')
+    return refs, implied
+
+def read_osm(path):
+    """Road graph arrays from an OSM XML extract (.osm or .osm.gz).
+
+    Keeps ways with a highway tag, splits them into one edge per consecutive node
+    pair, and drops nodes no road uses.
+    """
+    import xml.etree.ElementTree as ET
+
+    opener = gzip.open if path.endswith('.gz') else open
+    node_coords = {}
+    ways = []
+    with opener(path, 'rb') as f:
+        for _, elem in ET.iterparse(f, events=('end',)):
+            if elem.tag == 'node':
+                node_coords[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+            elif elem.tag == 'way':
+                tags = {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}
+                highway = tags.get('highway')
+                if highway in HIGHWAY_SPEEDS_KPH:
+                    refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                    refs, oneway = way_direction(refs, highway, tags)
+                    ways.append((refs, highway, oneway))
+            if elem.tag in ('node', 'way', 'relation'):
+                elem.clear()
+
+    highway_names = sorted(HIGHWAY_SPEEDS_KPH)
+    highway_codes = {name: code for code, name in enumerate(highway_names)}
+    src, dst, highway, oneway = [], [], [], []
+    for refs, way_highway, way_oneway in ways:
+        refs = [ref for ref in refs if ref in node_coords]
+        for a, b in zip(refs[:-1], refs[1:]):
+            src.append(a)
+            dst.append(b)
+            highway.append(highway_codes[way_highway])
+            oneway.append(way_oneway)
+
+    osm_ids, inverse = np.unique(np.array(src + dst, dtype=np.int64), return_inverse=True)
+    coords = np.array([node_coords[osm_id] for osm_id in osm_ids.tolist()]).reshape(-1, 2)
+    edge_from, edge_to = inverse[:len(src)], inverse[len(src):]
+    dy = (coords[edge_to, 0] - coords[edge_from, 0]) * KM_PER_DEGREE_LAT
+    dx = (coords[edge_to, 1] - coords[edge_from, 1]) * KM_PER_DEGREE_LON * np.cos(np.radians(coords[edge_from, 0]))
+    return {
+        'node_lat': coords[:, 0],
+        'node_lon': coords[:, 1],
+        'edge_from': edge_from.astype(np.int32),
+        'edge_to': edge_to.astype(np.int32),
+        'edge_km': np.hypot(dx, dy).astype(np.float32),
+        'edge_highway': np.array(highway, dtype=np.int16),
+        'edge_oneway': np.array(oneway, dtype=bool),
+        'highway_names': np.array(highway_names),
+    }
+
+def save_road_graph(graph, path=ROAD_GRAPH_PATH):
+    """Write graph arrays to a compressed .npz."""
+    np.savez_compressed(path, **graph)
+    return path
+
+def edge_speeds(graph, mode):
+    """Speed (km/h) of every edge for a travel mode; 0 where the mode can't use it."""
+    names = graph['highway_names'][graph['edge_highway']]
+    if mode == 'walk':
+        return np.where(np.isin(names, list(WALK_EXCLUDED)), 0.0, WALK_KPH)
+    return np.array([HIGHWAY_SPEEDS_KPH.get(name, 0) for name in names.tolist()], dtype=float)
+
+def build_csr(n_nodes, src, dst, weights):
+    """Compressed sparse row adjacency (indptr, indices, weights) sorted by source node."""
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_nodes), out=indptr[1:])
+    return indptr, dst[order], weights[order]
+
+def access_csr(graph, mode):
+    """Adjacency for travel *towards* pantries in seconds.
+
+    Dijkstra runs outward from the pantries, so every edge is stored reversed: a
+    search step from b to a follows the real edge a -> b. Walking ignores one-way.
+    """
+    speeds = edge_speeds(graph, mode)
+    usable = speeds > 0
+    seconds = graph['edge_km'][usable] / speeds[usable] * 3600
+    a, b = graph['edge_from'][usable], graph['edge_to'][usable]
+    two_way = np.ones(len(a), dtype=bool) if mode == 'walk' else ~graph['edge_oneway'][usable]
+    src = np.concatenate([b, a[two_way]])
+    dst = np.concatenate([a, b[two_way]])
+    weights = np.concatenate([seconds, seconds[two_way]])
+    return build_csr(len(graph['node_lat']), src, dst, weights)
+
+def multi_source_dijkstra(indptr, indices, weights, sources, initial):
+    """Shortest time from any source to every node, in one pass; inf where unreachable."""
+    dist = np.full(len(indptr) - 1, np.inf)
+    heap = []
+    for node, start in zip(sources, initial):
+        if start < dist[node]:
+            dist[node] = start
+            heap.append((float(start), int(node)))
+    heapq.heapify(heap)
+    # Plain lists index much faster than NumPy scalars inside the loop
+    indptr, indices, weights, best = indptr.tolist(), indices.tolist(), weights.tolist(), dist.tolist()
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > best[node]:
+            continue
+        for i in range(indptr[node], indptr[node + 1]):
+            neighbour = indices[i]
+            nd = d + weights[i]
+            if nd < best[neighbour]:
+                best[neighbour] = nd
+                heapq.heappush(heap, (nd, neighbour))
+    return np.array(best)
+
+def snap_to_nodes(graph, lats, lons, chunk=SNAP_CHUNK):
+    """Index of the nearest graph node to each point and the straight-line distance (km)."""
+    km_per_lon = KM_PER_DEGREE_LON * np.cos(np.radians(np.mean(graph['node_lat'])))
+    node_x = (graph['node_lon'] * km_per_lon).astype(np.float32)
+    node_y = (graph['node_lat'] * KM_PER_DEGREE_LAT).astype(np.float32)
+    x = np.asarray(lons, dtype=float) * km_per_lon
+    y = np.asarray(lats, dtype=float) * KM_PER_DEGREE_LAT
+    nearest = np.zeros(len(x), dtype=np.int64)
+    distance = np.zeros(len(x))
+    for start in range(0, len(x), chunk):
+        d2 = (node_x[None, :] - x[start:start + chunk, None]) ** 2 + (node_y[None, :] - y[start:start + chunk, None]) ** 2
+        nearest[start:start + chunk] = d2.argmin(axis=1)
+        distance[start:start + chunk] = np.sqrt(d2.min(axis=1))
+    return nearest, distance
+
+def isochrone_layer(graph, node_seconds, minutes, cell_km=ISOCHRONE_CELL_KM):
+    """FeatureCollection of the area reachable within each time, longest first so shorter bands draw on top.
+
+    Reached nodes are binned into square cells, each cell is grown by its eight
+    neighbours, and the cells are merged with a coverage union; non-overlapping
+    squares merge far faster than buffered points.
+    """
+    import shapely
+
+    km_per_lon = KM_PER_DEGREE_LON * np.cos(np.radians(np.mean(graph['node_lat'])))
+    col = np.floor(graph['node_lon'] * km_per_lon / cell_km).astype(np.int64)
+    row = np.floor(graph['node_lat'] * KM_PER_DEGREE_LAT / cell_km).astype(np.int64)
+    neighbours = np.array([(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)])
+    features = []
+    for band, limit in sorted(enumerate(minutes), key=lambda item: -item[1]):
+        reached = node_seconds <= limit * 60
+        if not reached.any():
+            continue
+        cells = np.stack([row[reached], col[reached]], axis=1)
+        cells = np.unique((cells[:, None, :] + neighbours[None, :, :]).reshape(-1, 2), axis=0)
+        boxes = shapely.box(cells[:, 1] * cell_km, cells[:, 0] * cell_km, (cells[:, 1] + 1) * cell_km, (cells[:, 0] + 1) * cell_km)
+        area = shapely.simplify(shapely.coverage_union_all(boxes), cell_km / 2)
+        area = shapely.transform(area, lambda xy: xy / [km_per_lon, KM_PER_DEGREE_LAT])
+        features.append({
+            'type': 'Feature',
+            'properties': {'minutes': limit, 'label': f"Within {limit} min", 'color': ISOCHRONE_COLORS[band]},
+            'geometry': round_geometry(shapely.geometry.mapping(area)),
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+def travel_key(version, pantry_df):
+    """Cache key for node times: the graph version, the pantry locations and the speed tables."""
+    digest = hashlib.sha1(f"{version}:{sorted(HIGHWAY_SPEEDS_KPH.items())}:{WALK_KPH}:{CONNECTOR_KPH}".encode())
+    coords = np.round(pantry_df[['latitude', 'longitude']].to_numpy(dtype=float), 5)
+    digest.update(np.ascontiguousarray(coords[np.lexsort(coords.T[::-1])]).tobytes())
+    digest.update(f"{ISOCHRONE_MINUTES}:{ISOCHRONE_CELL_KM}".encode())
+    return digest.hexdigest()[:12]
+
+def pantry_access(graph, pantry_df):
+    """Seconds from every graph node to its nearest pantry, and isochrone layers, per mode."""
+    nodes, snap_km = snap_to_nodes(graph, pantry_df['latitude'], pantry_df['longitude'])
+    node_seconds, isochrones = {}, {}
+    for mode in MODES:
+        indptr, indices, weights = access_csr(graph, mode)
+        seconds = multi_source_dijkstra(indptr, indices, weights, nodes, snap_km / CONNECTOR_KPH[mode] * 3600)
+        node_seconds[mode] = seconds.astype(np.float32)
+        isochrones[mode] = isochrone_layer(graph, seconds, ISOCHRONE_MINUTES[mode])
+    return node_seconds, isochrones
+
+def build_travel_times(zip_centroids, pantry_df, path=ROAD_GRAPH_PATH, cache_dir=None):
+    """Drive and walk times from each ZIP centroid to its nearest pantry, plus isochrones.
+
+    The expensive part (Dijkstra over the whole graph) depends only on the graph and
+    the pantries, so it is cached on disk under travel_key(); client or boundary
+    changes reuse it. Returns {'zip_times': DataFrame, 'isochrones': {mode: layer},
+    'key': str}, or None when there is no road graph or no pantries.
+    """
+    version = graph_version(path)
+    if version is None or pantry_df.empty:
+        return None
+    graph = load_road_graph(path)
+
+    key = travel_key(version, pantry_df)
+    cache_path = os.path.join(cache_dir, f"travel-{key}.pkl") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            node_seconds, isochrones = pickle.load(f)
+    else:
+        node_seconds, isochrones = pantry_access(graph, pantry_df)
+        if cache_path:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(cache_path, 'wb') as f:
+                    pickle.dump((node_seconds, isochrones), f, protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError:
+                pass
+
+    nodes, snap_km = snap_to_nodes(graph, zip_centroids['latitude'], zip_centroids['longitude'])
+    zip_times = zip_centroids[['ZCTA5CE10', 'client_count']].copy()
+    for mode in MODES:
+        seconds = node_seconds[mode][nodes] + snap_km / CONNECTOR_KPH[mode] * 3600
+        zip_times[f'{mode}_minutes'] = np.where(np.isfinite(seconds), seconds / 60, np.nan).round(1)
+    return {'zip_times': zip_times, 'isochrones': isochrones, 'key': key}
+
+def clients_within(zip_times, mode, minutes):
+    """Share of clients whose ZIP centroid is within `minutes` of a pantry."""
+    total = zip_times['client_count'].sum()
+    if total == 0:
+        return 0.0
+    return float(zip_times.loc[zip_times[f'{mode}_minutes'] <= minutes, 'client_count'].sum() / total)
@@ -0,0 +1,136 @@
+import re
+import bisect
+import numpy as np
+from shared.dedup import ADDRESS_ABBREVIATIONS
+
+# Constants
+SEARCH_FIELDS = {'name': 2, 'address': 1}
+# How well a query word matched an indexed word
+EXACT_SCORE = 3
+PREFIX_SCORE = 2
+TYPO_SCORE = 1
+# Words shorter than this, and numbers (a house number or ZIP one digit off is
+# another place), only match exactly or as a prefix
+MIN_TYPO_LENGTH = 4
+# Words this long may be two edits off rather than one
+TWO_TYPO_LENGTH = 8
+# Most trigrams one edit can change (a swap of neighbouring letters)
+TRIGRAMS_PER_EDIT = 4
+DEFAULT_LIMIT = 10
+
+def search_tokens(text):
+    """Uppercase words of a name, address or query, with street words abbreviated the USPS way."""
+    words = re.sub(r"[^A-Z0-9 ]", " ", str(text).upper()).split()
+    return [ADDRESS_ABBREVIATIONS.get(word, word) for word in words]
+
+def trigrams(word):
+    """Overlapping three-letter pieces of a word, padded so its start and end count too."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def allowed_typos(word):
+    if len(word) < MIN_TYPO_LENGTH or word.isdigit():
+        return 0
+    return 1 if len(word) < TWO_TYPO_LENGTH else 2
+
+def within_edits(a, b, limit):
+    """Whether a and b are at most `limit` edits apart, stopping early once they can't be.
+
+    Edits are optimal string alignment (restricted Damerau-Levenshtein)
+    operations: swapping two neighbouring letters ("chruch") is one edit,
+    like an insertion, deletion or substitution.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return False
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return False
+        before, previous = previous, current
+    return previous[-1] <= limit
+
+def build_search_index(pantry_df):
+    """Inverted index over the pantries' names and addresses, small enough to keep in the dataset.
+
+    'terms' is every distinct word, sorted so prefixes are a binary search
+    away; 'rows' and 'weights' hold, per term, the pantry rows it appears in
+    and whether it came from the name (weighted higher) or the address;
+    'trigrams' maps each trigram to the terms containing it, for typo matches.
+    """
+    occurrences = {}
+    for field, weight in SEARCH_FIELDS.items():
+        for row, text in enumerate(pantry_df[field].fillna('').astype(str)):
+            for term in search_tokens(text):
+                # A word in both fields counts at the higher weight
+                rows = occurrences.setdefault(term, {})
+                rows[row] = max(rows.get(row, 0), weight)
+    terms = sorted(occurrences)
+    by_trigram = {}
+    for term_id, term in enumerate(terms):
+        for gram in trigrams(term):
+            by_trigram.setdefault(gram, []).append(term_id)
+    return {
+        'terms': terms,
+        'rows': [np.fromiter(occurrences[term].keys(), dtype=np.int32) for term in terms],
+        'weights': [np.fromiter(occurrences[term].values(), dtype=np.int8) for term in terms],
+        'trigrams': {gram: np.array(ids, dtype=np.int32) for gram, ids in by_trigram.items()},
+        'size': len(pantry_df),
+    }
+
+def matching_terms(index, word):
+    """{term id: score} of indexed words matching one query word exactly, as a prefix or within a typo or two."""
+    terms = index['terms']
+    start = bisect.bisect_left(terms, word)
+    stop = bisect.bisect_left(terms, word + '￿')
+    matches = {term_id: PREFIX_SCORE for term_id in range(start, stop)}
+    if start < stop and terms[start] == word:
+        matches[start] = EXACT_SCORE
+
+    limit = allowed_typos(word)
+    if limit:
+        # An edit changes at most three trigrams, a swap of neighbouring letters
+        # four, so a near miss still shares the rest of them
+        grams = trigrams(word)
+        candidates = [index['trigrams'][gram] for gram in grams if gram in index['trigrams']]
+        if candidates:
+            ids, shared = np.unique(np.concatenate(candidates), return_counts=True)
+            for term_id in ids[shared >= len(grams) - TRIGRAMS_PER_EDIT * limit]:
+                if term_id not in matches and within_edits(word, terms[term_id], limit):
+                    matches[int(term_id)] = TYPO_SCORE
+    return matches
+
+def search_pantries(index, query, limit=DEFAULT_LIMIT):
+    """Rows of the pantries matching every word of `query`, best first, and how many matched in all.
+
+    A word matches exactly, as the start of a longer word (so a half-typed
+    word already finds its pantry) or with a typo; name matches outrank
+    address matches.
+    """
+    words = search_tokens(query)
+    if not words or not index['size']:
+        return np.array([], dtype=np.int64), 0
+    total = np.zeros(index['size'])
+    for word in words:
+        word_scores = np.zeros(index['size'])
+        by_score = {}
+        for term_id, score in matching_terms(index, word).items():
+            by_score.setdefault(score, []).append(term_id)
+        # One vectorized update per (match score, field weight) pair, however many words a prefix covers;
+        # a row listed twice gets the same value twice, so plain fancy indexing is safe
+        for score, term_ids in by_score.items():
+            rows = np.concatenate([index['rows'][term_id] for term_id in term_ids])
+            weights = np.concatenate([index['weights'][term_id] for term_id in term_ids])
+            for weight in SEARCH_FIELDS.values():
+                weighted = rows[weights == weight]
+                word_scores[weighted] = np.maximum(word_scores[weighted], score * weight)
+        # Every word has to match somewhere
+        total = np.where(word_scores > 0, total + word_scores, -np.inf)
+    matched = np.flatnonzero(total > 0)
+    order = matched[np.argsort(-total[matched], kind='stable')]
+    return order[:limit], len(matched)
@@ -0,0 +1,294 @@
+import os
+import json
+import math
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from shared.classify import DEFAULT_SCHEME
+from shared.normalize import DEFAULT_METRIC, METRICS
+from shared.dataset import dataset_version, load_dataset, load_shard
+from shared.regions import combine_shards
+
+# Constants
+STATIC_MAP_DIR = 'static_maps'
+FORMATS = ['png', 'pdf']
+# Letter landscape at 150 dpi
+IMAGE_SIZE = (1650, 1275)
+PDF_DPI = 150
+# Share of a ZIP's extent added on each side so its neighbours give context
+ZIP_PADDING = 0.35
+REGION_PADDING = 0.04
+# Bump whenever the drawing changes so every map is redrawn
+RENDER_FORMAT = 1
+MANIFEST_NAME = 'render_manifest.json'
+BACKGROUND = (248, 250, 252, 255)
+OUTLINE = (60, 60, 60, 255)
+FOCUS_OUTLINE = (81, 42, 68, 255)
+PANTRY_FILL = (46, 125, 50, 255)
+PANTRY_RADIUS = 7
+TITLE_SIZE = 36
+TEXT_SIZE = 22
+
+# Render data of this worker process, loaded once by init_worker()
+render_data = None
+
+def mercator_y(lats):
+    """Web Mercator y (radians) for latitudes in degrees."""
+    return np.log(np.tan(np.pi / 4 + np.radians(lats) / 2))
+
+def geometry_rings(geometry):
+    """Every ring of a Polygon or MultiPolygon as an (n, 2) lon/lat array."""
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    return [np.asarray(ring, dtype=float) for polygon in polygons for ring in polygon]
+
+def available_metrics(version):
+    """Metrics this dataset version can colour ZIP codes by; only the index and one shard are read."""
+    dataset = load_dataset(version)
+    return load_shard(dataset, next(iter(dataset['regions'])))['zip_layers'][DEFAULT_SCHEME][1]
+
+def check_metric(metric, metrics):
+    """Raise ValueError unless `metric` is one of `metrics`."""
+    # Rate metrics only exist when their denominators do
+    if metric not in metrics:
+        raise ValueError(f"Metric {metric!r} is not in this dataset; available: {', '.join(metrics)}")
+
+def load_render_data(version, scheme=DEFAULT_SCHEME, metric=DEFAULT_METRIC):
+    """Everything the maps draw, with per-feature bounding boxes and fingerprints precomputed."""
+    dataset = load_dataset(version)
+    (zip_layer, metrics, styles, legends), _ = combine_shards(
+        [load_shard(dataset, key) for key in dataset['regions']], scheme
+    )
+    check_metric(metric, metrics)
+    features = zip_layer['features']
+    rings = [geometry_rings(feature['geometry']) for feature in features]
+    boxes = np.array([
+        [min(r[:, 0].min() for r in fr), min(r[:, 1].min() for r in fr), max(r[:, 0].max() for r in fr), max(r[:, 1].max() for r in fr)]
+        for fr in rings
+    ]).reshape(-1, 4)
+    pantries = dataset['pantries']
+    return {
+        'version': version,
+        'metric': metric,
+        'features': features,
+        'rings': rings,
+        # west, south, east, north per feature
+        'boxes': boxes,
+        'digests': [hashlib.sha1(json.dumps(f, sort_keys=True).encode()).hexdigest()[:16] for f in features],
+        'styles': styles[metric],
+        'legend': legends[metric],
+        'pantry_lats': pantries['latitude'].to_numpy(dtype=float),
+        'pantry_lons': pantries['longitude'].to_numpy(dtype=float),
+        'regions': dataset['regions'],
+    }
+
+def init_worker(version, scheme, metric):
+    """Process pool initializer: each worker reads the prebuilt dataset once and keeps it read-only."""
+    global render_data
+    render_data = load_render_data(version, scheme, metric)
+
+def fit_frame(bounds, padding, size=IMAGE_SIZE):
+    """(west, east, y_min, y_max) around [[south, west], [north, east]], padded and widened to the image's shape."""
+    (south, west), (north, east) = bounds
+    pad_lon, pad_lat = (east - west) * padding, (north - south) * padding
+    west, east = west - pad_lon, east + pad_lon
+    y_min, y_max = mercator_y(np.array([south - pad_lat, north + pad_lat]))
+    x_span, y_span = np.radians(east - west), y_max - y_min
+    aspect = size[0] / size[1]
+    # Grow whichever axis is short so the map isn't stretched
+    if x_span / max(y_span, 1e-12) < aspect:
+        grow = (y_span * aspect - x_span) / 2
+        west, east = west - math.degrees(grow), east + math.degrees(grow)
+    else:
+        grow = (x_span / aspect - y_span) / 2
+        y_min, y_max = y_min - grow, y_max + grow
+    return float(west), float(east), float(y_min), float(y_max)
+
+def frame_lat_range(frame):
+    """(south, north) latitudes covered by a frame."""
+    _, _, y_min, y_max = frame
+    return tuple(math.degrees(2 * math.atan(math.exp(y)) - math.pi / 2) for y in (y_min, y_max))
+
+def visible_features(data, frame):
+    """Indices of the features whose bounding boxes overlap the frame."""
+    west, east, _, _ = frame
+    south, north = frame_lat_range(frame)
+    boxes = data['boxes']
+    return np.flatnonzero((boxes[:, 0] <= east) & (boxes[:, 2] >= west) & (boxes[:, 1] <= north) & (boxes[:, 3] >= south))
+
+def visible_pantries(data, frame):
+    """Indices of the pantries inside the frame."""
+    west, east, _, _ = frame
+    south, north = frame_lat_range(frame)
+    lats, lons = data['pantry_lats'], data['pantry_lons']
+    return np.flatnonzero((lons >= west) & (lons <= east) & (lats >= south) & (lats <= north))
+
+def plan_maps(data, zips=None, regions=None):
+    """One job per requested ZIP and region: {'name', 'title', 'frame', 'focus'}."""
+    jobs = []
+    zip_ids = [feature['properties']['ZCTA5CE10'] for feature in data['features']]
+    for position, zip_code in enumerate(zip_ids):
+        if zips is not None and zip_code not in zips:
+            continue
+        west, south, east, north = data['boxes'][position]
+        jobs.append({
+            'name': f"zip-{zip_code}",
+            'title': f"ZIP {zip_code}",
+            'frame': fit_frame([[south, west], [north, east]], ZIP_PADDING),
+            'focus': zip_code,
+        })
+    for key, entry in data['regions'].items():
+        if regions is not None and key not in regions:
+            continue
+        jobs.append({
+            'name': f"region-{key}",
+            'title': entry['name'],
+            'frame': fit_frame(entry['bounds'], REGION_PADDING),
+            'focus': None,
+        })
+    return jobs
+
+def job_fingerprint(data, job, formats):
+    """Hash of everything a map's image depends on; unchanged maps are not redrawn."""
+    features = visible_features(data, job['frame'])
+    pantries = visible_pantries(data, job['frame'])
+    inputs = {
+        'render_format': RENDER_FORMAT,
+        'size': IMAGE_SIZE,
+        'formats': sorted(formats),
+        'job': job,
+        'features': [data['digests'][i] for i in features],
+        'metric': data['metric'],
+        'styles': {str(k): v for k, v in data['styles'].items()},
+        'legend': data['legend'],
+        'pantries': np.round(np.column_stack([data['pantry_lats'][pantries], data['pantry_lons'][pantries]]), 6).tolist(),
+    }
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+def hex_to_rgb(color):
+    """'#d73027' -> (215, 48, 39)."""
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+def render_map(data, job):
+    """The map for one job as an RGB PIL image: classified ZIP areas, pantries, title and legend."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    width, height = IMAGE_SIZE
+    west, east, y_min, y_max = job['frame']
+
+    def project(ring):
+        x = (ring[:, 0] - west) / (east - west) * width
+        y = (y_max - mercator_y(ring[:, 1])) / (y_max - y_min) * height
+        return list(zip(x.tolist(), y.tolist()))
+
+    image = Image.new('RGBA', IMAGE_SIZE, BACKGROUND)
+    fills = Image.new('RGBA', IMAGE_SIZE, (0, 0, 0, 0))
+    fill_draw = ImageDraw.Draw(fills)
+    class_column = f"{data['metric']}_class"
+    indices = visible_features(data, job['frame'])
+    for i in indices:
+        style = data['styles'][data['features'][i]['properties'][class_column]]
+        color = hex_to_rgb(style['fillColor']) + (int(round(style['fillOpacity'] * 255)),)
+        for ring in data['rings'][i]:
+            fill_draw.polygon(project(ring), fill=color)
+    image = Image.alpha_composite(image, fills)
+
+    draw = ImageDraw.Draw(image)
+    focus = None
+    for i in indices:
+        is_focus = data['features'][i]['properties']['ZCTA5CE10'] == job['focus']
+        for ring in data['rings'][i]:
+            draw.line(project(ring), fill=OUTLINE, width=1, joint='curve')
+        if is_focus:
+            focus = i
+    if focus is not None:
+        for ring in data['rings'][focus]:
+            draw.line(project(ring), fill=FOCUS_OUTLINE, width=5, joint='curve')
+
+    pantries = visible_pantries(data, job['frame'])
+    xs = (data['pantry_lons'][pantries] - west) / (east - west) * width
+    ys = (y_max - mercator_y(data['pantry_lats'][pantries])) / (y_max - y_min) * height
+    for x, y in zip(xs, ys):
+        draw.ellipse([x - PANTRY_RADIUS, y - PANTRY_RADIUS, x + PANTRY_RADIUS, y + PANTRY_RADIUS],
+                     fill=PANTRY_FILL, outline=(255, 255, 255, 255), width=2)
+
+    title_font = ImageFont.load_default(TITLE_SIZE)
+    text_font = ImageFont.load_default(TEXT_SIZE)
+    draw.rectangle([0, 0, width, TITLE_SIZE + 28], fill=(255, 255, 255, 230))
+    draw.text((24, 12), f"{job['title']} - SPCA clients and food pantries", fill=(94, 109, 64, 255), font=title_font)
+
+    # Legend: pantry symbol, then one swatch per class
+    entries = [(None, f"Food pantry ({len(pantries)} shown)")] + [(color, label) for color, label in data['legend']]
+    row = TEXT_SIZE + 12
+    top = height - 24 - row * (len(entries) + 1)
+    draw.rectangle([16, top - 12, 560, height - 16], fill=(255, 255, 255, 230), outline=OUTLINE)
+    draw.text((32, top), METRICS[data['metric']][0], fill=(34, 34, 34, 255), font=text_font)
+    for n, (color, label) in enumerate(entries, start=1):
+        y = top + n * row
+        if color is None:
+            draw.ellipse([32, y + 4, 32 + 2 * PANTRY_RADIUS, y + 4 + 2 * PANTRY_RADIUS], fill=PANTRY_FILL)
+        else:
+            draw.rectangle([32, y + 2, 56, y + TEXT_SIZE], fill=hex_to_rgb(color), outline=OUTLINE)
+        # Pillow's built-in font has no en dash
+        draw.text((72, y), label.replace('\u2013', '-'), fill=(34, 34, 34, 255), font=text_font)
+    return image.convert('RGB')
+
+def output_paths(out_dir, name, formats):
+    """{format: path} for one map."""
+    return {fmt: os.path.join(out_dir, f"{name}.{fmt}") for fmt in formats}
+
+def render_job(job, out_dir, formats):
+    """Worker task: draw one map and write it in every format."""
+    image = render_map(render_data, job)
+    for fmt, path in output_paths(out_dir, job['name'], formats).items():
+        tmp_path = f"{path}.tmp"
+        if fmt == 'pdf':
+            image.save(tmp_path, format='PDF', resolution=PDF_DPI)
+        else:
+            image.save(tmp_path, format='PNG')
+        os.replace(tmp_path, path)
+    return job['name']
+
+def render_static_maps(out_dir=STATIC_MAP_DIR, zips=None, regions=None, formats=FORMATS,
+                       scheme=DEFAULT_SCHEME, metric=DEFAULT_METRIC, workers=None, force=False):
+    """Render printable maps per ZIP and region across a process pool; returns (rendered, skipped) names.
+
+    A map is redrawn only when its output is missing or its fingerprint (the
+    features and pantries in its frame, styles, size and format) changed since
+    the last run, as recorded in the manifest in `out_dir`.
+    """
+    version = dataset_version()
+    data = load_render_data(version, scheme, metric)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    fingerprints, pending, skipped = {}, [], []
+    for job in plan_maps(data, zips, regions):
+        fingerprints[job['name']] = job_fingerprint(data, job, formats)
+        outputs_exist = all(os.path.exists(p) for p in output_paths(out_dir, job['name'], formats).values())
+        if outputs_exist and manifest.get(job['name']) == fingerprints[job['name']]:
+            skipped.append(job['name'])
+        else:
+            pending.append(job)
+
+    rendered = []
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(pending) == 1:
+            global render_data
+            render_data = data
+            rendered = [render_job(job, out_dir, formats) for job in pending]
+        else:
+            with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(version, scheme, metric)) as pool:
+                rendered = list(pool.map(render_job, pending, [out_dir] * len(pending), [formats] * len(pending),
+                                         chunksize=max(1, len(pending) // (workers * 4))))
+
+    manifest.update({name: fingerprints[name] for name in rendered})
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return rendered, skipped
@@ -0,0 +1,255 @@
+import os
+import math
+import time
+import json
+import sqlite3
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Constants
+TILE_CACHE_PATH = os.path.join('map_data', 'cache', 'basemap.mbtiles')
+TILE_HOST = '127.0.0.1'
+TILE_PORT = 8503
+# Upstream tile server used on a cache miss, e.g. https://a.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png
+UPSTREAM_ENV = 'SPCA_TILE_UPSTREAM'
+UPSTREAM_TIMEOUT = 10
+USER_AGENT = 'SPCA-Maps-tile-cache/1.0'
+# Least recently used tiles go once the cache passes this size; seeded tiles are kept
+MAX_CACHE_MB = 500
+EVICT_TO_SHARE = 0.9
+DEFAULT_SEED_ZOOMS = list(range(8, 15))
+# A bounding box and zoom range that would need more tiles than this is a mistake
+MAX_SEED_TILES = 50000
+CACHE_CONTROL = 'public, max-age=86400'
+# Last-use times are only needed to order evictions, so hits are written in batches
+TOUCH_BATCH = 256
+TOUCH_INTERVAL_SECONDS = 30
+
+def tile_range(bounds, zoom):
+    """(x_min, x_max, y_min, y_max) of the XYZ tiles covering [[south, west], [north, east]] at a zoom."""
+    (south, west), (north, east) = bounds
+    n = 2 ** zoom
+
+    def tile_x(lon):
+        return min(n - 1, max(0, int((lon + 180) / 360 * n)))
+
+    def tile_y(lat):
+        lat = math.radians(max(-85.0511, min(85.0511, lat)))
+        return min(n - 1, max(0, int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n)))
+
+    return tile_x(west), tile_x(east), tile_y(north), tile_y(south)
+
+def tiles_for_bounds(bounds, zooms):
+    """Every (z, x, y) tile covering the bounds at each zoom."""
+    for zoom in zooms:
+        x_min, x_max, y_min, y_max = tile_range(bounds, zoom)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                yield zoom, x, y
+
+def count_tiles(bounds, zooms):
+    """Number of tiles tiles_for_bounds() yields, without listing them."""
+    total = 0
+    for zoom in zooms:
+        x_min, x_max, y_min, y_max = tile_range(bounds, zoom)
+        total += (x_max - x_min + 1) * (y_max - y_min + 1)
+    return total
+
+def fetch_tile(source, z, x, y):
+    """Tile bytes from a URL template or a local z/x/y directory template, or None when it has none."""
+    location = source.format(z=z, x=x, y=y)
+    if not location.startswith(('http://', 'https://')):
+        if not os.path.exists(location):
+            return None
+        with open(location, 'rb') as f:
+            return f.read()
+    request = urllib.request.Request(location, headers={'User-Agent': USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT) as response:
+            return response.read()
+    except (OSError, ValueError):
+        return None
+
+class TileCache:
+    """Basemap tiles in an MBTiles (SQLite) file, with last-use times for LRU eviction.
+
+    The tiles and metadata tables follow the MBTiles spec (TMS row order), so
+    the file also opens in other MBTiles tools; tile_usage is our own addition.
+    """
+
+    def __init__(self, path=TILE_CACHE_PATH, max_bytes=MAX_CACHE_MB * 1024 * 1024):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Hits not yet written to tile_usage: {key: last use}
+        self.touched = {}
+        self.touched_since = time.monotonic()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB,
+                                              PRIMARY KEY (zoom_level, tile_column, tile_row));
+            CREATE TABLE IF NOT EXISTS tile_usage (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER,
+                                                   last_used REAL, pinned INTEGER,
+                                                   PRIMARY KEY (zoom_level, tile_column, tile_row));
+            CREATE INDEX IF NOT EXISTS tile_usage_lru ON tile_usage (pinned, last_used);
+        """)
+        self.db.executemany('INSERT OR IGNORE INTO metadata VALUES (?, ?)', [
+            ('name', 'SPCA basemap cache'), ('format', 'png'), ('type', 'baselayer'),
+        ])
+        self.db.commit()
+        self.size = self.db.execute('SELECT COALESCE(SUM(LENGTH(tile_data)), 0) FROM tiles').fetchone()[0]
+
+    @staticmethod
+    def key(z, x, y):
+        """MBTiles primary key; rows count from the south (TMS), unlike XYZ URLs."""
+        return z, x, 2 ** z - 1 - y
+
+    def get(self, z, x, y):
+        """Tile bytes, or None on a miss; a hit refreshes the tile's last use (written in batches)."""
+        key = self.key(z, x, y)
+        with self.lock:
+            row = self.db.execute(
+                'SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?', key
+            ).fetchone()
+            if row is None:
+                return None
+            self.touched[key] = time.time()
+            if len(self.touched) >= TOUCH_BATCH or time.monotonic() - self.touched_since >= TOUCH_INTERVAL_SECONDS:
+                self.write_touched()
+                self.db.commit()
+        return row[0]
+
+    def write_touched(self):
+        """Write the pending last-use times in one statement; the caller holds the lock and commits."""
+        if self.touched:
+            self.db.executemany(
+                'UPDATE tile_usage SET last_used=MAX(last_used, ?) WHERE zoom_level=? AND tile_column=? AND tile_row=?',
+                [(used,) + key for key, used in self.touched.items()]
+            )
+            self.touched = {}
+        self.touched_since = time.monotonic()
+
+    def flush(self):
+        """Write pending last-use times now, e.g. before shutting down."""
+        with self.lock:
+            self.write_touched()
+            self.db.commit()
+
+    def put(self, z, x, y, data, pinned=False):
+        """Store a tile, then evict least recently used unpinned tiles if the cache is over its size."""
+        key = self.key(z, x, y)
+        with self.lock:
+            old = self.db.execute(
+                'SELECT LENGTH(tile_data) FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?', key
+            ).fetchone()
+            self.db.execute('INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)', key + (sqlite3.Binary(data),))
+            self.db.execute(
+                'INSERT INTO tile_usage VALUES (?, ?, ?, ?, ?) ON CONFLICT DO UPDATE SET '
+                'last_used=excluded.last_used, pinned=MAX(pinned, excluded.pinned)',
+                key + (time.time(), int(pinned))
+            )
+            self.size += len(data) - (old[0] if old else 0)
+            if self.size > self.max_bytes:
+                # Evict by up-to-date last uses
+                self.write_touched()
+                self.evict(int(self.max_bytes * EVICT_TO_SHARE))
+            self.db.commit()
+
+    def evict(self, target_bytes):
+        """Drop unpinned tiles, least recently used first, until the cache fits in `target_bytes`."""
+        rows = self.db.execute(
+            'SELECT u.zoom_level, u.tile_column, u.tile_row, LENGTH(t.tile_data) FROM tile_usage u '
+            'JOIN tiles t USING (zoom_level, tile_column, tile_row) WHERE u.pinned=0 ORDER BY u.last_used'
+        )
+        doomed = []
+        for z, x, row, length in rows:
+            if self.size <= target_bytes:
+                break
+            doomed.append((z, x, row))
+            self.size -= length
+        for table in ['tiles', 'tile_usage']:
+            self.db.executemany(f'DELETE FROM {table} WHERE zoom_level=? AND tile_column=? AND tile_row=?', doomed)
+        return len(doomed)
+
+    def stats(self):
+        """Tile counts and size for the status page."""
+        with self.lock:
+            tiles, pinned = self.db.execute('SELECT COUNT(*), COALESCE(SUM(pinned), 0) FROM tile_usage').fetchone()
+        return {'tiles': tiles, 'seeded_tiles': pinned, 'megabytes': round(self.size / 1024 / 1024, 1),
+                'max_megabytes': round(self.max_bytes / 1024 / 1024, 1)}
+
+def seed_tiles(cache, bounds, zooms, source, progress=None):
+    """Copy every tile over the bounds at the given zooms from `source` into the cache, pinned.
+
+    `source` is an upstream URL template or a local z/x/y file template; tiles
+    already cached are only pinned. Returns {'added', 'present', 'missing'}.
+    """
+    total = count_tiles(bounds, zooms)
+    if total > MAX_SEED_TILES:
+        raise ValueError(f"{total:,} tiles is more than the {MAX_SEED_TILES:,} limit; use fewer zoom levels or a smaller area")
+    counts = {'added': 0, 'present': 0, 'missing': 0}
+    for done, (z, x, y) in enumerate(tiles_for_bounds(bounds, zooms), start=1):
+        data = cache.get(z, x, y)
+        if data is not None:
+            counts['present'] += 1
+        else:
+            data = fetch_tile(source, z, x, y)
+            counts['added' if data is not None else 'missing'] += 1
+        if data is not None:
+            cache.put(z, x, y, data, pinned=True)
+        if progress and done % 500 == 0:
+            progress(done, total)
+    return counts
+
+class TileHandler(BaseHTTPRequestHandler):
+    """Serves /tiles/{z}/{x}/{y}.png from the cache, asking upstream (when set) on a miss."""
+
+    cache = None
+    upstream = None
+    server_version = 'SPCATileCache/1.0'
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts == ['']:
+            body = json.dumps(dict(self.cache.stats(), upstream=self.upstream)).encode('utf-8')
+            return self.send_body(200, body, 'application/json')
+        try:
+            assert parts[0] == 'tiles' and len(parts) == 4
+            z, x, y = int(parts[1]), int(parts[2]), int(parts[3].split('.')[0])
+            assert 0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+        except (AssertionError, ValueError, IndexError):
+            return self.send_body(404, b'not a tile path', 'text/plain')
+
+        data = self.cache.get(z, x, y)
+        if data is None and self.upstream:
+            data = fetch_tile(self.upstream, z, x, y)
+            if data is not None:
+                self.cache.put(z, x, y, data)
+        if data is None:
+            return self.send_body(404, b'tile not cached', 'text/plain')
+        self.send_body(200, data, 'image/png', CACHE_CONTROL)
+
+    def send_body(self, status, body, content_type, cache_control=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        # The map page is served from another port
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if cache_control:
+            self.send_header('Cache-Control', cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # One line per tile would drown the console
+        pass
+
+def make_tile_server(cache, host=TILE_HOST, port=TILE_PORT, upstream=None):
+    """Threaded tile server over a cache; `upstream` defaults to $SPCA_TILE_UPSTREAM (none: offline)."""
+    upstream = upstream or os.environ.get(UPSTREAM_ENV)
+    handler = type('BoundTileHandler', (TileHandler,), {'cache': cache, 'upstream': upstream})
+    return ThreadingHTTPServer((host, port), handler)
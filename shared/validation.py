@@ -0,0 +1,148 @@
+import os
+import numpy as np
+import pandas as pd
+from shared.regions import within_bounds
+from shared.zip_crosswalk import remap_zips
+
+# Constants
+PANTRY_COLUMNS = ['name', 'address', 'phone', 'hours', 'latitude', 'longitude']
+CLIENT_ZIP_COLUMN = 'Postal Code'
+REPORT_PATH = os.path.join('map_data', 'cache', 'validation_report.csv')
+# `record` is the 1-based data record after the header, not a file line: quoted fields
+# (pantry hours) can span lines. `rows` counts the rows a report line stands for;
+# client lines are grouped by value
+REPORT_COLUMNS = ['source', 'record', 'severity', 'reason', 'detail', 'rows']
+# Errors drop the row; warnings keep it but flag it for a human to check; notes record a fix
+ERROR = 'error'
+WARNING = 'warning'
+NOTE = 'note'
+
+def rejections(source, index, severity, reason, detail=''):
+    """Report rows for the given row labels; `record` is the 1-based CSV record, header excluded."""
+    index = np.asarray(index)
+    return pd.DataFrame({
+        'source': source,
+        'record': index + 1,
+        'severity': severity,
+        'reason': reason,
+        'detail': detail if np.ndim(detail) else [detail] * len(index),
+        'rows': 1,
+    }, columns=REPORT_COLUMNS)
+
+def group_rejections(report):
+    """One report line per (source, severity, reason, detail), counting its rows; `record` is the first of them."""
+    grouped = report.groupby(['source', 'severity', 'reason', 'detail'], sort=False, dropna=False)
+    return grouped.agg(record=('record', 'min'), rows=('rows', 'sum')).reset_index()[REPORT_COLUMNS]
+
+def check_columns(df, required, source):
+    """Fail fast when a source file is missing columns the pipeline reads."""
+    missing = [column for column in required if column not in df.columns]
+    if missing:
+        raise ValueError(f"{source} is missing column(s): {', '.join(missing)}")
+
+def clean_zip_values(values):
+    """ZIP cleanup: 14085, 14085.0 and '14085-1234' become '14085'; anything else NaN."""
+    text = pd.Series(values).astype(str).str.strip()
+    return text.str.extract(r'^(\d{3,5})(?:\.0+)?(?:-\d{4})?$', expand=False).str.zfill(5).to_numpy(dtype=object)
+
+def expand(unique_values, codes, missing=np.nan):
+    """Per-row values from per-distinct-value results and pd.factorize codes; code -1 gets `missing`."""
+    # Code -1 indexes the appended last element
+    return np.append(unique_values, [missing])[codes]
+
+def clean_zips(values):
+    """Vectorized clean_zip_values() over a whole column."""
+    # A client export repeats a few hundred ZIPs many times over; clean each distinct value once
+    codes, uniques = pd.factorize(pd.Series(values))
+    return pd.Series(expand(clean_zip_values(uniques), codes), dtype=object)
+
+def address_zips(addresses):
+    """ZIP at the end of each one-line address ('..., BUFFALO, NY 14206'), or NaN."""
+    return pd.Series(addresses).astype(str).str.extract(r'(\d{5})(?:-\d{4})?\s*$', expand=False)
+
+def validate_pantries(pantry_df, zcta_index, region_boxes):
+    """Split pantry listings into usable rows and report rows, all checks vectorized.
+
+    Errors (dropped): missing or non-numeric coordinates, coordinates nowhere near
+    any mapped region (`region_boxes`, derived from the boundaries), missing name. Warnings (kept): the address's ZIP is not a mapped area,
+    or the point falls outside the ZIP polygon (looked up in `zcta_index`, a ZctaIndex) its address claims.
+    """
+    check_columns(pantry_df, PANTRY_COLUMNS, 'pantry listings')
+    source = 'pantries'
+    reports = []
+
+    lats = pd.to_numeric(pantry_df['latitude'], errors='coerce')
+    lons = pd.to_numeric(pantry_df['longitude'], errors='coerce')
+    blank = pantry_df['latitude'].isna() | pantry_df['longitude'].isna()
+    unparsable = (lats.isna() | lons.isna()) & ~blank
+    outside = ~blank & ~unparsable & ~within_bounds(lats.fillna(0), lons.fillna(0), region_boxes)
+    unnamed = pantry_df['name'].isna() | (pantry_df['name'].astype(str).str.strip() == '')
+    coordinates = lats.round(5).astype(str) + ', ' + lons.round(5).astype(str)
+    reports.append(rejections(source, pantry_df.index[blank], ERROR, 'missing_coordinates',
+                              pantry_df['address'].astype(str)[blank].to_numpy()))
+    reports.append(rejections(source, pantry_df.index[unparsable], ERROR, 'non_numeric_coordinates',
+                              (pantry_df['latitude'].astype(str) + ', ' + pantry_df['longitude'].astype(str))[unparsable].to_numpy()))
+    reports.append(rejections(source, pantry_df.index[outside], ERROR, 'outside_region', coordinates[outside].to_numpy()))
+    reports.append(rejections(source, pantry_df.index[unnamed], ERROR, 'missing_name'))
+
+    valid = ~(blank | unparsable | outside | unnamed)
+    clean = pantry_df[valid].assign(latitude=lats[valid], longitude=lons[valid])
+    clean = clean.assign(
+        name=clean['name'].astype(str).str.strip(),
+        address=clean['address'].fillna('N/A').astype(str),
+        phone=clean['phone'].fillna('N/A').astype(str),
+        hours=clean['hours'].fillna('N/A').astype(str),
+    )
+
+    zip_codes = set(zcta_index.zctas)
+    claimed = address_zips(clean['address']).to_numpy(dtype=object)
+    known = pd.Series(claimed).isin(zip_codes).to_numpy()
+    unknown = pd.notna(claimed) & ~known
+    reports.append(rejections(source, clean.index[unknown], WARNING, 'zip_not_in_area', claimed[unknown]))
+    if known.any():
+        found = zcta_index.lookup_many(clean['latitude'][known], clean['longitude'][known])
+        mismatch = found != claimed[known]
+        detail = [f"address says {c}, point is in {f if isinstance(f, str) else 'no mapped ZIP'}"
+                  for c, f in zip(claimed[known][mismatch], found[mismatch])]
+        reports.append(rejections(source, clean.index[known][mismatch], WARNING, 'outside_claimed_zip', detail))
+    return clean.reset_index(drop=True), pd.concat(reports, ignore_index=True)
+
+def validate_clients(client_df, zip_codes, crosswalk=None):
+    """Cleaned ZIP per client plus report lines, one per distinct problem value with its row count.
+
+    With a crosswalk (see zip_crosswalk.load_crosswalk()), PO box and unique ZIPs
+    become the ZCTA that contains them; recovered clients are a note. Errors
+    (dropped): ZIP missing or unparsable. Warnings (kept in counts, but not drawn):
+    ZIP with no boundary on the map. Grouping keeps the report as small as the
+    number of distinct bad values, however many rows share them.
+    """
+    check_columns(client_df, [CLIENT_ZIP_COLUMN], 'client export')
+    source = 'clients'
+    raw = client_df[CLIENT_ZIP_COLUMN]
+    # Clean and remap each distinct value once, then spread the results over the rows
+    codes, uniques = pd.factorize(raw)
+    cleaned = clean_zip_values(uniques)
+    mapped = remap_zips(cleaned, crosswalk) if crosswalk is not None else cleaned
+    in_area = pd.Series(mapped).isin(set(zip_codes)).to_numpy()
+    recovered = expand(pd.notna(cleaned) & (mapped != cleaned) & in_area, codes, False)
+    zips = pd.Series(expand(mapped, codes), index=client_df.index, dtype=object)
+    invalid = zips.isna()
+    unmapped = ~invalid & ~expand(in_area, codes, False)
+    detail = expand(pd.Series(cleaned, dtype=object) + ' -> ' + pd.Series(mapped, dtype=object), codes)[recovered]
+    reports = [
+        rejections(source, client_df.index[invalid], ERROR, 'invalid_zip', raw[invalid].astype(str).to_numpy()),
+        rejections(source, client_df.index[unmapped], WARNING, 'zip_not_in_area', zips[unmapped].to_numpy()),
+        rejections(source, client_df.index[recovered], NOTE, 'zip_crosswalked', detail),
+    ]
+    return zips[~invalid], group_rejections(pd.concat(reports, ignore_index=True))
+
+def write_report(reports, path=REPORT_PATH):
+    """Persist all report lines as CSV; return the rows they cover per (source, severity, reason)."""
+    report = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=REPORT_COLUMNS)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        report.to_csv(path, index=False)
+    except OSError:
+        # A read-only deployment still gets the summary in the dataset
+        pass
+    return report.groupby(['source', 'severity', 'reason'])['rows'].sum().reset_index()
@@ -0,0 +1,235 @@
+import json
+import pandas as pd
+from urllib.parse import quote
+from shared.map_layers import TILE_URL, TILE_ATTRIBUTION, view_for_bounds, pantry_hover_text, site_hover_text
+from shared.normalize import METRICS
+from shared.demand_surface import png_data_uri
+from shared.facility_location import SITE_COLOR
+from shared.geojson_utils import feature_bounds
+
+# Constants
+BACKENDS = {
+    'folium': 'Folium (Leaflet)',
+    'plotly': 'Plotly (WebGL)',
+    'pydeck': 'deck.gl (WebGL)',
+}
+DEFAULT_BACKEND = 'folium'
+PANTRY_COLOR = '#2e7d32'
+PANTRY_RGBA = [46, 125, 50, 230]
+
+def hex_to_rgba(color, opacity):
+    """'#d73027' and 0.8 -> [215, 48, 39, 204]."""
+    color = color.lstrip('#')
+    return [int(color[i:i + 2], 16) for i in (0, 2, 4)] + [int(round(opacity * 255))]
+
+def class_colorscale(metric_styles):
+    """Stepped Plotly colorscale with one band per class id, lowest id first."""
+    class_ids = sorted(metric_styles)
+    n = len(class_ids)
+    colorscale = []
+    for position, class_id in enumerate(class_ids):
+        color = metric_styles[class_id]['fillColor']
+        colorscale.append([position / n, color])
+        colorscale.append([(position + 1) / n, color])
+    return class_ids, colorscale
+
+def zip_frame(zip_layer, metric, id_field='ZCTA5CE10'):
+    """One row per area feature with the columns both WebGL backends read."""
+    properties = [feature['properties'] for feature in zip_layer['features']]
+    return pd.DataFrame({
+        'area_id': [p[id_field] for p in properties],
+        'client_count': [p['client_count'] for p in properties],
+        'value': [p[metric] for p in properties],
+        'class_id': [p[f'{metric}_class'] for p in properties],
+    })
+
+def raster_style_uri(tile_url, attribution=TILE_ATTRIBUTION):
+    """Inline MapLibre style drawing one raster tile source, as a data: URI deck.gl's basemap can load."""
+    style = {
+        'version': 8,
+        'sources': {'basemap': {'type': 'raster', 'tiles': [tile_url], 'tileSize': 256, 'attribution': attribution}},
+        'layers': [{'id': 'basemap', 'type': 'raster', 'source': 'basemap'}],
+    }
+    return 'data:application/json,' + quote(json.dumps(style, separators=(',', ':')))
+
+def image_corners(bounds):
+    """Corner coordinates [lon, lat] clockwise from north-west, as Plotly image layers expect."""
+    (south, west), (north, east) = bounds
+    return [[west, north], [east, north], [east, south], [west, south]]
+
+def build_plotly_figure(zip_layer, styles, pantry_df, metric='client_count', overlay=None,
+                        id_field='ZCTA5CE10', id_label='ZIP', isochrones=None, sites=None, bounds=None):
+    """Plotly figure with the area (ZIP by default) choropleth, pantry points and optional raster overlay and travel-time bands on a WebGL map."""
+    import plotly.graph_objects as go
+
+    metric_styles = styles[metric]
+    zips = zip_frame(zip_layer, metric, id_field)
+    class_ids, colorscale = class_colorscale(metric_styles)
+
+    hover = f"<b>{id_label} " + '%{location}</b><br>SPCA Clients: %{customdata[0]:,}'
+    if metric != 'client_count':
+        hover += f"<br>{METRICS[metric][0]}: " + '%{customdata[1]:,}'
+    fig = go.Figure(go.Choroplethmap(
+        geojson=zip_layer,
+        featureidkey=f'properties.{id_field}',
+        locations=zips['area_id'],
+        # Position of each feature's class in the stepped colorscale
+        z=zips['class_id'].map({class_id: i for i, class_id in enumerate(class_ids)}),
+        zmin=-0.5,
+        zmax=len(class_ids) - 0.5,
+        colorscale=colorscale,
+        showscale=False,
+        marker_opacity=0.6,
+        marker_line_width=1,
+        marker_line_color='#000000',
+        customdata=zips[['client_count', 'value']],
+        hovertemplate=hover + '<extra></extra>',
+        name='SPCA clients',
+    ))
+    fig.add_trace(go.Scattermap(
+        lat=pantry_df['latitude'],
+        lon=pantry_df['longitude'],
+        mode='markers',
+        marker={'size': 11, 'color': PANTRY_COLOR},
+        hovertext=pantry_hover_text(pantry_df),
+        hoverinfo='text',
+        name='Food pantries',
+    ))
+    if sites is not None:
+        fig.add_trace(go.Scattermap(
+            lat=sites['latitude'],
+            lon=sites['longitude'],
+            mode='markers',
+            marker={'size': 15, 'color': SITE_COLOR},
+            hovertext=site_hover_text(sites),
+            hoverinfo='text',
+            name='Proposed sites',
+        ))
+    map_layers = []
+    if TILE_URL:
+        # Basemap from the local tile cache, under everything else
+        map_layers.append({
+            'sourcetype': 'raster',
+            'source': [TILE_URL],
+            'sourceattribution': TILE_ATTRIBUTION,
+            'below': 'traces',
+        })
+    if overlay is not None:
+        map_layers.append({
+            'sourcetype': 'image',
+            'source': png_data_uri(overlay['png']),
+            'coordinates': image_corners(overlay['bounds']),
+            'below': 'traces',
+        })
+    if isochrones is not None:
+        for feature in isochrones['features']:
+            map_layers.append({
+                'sourcetype': 'geojson',
+                'source': feature,
+                'type': 'fill',
+                'color': feature['properties']['color'],
+                'opacity': 0.35,
+                'below': 'traces',
+            })
+    center, zoom = view_for_bounds(bounds or feature_bounds(zip_layer['features']))
+    fig.update_layout(
+        map={
+            'style': 'white-bg' if TILE_URL else 'carto-positron',
+            'center': {'lat': center[0], 'lon': center[1]},
+            'zoom': zoom - 0.5,
+            'layers': map_layers,
+        },
+        margin={'r': 0, 't': 0, 'l': 0, 'b': 0},
+        showlegend=False,
+        height=600,
+    )
+    return fig
+
+def build_deck(zip_layer, styles, pantry_df, metric='client_count', overlay=None,
+               id_field='ZCTA5CE10', id_label='ZIP', isochrones=None, sites=None, bounds=None):
+    """pydeck Deck with the area (ZIP by default) choropleth, pantry points and optional raster overlay and travel-time bands rendered by deck.gl."""
+    import pydeck as pdk
+
+    metric_styles = styles[metric]
+    class_column = f'{metric}_class'
+    fill = {
+        class_id: hex_to_rgba(style['fillColor'], style['fillOpacity'])
+        for class_id, style in metric_styles.items()
+    }
+    # deck.gl reads colours from the features, so attach them to shallow copies
+    features = []
+    for feature in zip_layer['features']:
+        properties = dict(feature['properties'])
+        properties['fill_rgba'] = fill[properties[class_column]]
+        properties['tooltip'] = f"{id_label} {properties[id_field]}: {properties['client_count']:,} SPCA clients"
+        features.append({'type': 'Feature', 'properties': properties, 'geometry': feature['geometry']})
+
+    pantries = pd.DataFrame({
+        'latitude': pantry_df['latitude'],
+        'longitude': pantry_df['longitude'],
+        'tooltip': pantry_hover_text(pantry_df),
+    })
+    layers = [
+        pdk.Layer(
+            'GeoJsonLayer',
+            {'type': 'FeatureCollection', 'features': features},
+            pickable=True,
+            stroked=True,
+            filled=True,
+            get_fill_color='properties.fill_rgba',
+            get_line_color=[0, 0, 0, 160],
+            line_width_min_pixels=1,
+        ),
+        pdk.Layer(
+            'ScatterplotLayer',
+            pantries,
+            pickable=True,
+            get_position='[longitude, latitude]',
+            get_fill_color=PANTRY_RGBA,
+            get_radius=250,
+            radius_min_pixels=4,
+            radius_max_pixels=12,
+        ),
+    ]
+    if overlay is not None:
+        (south, west), (north, east) = overlay['bounds']
+        layers.insert(1, pdk.Layer(
+            'BitmapLayer',
+            image=png_data_uri(overlay['png']),
+            bounds=[west, south, east, north],
+        ))
+    if sites is not None:
+        layers.append(pdk.Layer(
+            'ScatterplotLayer',
+            sites.assign(tooltip=site_hover_text(sites)),
+            pickable=True,
+            get_position='[longitude, latitude]',
+            get_fill_color=hex_to_rgba(SITE_COLOR, 0.95),
+            get_radius=400,
+            radius_min_pixels=6,
+            radius_max_pixels=16,
+        ))
+    if isochrones is not None:
+        bands = [
+            {'type': 'Feature', 'geometry': feature['geometry'],
+             'properties': {'fill_rgba': hex_to_rgba(feature['properties']['color'], 0.35)}}
+            for feature in isochrones['features']
+        ]
+        layers.insert(1, pdk.Layer(
+            'GeoJsonLayer',
+            {'type': 'FeatureCollection', 'features': bands},
+            filled=True,
+            stroked=False,
+            get_fill_color='properties.fill_rgba',
+        ))
+    center, zoom = view_for_bounds(bounds or feature_bounds(zip_layer['features']))
+    # The JSON deck.gl behind st.pydeck_chart can't draw raster tiles in a TileLayer
+    # (each tile needs a BitmapLayer built in JavaScript), so the local tiles come in
+    # as the basemap style instead of CARTO's
+    return pdk.Deck(
+        layers=layers,
+        initial_view_state=pdk.ViewState(latitude=center[0], longitude=center[1], zoom=zoom - 0.5),
+        map_provider=None if TILE_URL else 'carto',
+        map_style=raster_style_uri(TILE_URL) if TILE_URL else 'light',
+        tooltip={'html': '{tooltip}'},
+    )
@@ -0,0 +1,50 @@
+import numpy as np
+
+class ZctaIndex:
+    """Point-to-ZCTA lookups over a ZIP boundary FeatureCollection, built once and reused.
+
+    An STRtree over the polygons narrows each point to the few whose bounding
+    box holds it; prepared polygons then settle containment for all the
+    candidate pairs in one vectorized contains_xy() call.
+    """
+
+    def __init__(self, feature_collection, id_field='ZCTA5CE10'):
+        # shapely is only needed where points are placed in ZIPs, not on every app start
+        import shapely
+
+        features = feature_collection['features']
+        self.zctas = np.array([str(feature['properties'][id_field]) for feature in features], dtype=object)
+        self.polygons = np.array([shapely.geometry.shape(feature['geometry']) for feature in features], dtype=object)
+        shapely.prepare(self.polygons)
+        self.tree = shapely.STRtree(self.polygons)
+
+    def __len__(self):
+        return len(self.zctas)
+
+    def polygon_rows(self, lats, lons):
+        """Row of the polygon containing each point, or -1; a point on a shared edge is in neither."""
+        import shapely
+
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        rows = np.full(len(lats), -1, dtype=np.int64)
+        usable = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        if not len(usable) or not len(self.polygons):
+            return rows
+        point_index, polygon_index = self.tree.query(shapely.points(lons[usable], lats[usable]))
+        points = usable[point_index]
+        inside = shapely.contains_xy(self.polygons[polygon_index], lons[points], lats[points])
+        rows[points[inside]] = polygon_index[inside]
+        return rows
+
+    def lookup_many(self, lats, lons):
+        """ZCTA containing each point (NaN where none does)."""
+        rows = self.polygon_rows(lats, lons)
+        found = np.full(len(rows), np.nan, dtype=object)
+        found[rows >= 0] = self.zctas[rows[rows >= 0]]
+        return found
+
+    def lookup(self, lat, lon):
+        """ZCTA containing one point, or None."""
+        found = self.lookup_many([lat], [lon])[0]
+        return found if isinstance(found, str) else None
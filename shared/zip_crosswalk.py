@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Constants
+# Optional USPS ZIP -> ZCTA table, e.g. the UDS Mapper crosswalk (ZIP_CODE, ..., ZCTA)
+CROSSWALK_PATH = os.path.join('map_data', 'zip_zcta_crosswalk.csv')
+ZIP_COLUMNS = ['ZIP_CODE', 'ZIP', 'ZIPCODE']
+ZCTA_COLUMNS = ['ZCTA', 'ZCTA5', 'ZCTA5CE10']
+# Every five-digit ZIP is an index into one lookup array
+ZIP_SPACE = 100000
+
+def find_column(df, candidates):
+    """First column of `df` whose upper-cased name is one of `candidates`."""
+    by_name = {str(column).strip().upper(): column for column in df.columns}
+    for candidate in candidates:
+        if candidate in by_name:
+            return by_name[candidate]
+    raise ValueError(f"ZIP crosswalk needs one of the columns: {', '.join(candidates)}")
+
+def load_crosswalk(path=CROSSWALK_PATH):
+    """ZIP -> ZCTA lookup array (index = ZIP as an int), or None when the file is absent.
+
+    ZIPs the table doesn't list map to themselves, so remapping is a single
+    array index with no misses to handle.
+    """
+    if not os.path.exists(path):
+        return None
+    table = pd.read_csv(path, dtype=str)
+    zips = pd.to_numeric(table[find_column(table, ZIP_COLUMNS)].str.strip(), errors='coerce')
+    zctas = pd.to_numeric(table[find_column(table, ZCTA_COLUMNS)].str.strip(), errors='coerce')
+    usable = zips.notna() & zctas.notna() & zips.between(0, ZIP_SPACE - 1) & zctas.between(0, ZIP_SPACE - 1)
+    lookup = np.arange(ZIP_SPACE, dtype=np.int32)
+    lookup[zips[usable].to_numpy(dtype=np.int64)] = zctas[usable].to_numpy(dtype=np.int32)
+    return lookup
+
+def remap_zips(zips, lookup):
+    """Five-digit ZIP strings (NaN allowed) replaced by their ZCTA, in one vectorized pass."""
+    zips = np.asarray(zips, dtype=object)
+    remapped = zips.copy()
+    present = pd.notna(zips)
+    codes = lookup[zips[present].astype(np.int64)]
+    remapped[present] = np.char.zfill(codes.astype(str), 5).astype(object)
+    return remapped